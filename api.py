@@ -0,0 +1,474 @@
+import argparse
+import asyncio
+import base64
+import json
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import services
+from bookings import BookingConflict, reschedule_lesson
+from catalog import lesson_duration, lesson_types
+from database import get_db, set_db_path
+from exporter import EXPORTS, export_filters
+from migrations import migrate
+from pagination import PAGE_SIZE, fetch_page
+from reports import dashboard_summary, write_report
+from scheduling import find_slots
+from search import name_search_sql
+
+# Headless HTTP/JSON API over the same operations as the Tk screens (see
+# services.py), for the online booking page and staff phones. Plain asyncio
+# streams, no framework: the event loop only parses requests and writes
+# responses, and every database call runs on a pool of `workers` threads
+# (each with its own connection, see database.py). At most `max_pending`
+# calls may be queued or running; beyond that the server answers 503 at once
+# rather than letting a burst pile up behind the pool. Connections are kept
+# alive between requests (HTTP/1.1 default, or "Connection: keep-alive" from
+# 1.0 clients) until they are idle for KEEP_ALIVE_TIMEOUT seconds.
+#
+#   python api.py [--host 127.0.0.1] [--port 8080] [--workers 4] [--db driving_school.db]
+#
+#   GET    /students?q=&branch=&sort=&limit=&after=&before=    also /instructors
+#   GET    /students/{id}          POST /students    PATCH /students/{id}    DELETE /students/{id}
+#   GET    /students/{id}/progress
+#   GET    /lessons?student_id=&instructor_id=&date_from=&date_to=&branch=&sort=&limit=&after=&before=
+#   GET    /lessons/{id}           POST /lessons     PATCH /lessons/{id}     DELETE /lessons/{id}
+#   GET    /lesson-types
+#   GET    /slots?lesson_type=&date_from=&date_to=&instructor_id=&student_id=&limit=
+#   GET    /reports/dashboard?months=&top=
+#   POST   /reports/print
+#
+# Lists come a page at a time: {"items": [...], "next": cursor, "prev": cursor};
+# pass a cursor back as after= (or before=) for the next (previous) page.
+# Errors are {"error": message} with a 4xx/5xx status.
+
+DEFAULT_PORT = 8080
+DB_WORKERS = 4
+MAX_PENDING = 64
+MAX_PAGE_SIZE = 500
+KEEP_ALIVE_TIMEOUT = 15
+MAX_BODY = 1024 * 1024
+MAX_HEADERS = 100
+
+REPORT_PATH = "driving_school_report.pdf"
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+# --- Arguments ---
+def query_value(query, name, default=None):
+    values = query.get(name)
+    return values[-1] if values else default
+
+
+def query_int(query, name, default=None):
+    value = query_value(query, name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be a whole number") from None
+
+
+def body_int(body, name, default=None):
+    value = body.get(name, default)
+    if value is None or isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be a whole number")
+
+
+# Cursors are opaque to clients: the page's (sort key, id), as base64 JSON
+def encode_cursor(cursor):
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(list(cursor)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(value):
+    if not value:
+        return None
+    try:
+        key, row_id = json.loads(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+        return key, row_id
+    except (ValueError, TypeError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid page cursor") from None
+
+
+# --- Lists and rows ---
+def page_of(columns, sql, params, query, db):
+    sort = query_value(query, "sort", "id")
+    descending = sort.startswith("-")
+    order_by = sort.lstrip("-")
+    if order_by not in columns:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"Cannot sort by {order_by}")
+    page_size = min(max(query_int(query, "limit", PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    page = fetch_page(sql, params, order_by, descending, page_size,
+                      after=decode_cursor(query_value(query, "after")),
+                      before=decode_cursor(query_value(query, "before")), db=db)
+    return {"items": [dict(zip(columns, row)) for row in page.rows],
+            "next": encode_cursor(page.next_cursor), "prev": encode_cursor(page.prev_cursor)}
+
+
+def get_row(table, row_id, db):
+    row = services.get_row(table, row_id, db)
+    if row is None:
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No {table[:-1]} with id {row_id}")
+    return row
+
+
+def list_people(table):
+    def handler(db, query, body):
+        columns = EXPORTS[table]
+        sql, params = name_search_sql(table, query_value(query, "q", ""), columns, db)
+        branch = query_value(query, "branch")
+        if branch:
+            sql, params = f"SELECT * FROM ({sql}) WHERE branch = ?", (*params, branch)
+        return page_of(columns, sql, params, query, db)
+    return handler
+
+
+def show_row(table):
+    def handler(db, query, body, row_id):
+        return get_row(table, row_id, db)
+    return handler
+
+
+def add_person(table):
+    def handler(db, query, body):
+        row_id, = services.add_people(table, [body], db)
+        return HTTPStatus.CREATED, get_row(table, row_id, db)
+    return handler
+
+
+def update_person(table):
+    def handler(db, query, body, row_id):
+        if not services.update_people(table, [(row_id, body)], db):
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No {table[:-1]} with id {row_id}")
+        return get_row(table, row_id, db)
+    return handler
+
+
+def delete_row(table):
+    def handler(db, query, body, row_id):
+        if not services.delete_rows(table, [row_id], db):
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No {table[:-1]} with id {row_id}")
+        return {"deleted": row_id}
+    return handler
+
+
+def student_progress(db, query, body, student_id):
+    progress = services.lesson_progress([student_id], db)
+    if student_id not in progress:
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No student with id {student_id}")
+    return {"student_id": student_id, "progress": progress[student_id]}
+
+
+# --- Lessons ---
+def list_lessons(db, query, body):
+    columns = EXPORTS["lessons"]
+    where, params = export_filters("lessons", query_value(query, "date_from"), query_value(query, "date_to"),
+                                   query_int(query, "instructor_id"), query_value(query, "branch"))
+    student_id = query_int(query, "student_id")
+    if student_id is not None:
+        where += (" AND " if where else " WHERE ") + "student_id = ?"
+        params.append(student_id)
+    return page_of(columns, f"SELECT {', '.join(columns)} FROM lessons{where}", params, query, db)
+
+
+# Body: student_id, instructor_id, lesson_type, date, start_time, and
+# optionally duration (default: the lesson type's), status, and for a series
+# count, every_days and skip_clashes. "confirmed": true books a lesson type
+# whose prerequisites (services.PREREQUISITES) the student took elsewhere.
+def add_lesson(db, query, body):
+    student_id = body_int(body, "student_id")
+    instructor_id = body_int(body, "instructor_id")
+    lesson_type = body.get("lesson_type")
+    if student_id is None or instructor_id is None or not lesson_type:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Fields required: student_id, instructor_id, lesson_type, date, "
+                                                "start_time")
+    booking = services.Booking(student_id, instructor_id, lesson_type, body.get("date"), body.get("start_time"),
+                               body_int(body, "duration"), body.get("status", "Unpaid"), body.get("confirmed") is True)
+    count = body_int(body, "count", 1)
+    if count == 1:
+        return HTTPStatus.CREATED, get_row("lessons", services.book(booking, db), db)
+
+    occurrences = services.book_recurring(booking, count, body_int(body, "every_days", 7),
+                                          bool(body.get("skip_clashes")), db)
+    booked = any(occurrence.lesson_id is not None for occurrence in occurrences)
+    return (HTTPStatus.CREATED if booked else HTTPStatus.CONFLICT,
+            {"lessons": [dict(occurrence._asdict(), clashes=[clash._asdict() for clash in occurrence.clashes])
+                         for occurrence in occurrences]})
+
+
+# Any of date, start_time (blank: untimed), duration and status; the others
+# stay as they are
+def update_lesson(db, query, body, lesson_id):
+    lesson = get_row("lessons", lesson_id, db)
+    unknown = set(body) - {"date", "start_time", "duration", "status"}
+    if unknown:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"Cannot change: {', '.join(sorted(unknown))}")
+    lesson.update(body)
+    duration = lesson["duration"]
+    if duration is None and {"date", "start_time"} & set(body):
+        duration = lesson_duration(lesson["lesson_type"], db)
+    # Fields left out of the body are passed as stored, and not checked again
+    reschedule_lesson(lesson_id, lesson["date"], lesson["start_time"] or "", duration, lesson["status"], db=db)
+    return get_row("lessons", lesson_id, db)
+
+
+def list_lesson_types(db, query, body):
+    return {"items": [lesson_type._asdict() for lesson_type in lesson_types(db).values()]}
+
+
+def free_slots(db, query, body):
+    lesson_type = query_value(query, "lesson_type")
+    if not lesson_type:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "lesson_type is required")
+    instructor_ids = [int(value) for value in query.get("instructor_id", []) if value.isdigit()] or None
+    slots = find_slots(lesson_type, query_value(query, "date_from"), query_value(query, "date_to"),
+                       instructor_ids, query_int(query, "student_id"),
+                       min(query_int(query, "limit", 10), MAX_PAGE_SIZE), db=db)
+    return {"items": [slot._asdict() for slot in slots]}
+
+
+# --- Reports ---
+def dashboard(db, query, body):
+    return dashboard_summary(query_int(query, "months", 12), query_int(query, "top", 10), db=db)._asdict()
+
+
+# Body: optional date_from, date_to, branch, rows_per_volume. The PDFs are
+# written on the server, as the Print Report button does.
+def print_report(db, query, body):
+    rows_per_volume = body_int(body, "rows_per_volume")
+    if rows_per_volume is not None and rows_per_volume <= 0:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "rows_per_volume must be a positive whole number")
+    paths = write_report(REPORT_PATH, body.get("date_from"), body.get("date_to"), body.get("branch"),
+                         rows_per_volume, db=db)
+    return {"paths": paths}
+
+
+ROW_ID = r"(\d+)"
+
+# (method, path pattern, handler); handler(db, query, body, *path ids) returns
+# a JSON-able value or (status, value)
+ROUTES = [
+    ("GET", r"/students", list_people("students")),
+    ("POST", r"/students", add_person("students")),
+    ("GET", rf"/students/{ROW_ID}", show_row("students")),
+    ("PATCH", rf"/students/{ROW_ID}", update_person("students")),
+    ("DELETE", rf"/students/{ROW_ID}", delete_row("students")),
+    ("GET", rf"/students/{ROW_ID}/progress", student_progress),
+    ("GET", r"/instructors", list_people("instructors")),
+    ("POST", r"/instructors", add_person("instructors")),
+    ("GET", rf"/instructors/{ROW_ID}", show_row("instructors")),
+    ("PATCH", rf"/instructors/{ROW_ID}", update_person("instructors")),
+    ("DELETE", rf"/instructors/{ROW_ID}", delete_row("instructors")),
+    ("GET", r"/lessons", list_lessons),
+    ("POST", r"/lessons", add_lesson),
+    ("GET", rf"/lessons/{ROW_ID}", show_row("lessons")),
+    ("PATCH", rf"/lessons/{ROW_ID}", update_lesson),
+    ("DELETE", rf"/lessons/{ROW_ID}", delete_row("lessons")),
+    ("GET", r"/lesson-types", list_lesson_types),
+    ("GET", r"/slots", free_slots),
+    ("GET", r"/reports/dashboard", dashboard),
+    ("POST", r"/reports/print", print_report),
+]
+ROUTES = [(method, re.compile(pattern + "/?"), handler) for method, pattern, handler in ROUTES]
+
+
+def find_route(method, path):
+    allowed = False
+    for route_method, pattern, handler in ROUTES:
+        match = pattern.fullmatch(path)
+        if match:
+            if route_method == method:
+                return handler, [int(row_id) for row_id in match.groups()]
+            allowed = True
+    if allowed:
+        raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} is not allowed on {path}")
+    raise HTTPError(HTTPStatus.NOT_FOUND, f"No such resource: {path}")
+
+
+# Run a handler on a worker thread and turn its outcome into (status, body)
+def call_handler(handler, db, query, body, row_ids):
+    try:
+        result = handler(db, query, body, *row_ids)
+    except HTTPError as e:
+        return e.status, {"error": str(e), **e.details}
+    except BookingConflict as e:
+        return HTTPStatus.CONFLICT, {"error": str(e), "clashes": [clash._asdict() for clash in e.clashes]}
+    except ValueError as e:
+        return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+    except sqlite3.IntegrityError as e:
+        return HTTPStatus.CONFLICT, {"error": str(e)}
+    except sqlite3.OperationalError as e:
+        # Still locked after database.py's retries
+        return HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(e)}
+    if isinstance(result, tuple):
+        return result
+    return HTTPStatus.OK, result
+
+
+class ApiServer:
+    def __init__(self, db=None, workers=DB_WORKERS, max_pending=MAX_PENDING):
+        self.db = db or get_db()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-worker")
+        self.max_pending = max_pending
+        self.pending = 0
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.pool.shutdown(wait=True)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self.read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                status, payload = await self.respond(method, target, headers, body)
+                self.write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HTTPError as e:
+            # Malformed request: answer it, then drop the connection
+            self.write_response(writer, e.status, {"error": str(e)}, False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # (method, target, version, headers, body), or None once the client has
+    # closed the connection
+    async def read_request(self, reader):
+        try:
+            line = await reader.readline()
+        except ValueError:
+            raise HTTPError(HTTPStatus.REQUEST_URI_TOO_LONG, "Request line too long") from None
+        if not line:
+            return None
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3 or not parts[2].startswith("HTTP/1."):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+        method, target, version = parts
+
+        headers = {}
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Header too long") from None
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED, "Send a Content-Length instead of chunked encoding")
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length") from None
+        if not 0 <= length <= MAX_BODY:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Body over {MAX_BODY} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, version, headers, body
+
+    async def respond(self, method, target, headers, raw_body):
+        url = urlsplit(target)
+        try:
+            handler, row_ids = find_route(method, url.path)
+            body = {}
+            if raw_body:
+                try:
+                    body = json.loads(raw_body)
+                except ValueError:
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be JSON") from None
+                if not isinstance(body, dict):
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+
+        if self.pending >= self.max_pending:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Server busy, try again"}
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.pool, call_handler, handler, self.db,
+                                              parse_qs(url.query), body, row_ids)
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+        finally:
+            self.pending -= 1
+
+    def write_response(self, writer, status, payload, keep_alive):
+        status = HTTPStatus(status)
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        head = [f"HTTP/1.1 {status.value} {status.phrase}",
+                "Content-Type: application/json; charset=utf-8",
+                f"Content-Length: {len(body)}"]
+        if keep_alive:
+            head += ["Connection: keep-alive", f"Keep-Alive: timeout={KEEP_ALIVE_TIMEOUT}"]
+        else:
+            head.append("Connection: close")
+        if status == HTTPStatus.SERVICE_UNAVAILABLE:
+            head.append("Retry-After: 1")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+
+
+async def serve(host, port, workers):
+    api = ApiServer(workers=workers)
+    server = await api.start(host, port)
+    print(f"Serving on http://{host}:{server.sockets[0].getsockname()[1]}", flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        await api.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP/JSON API for the driving school database")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: this machine only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=DB_WORKERS, help="database worker threads")
+    parser.add_argument("--db", help="database file (default: the application's)")
+    args = parser.parse_args()
+
+    if args.db:
+        set_db_path(args.db)
+    migrate(get_db())
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# Load test: api.py serving a seeded database, driven by several client
+# processes over kept-alive connections (or a new connection per request
+# with --no-keep-alive). Prints requests per second and p50/p99 latency per
+# endpoint.
+#
+#   python benchmarks/bench_api.py [--clients 8] [--seconds 10] [--workers 4] [--writes 0.05]
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from bookings import format_time  # noqa: E402
+from database import Database  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+FIRST_DAY = date.today() + timedelta(days=1)  # the API refuses bookings in the past
+DAYS = 120
+STUDENTS = 20000
+INSTRUCTORS = 50
+
+# (name, weight, path for a random row); "book" and "update" are the writes
+READS = [
+    ("search students", 4, lambda rng: f"/students?q=Student+{rng.randint(1, 999)}&limit=20"),
+    ("student", 4, lambda rng: f"/students/{rng.randint(1, STUDENTS)}"),
+    ("student lessons", 4, lambda rng: f"/lessons?student_id={rng.randint(1, STUDENTS)}"),
+    ("lessons by date", 2, lambda rng: "/lessons?date_from={0}&date_to={0}&limit=50".format(
+        (FIRST_DAY + timedelta(days=rng.randrange(DAYS))).isoformat())),
+    # The booking page searches the next two weeks, so every search shares
+    # one window (and the workers' cached calendars)
+    ("free slots", 1, lambda rng: f"/slots?lesson_type=Standard&date_from={FIRST_DAY.isoformat()}"),
+    ("dashboard", 1, lambda rng: "/reports/dashboard"),
+]
+
+
+def seed(db, lessons):
+    migrate(db)
+    rng = random.Random(42)
+    with db.transaction(immediate=True) as c:
+        c.executemany("INSERT INTO instructors (name) VALUES (?)", ((f"Instructor {i}",) for i in range(INSTRUCTORS)))
+        c.executemany("INSERT INTO students (name, address, phone) VALUES (?, ?, ?)",
+                      ((f"Student {i}", f"{i} High Street", f"07{i:09d}") for i in range(STUDENTS)))
+        taken = rng.sample([(instructor_id, day, hour) for instructor_id in range(1, INSTRUCTORS + 1)
+                            for day in range(DAYS) for hour in range(8, 20)], lessons)
+        c.executemany("""INSERT INTO lessons (student_id, instructor_id, lesson_type, date, start_time, duration, status)
+                         VALUES (?, ?, 'Standard', ?, ?, 60, 'Unpaid')""",
+                      ((rng.randint(1, STUDENTS), instructor_id, (FIRST_DAY + timedelta(days=day)).isoformat(),
+                        format_time(hour * 60)) for instructor_id, day, hour in taken))
+    db.execute("ANALYZE")
+
+
+def request(rng, writes):
+    if rng.random() < writes:
+        if rng.random() < 0.5:
+            return "book", "POST", "/lessons", {
+                "student_id": rng.randint(1, STUDENTS), "instructor_id": rng.randint(1, INSTRUCTORS),
+                "lesson_type": "Standard", "date": (FIRST_DAY + timedelta(days=rng.randrange(DAYS))).isoformat(),
+                "start_time": format_time(rng.randint(8 * 4, 19 * 4) * 15)}
+        return "update", "PATCH", f"/students/{rng.randint(1, STUDENTS)}", {"phone": f"07{rng.randrange(10 ** 9):09d}"}
+    name, _, path = rng.choices(READS, weights=[weight for _, weight, _ in READS])[0]
+    return name, "GET", path(rng), None
+
+
+def client(port, seconds, writes, keep_alive, seed_value, start, results):
+    rng = random.Random(seed_value)
+    latencies, failures = {}, {}
+    connection = None
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        name, method, path, body = request(rng, writes)
+        began = time.perf_counter()
+        if connection is None:
+            connection = http.client.HTTPConnection("127.0.0.1", port)
+        headers = {"Content-Type": "application/json"}
+        if not keep_alive:
+            headers["Connection"] = "close"
+        connection.request(method, path, json.dumps(body) if body is not None else None, headers)
+        response = connection.getresponse()
+        response.read()
+        if not keep_alive:
+            connection.close()
+            connection = None
+        latencies.setdefault(name, []).append(time.perf_counter() - began)
+        # A 409 is a booking clash: a normal answer
+        if response.status >= 400 and response.status != 409:
+            failures[name] = failures.get(name, 0) + 1
+    if connection is not None:
+        connection.close()
+    results.put((latencies, failures))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP API load test")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=4, help="API database worker threads")
+    parser.add_argument("--writes", type=float, default=0.05, help="share of requests that write")
+    parser.add_argument("--lessons", type=int, default=50000)
+    parser.add_argument("--no-keep-alive", dest="keep_alive", action="store_false")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "api.db")
+        db = Database(path)
+        seed(db, args.lessons)
+        db.close()
+
+        port = free_port()
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, "api.py"), "--db", path, "--port", str(port),
+                                   "--workers", str(args.workers)], stdout=subprocess.PIPE, text=True)
+        try:
+            server.stdout.readline()  # "Serving on ..."
+            start = multiprocessing.Event()
+            results = multiprocessing.Queue()
+            clients = [multiprocessing.Process(target=client, args=(port, args.seconds, args.writes, args.keep_alive,
+                                                                    n, start, results))
+                       for n in range(args.clients)]
+            for process in clients:
+                process.start()
+            start.set()
+            latencies, failures = {}, {}
+            for _ in clients:
+                client_latencies, client_failures = results.get()
+                for name, values in client_latencies.items():
+                    latencies.setdefault(name, []).extend(values)
+                for name, count in client_failures.items():
+                    failures[name] = failures.get(name, 0) + count
+            for process in clients:
+                process.join()
+        finally:
+            server.terminate()
+            server.wait()
+
+    total = sum(len(values) for values in latencies.values())
+    every = sorted(value for values in latencies.values() for value in values)
+    print(f"{args.clients} clients, {args.workers} workers, {args.seconds} s, "
+          f"keep-alive {'on' if args.keep_alive else 'off'}, {args.writes:.0%} writes")
+    print(f"  {'endpoint':<16} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name in [name for name, _, _ in READS] + ["book", "update"]:
+        values = sorted(latencies.get(name, []))
+        if values:
+            print(f"  {name:<16} {len(values):>9} {len(values) / args.seconds:>8.0f} {percentile(values, 0.5):>8.2f} "
+                  f"{percentile(values, 0.99):>8.2f} {failures.get(name, 0):>7}")
+    print(f"  {'all':<16} {total:>9} {total / args.seconds:>8.0f} {percentile(every, 0.5):>8.2f} "
+          f"{percentile(every, 0.99):>8.2f} {sum(failures.values()):>7}")
+
+
+if __name__ == "__main__":
+    main()
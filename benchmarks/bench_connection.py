@@ -0,0 +1,92 @@
+# Micro-benchmark: per-operation latency of the old per-call
+# sqlite3.connect("driving_school.db") pattern versus the shared Database.
+#
+#   python benchmarks/bench_connection.py [--students 100000] [--ops 2000]
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from database import Database  # noqa: E402
+
+
+def seed(path, students):
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE students (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT,
+                    address TEXT,
+                    phone TEXT,
+                    progress TEXT,
+                    payment_status TEXT)''')
+    rows = ((f"Student {i}", f"{i} High Street", f"07{i:09d}", f"Level {i % 10 + 1}",
+             "Paid" if i % 2 else "Unpaid") for i in range(students))
+    conn.executemany("INSERT INTO students (name, address, phone, progress, payment_status) VALUES (?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+# The pattern every handler used before: connect, run one statement, close
+def old_lookup(path, student_id):
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute("SELECT * FROM students WHERE id=?", (student_id,))
+    row = c.fetchone()
+    conn.close()
+    return row
+
+
+def old_update(path, student_id):
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute("UPDATE students SET phone=? WHERE id=?", ("07000000000", student_id))
+    conn.commit()
+    conn.close()
+
+
+def new_lookup(db, student_id):
+    return db.query_one("SELECT * FROM students WHERE id=?", (student_id,))
+
+
+def new_update(db, student_id):
+    db.execute("UPDATE students SET phone=? WHERE id=?", ("07000000000", student_id))
+
+
+def time_op(fn, arg, ids):
+    start = time.perf_counter()
+    for student_id in ids:
+        fn(arg, student_id)
+    return (time.perf_counter() - start) / len(ids) * 1e6  # microseconds per op
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Connection micro-benchmark")
+    parser.add_argument("--students", type=int, default=100_000)
+    parser.add_argument("--ops", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path, args.students)
+        ids = [random.randint(1, args.students) for _ in range(args.ops)]
+        db = Database(path)
+
+        results = [
+            ("lookup by id", time_op(old_lookup, path, ids), time_op(new_lookup, db, ids)),
+            ("update + commit", time_op(old_update, path, ids), time_op(new_update, db, ids)),
+        ]
+        db.close()
+
+    print(f"{args.students} students, {args.ops} operations each")
+    print(f"{'operation':<18}{'per-call connect':>18}{'shared Database':>18}{'speedup':>10}")
+    for name, old, new in results:
+        print(f"{name:<18}{old:>15.1f} us{new:>15.1f} us{old / new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Benchmark: bulk CSV import with importer.import_csv(). Writes CSV files of
+# students, instructors and lessons, imports them into an empty database and
+# reports rows per second for each.
+#
+#   python benchmarks/bench_import.py [--lessons 1000000] [--batch-size 5000]
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from database import Database  # noqa: E402
+from importer import BATCH_SIZE, import_csv  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+LESSON_TYPES = ["Introductory", "Standard", "Pass Plus", "Driving Test"]
+STATUSES = ["Paid", "Unpaid"]
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def write_files(tmp, lessons, students, instructors):
+    rng = random.Random(11)
+    paths = {kind: os.path.join(tmp, f"{kind}.csv") for kind in ("students", "instructors", "lessons")}
+    write_csv(paths["students"], ["name", "address", "phone", "progress", "payment_status", "branch"],
+              ((f"Student {i}", f"{i} High Street", "07000000000", "Level 1", rng.choice(STATUSES), "North")
+               for i in range(students)))
+    write_csv(paths["instructors"], ["name", "phone", "email", "instructor_type", "branch"],
+              ((f"Instructor {i}", "07000000000", f"i{i}@example.com", "Full-time", "North")
+               for i in range(instructors)))
+    write_csv(paths["lessons"], ["student_id", "instructor_id", "lesson_type", "date", "status"],
+              ((rng.randint(1, students), rng.randint(1, instructors), rng.choice(LESSON_TYPES),
+                f"2025-{rng.randint(1, 12)}-{rng.randint(1, 28)}", rng.choice(STATUSES))
+               for _ in range(lessons)))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk CSV import benchmark")
+    parser.add_argument("--lessons", type=int, default=1_000_000)
+    parser.add_argument("--students", type=int, default=100_000)
+    parser.add_argument("--instructors", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_files(tmp, args.lessons, args.students, args.instructors)
+        db = Database(os.path.join(tmp, "bench.db"))
+        migrate(db)
+
+        print(f"{'file':<14}{'rows':>10}{'seconds':>10}{'rows/s':>12}")
+        for kind in ("students", "instructors", "lessons"):
+            start = time.perf_counter()
+            result = import_csv(kind, paths[kind], batch_size=args.batch_size, db=db)
+            elapsed = time.perf_counter() - start
+            print(f"{kind:<14}{result.imported:>10}{elapsed:>10.1f}{result.imported / elapsed:>12,.0f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# Switch latency of the sidebar panels (Student, Instructor, Lesson
+# Management and Reporting), from the click to the panel being painted:
+#   build   - the panel built from scratch, as every click used to do
+#   switch  - back to a kept panel whose data has not changed
+#   changed - back to a kept panel after its tables changed; its lists reload
+#             (the second figure is until the reloaded rows are shown)
+# Each panel has its list or dashboard on show, as a clerk would leave it.
+# Needs a display.
+#
+#   python benchmarks/bench_panels.py [--db big.db] [--rounds 10]
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tkinter as tk
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # the logo is found relative to the working directory
+
+import main as desk  # noqa: E402
+from cache import invalidate  # noqa: E402
+from database import set_db_path  # noqa: E402
+
+# Panel class -> what the clerk has open in it
+PANELS = [
+    (desk.StudentManagement, lambda panel: panel.view_students()),
+    (desk.InstructorManagement, lambda panel: panel.view_instructors()),
+    (desk.LessonManagement, lambda panel: panel.view_lessons()),
+    (desk.Reporting, lambda panel: panel.show_report()),
+]
+
+
+# Process Tk events until the background jobs are done
+def settle(root, app, timeout=30):
+    deadline = time.perf_counter() + timeout
+    root.update()
+    while app.executor.jobs and time.perf_counter() < deadline:
+        time.sleep(0.001)
+        root.update()
+
+
+def timed_open(root, app, window_class):
+    began = time.perf_counter()
+    app.open_management_window(window_class)
+    root.update()
+    painted = time.perf_counter()
+    settle(root, app)
+    return (painted - began) * 1000, (time.perf_counter() - began) * 1000
+
+
+def forget_panels(app):
+    for frame, _, _ in app.panels.values():
+        frame.destroy()
+    app.panels.clear()
+    app.current_panel = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sidebar panel switch latency")
+    parser.add_argument("--db", default=os.path.join(ROOT, "driving_school.db"), help="copied, not changed")
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        sys.exit(f"needs a display: {e}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "panels.db")
+        shutil.copyfile(args.db, db_path)
+        set_db_path(db_path)
+        desk.create_db()
+        app = desk.Application(root)
+        settle(root, app)
+
+        results = {window_class: {"build": [], "switch": [], "changed": [], "changed, rows shown": []}
+                   for window_class, _ in PANELS}
+        for _ in range(args.rounds):
+            # Built from scratch each time (the old behaviour)
+            for window_class, show in PANELS:
+                forget_panels(app)
+                results[window_class]["build"].append(timed_open(root, app, window_class)[0])
+                show(app.panels[window_class][1])
+                settle(root, app)
+
+            # Kept panels: every panel is built, with its list on show
+            for window_class, show in PANELS:
+                app.open_management_window(window_class)
+                show(app.panels[window_class][1])
+                settle(root, app)
+            for window_class, _ in PANELS:
+                results[window_class]["switch"].append(timed_open(root, app, window_class)[0])
+            for window_class, _ in PANELS:
+                invalidate(*window_class.TABLES)
+                painted, shown = timed_open(root, app, window_class)
+                results[window_class]["changed"].append(painted)
+                results[window_class]["changed, rows shown"].append(shown)
+        app.on_close()
+
+    columns = list(results[PANELS[0][0]])
+    print(f"median ms over {args.rounds} rounds")
+    print(f"  {'panel':<22}" + "".join(f"{column:>22}" for column in columns))
+    for window_class, timings in results.items():
+        print(f"  {window_class.__name__:<22}" +
+              "".join(f"{statistics.median(timings[column]):>22.1f}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Benchmark: peak memory and wall time of reports.write_report() for growing
+# numbers of lessons. Each report is written in a fresh child process so its
+# peak RSS is measured on its own.
+#
+#   python benchmarks/bench_report.py [--lessons 10000 100000 1000000] [--rows-per-volume 50000]
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from database import Database  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+LESSON_TYPES = ["Introductory Lesson", "Standard Lesson", "Pass Plus", "Driving Test"]
+STATUSES = ["Paid", "Unpaid", "Cancelled"]
+
+
+def seed(db, lessons):
+    migrate(db)
+    rng = random.Random(7)
+    students = max(1, lessons // 10)
+    instructors = 200
+    with db.transaction() as c:
+        c.executemany("INSERT INTO students (name, address, phone, progress, payment_status, branch) "
+                      "VALUES (?, ?, ?, ?, ?, ?)",
+                      ((f"Student {i}", f"{i} High Street", "07000000000", "Level 1", "Unpaid",
+                        f"Branch {i % 5}") for i in range(students)))
+        c.executemany("INSERT INTO instructors (name, phone, email, instructor_type, branch) VALUES (?, ?, ?, ?, ?)",
+                      ((f"Instructor {i}", "07000000000", f"i{i}@example.com", "Full-time",
+                        f"Branch {i % 5}") for i in range(instructors)))
+        c.executemany("INSERT INTO lessons (student_id, instructor_id, lesson_type, date, status, student_name, "
+                      "instructor_name) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                      ((s, t, rng.choice(LESSON_TYPES), f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                        rng.choice(STATUSES), f"Student {s - 1}", f"Instructor {t - 1}")
+                       for s, t in ((rng.randint(1, students), rng.randint(1, instructors))
+                                    for _ in range(lessons))))
+
+
+# Child process: write the report and print the measurements as JSON
+def run_child(db_path, out_dir, rows_per_volume):
+    from reports import write_report
+
+    start = time.perf_counter()
+    paths = write_report(os.path.join(out_dir, "report.pdf"), rows_per_volume=rows_per_volume,
+                         db=Database(db_path))
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": peak_kb / 1024, "volumes": len(paths),
+                      "bytes": sum(os.path.getsize(p) for p in paths)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF report benchmark")
+    parser.add_argument("--lessons", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--rows-per-volume", type=int, default=50_000)
+    parser.add_argument("--child", nargs=2, metavar=("DB", "OUT_DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child, args.rows_per_volume or None)
+        return
+
+    print(f"{'lessons':>10}{'wall time':>12}{'peak RSS':>12}{'volumes':>9}{'PDF size':>12}")
+    for lessons in args.lessons:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            db = Database(db_path)
+            seed(db, lessons)
+            db.close()
+
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", db_path, tmp,
+                                     "--rows-per-volume", str(args.rows_per_volume)],
+                                    check=True, capture_output=True, text=True).stdout
+            result = json.loads(output)
+            print(f"{lessons:>10}{result['seconds']:>10.1f} s{result['peak_rss_mb']:>9.1f} MB"
+                  f"{result['volumes']:>9}{result['bytes'] / 1e6:>9.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
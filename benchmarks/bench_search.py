@@ -0,0 +1,72 @@
+# Benchmark: student name search with name LIKE '%term%' versus the FTS5
+# index used by search.search_names() and the in-memory prefix index behind
+# the type-ahead pickers (search.NameIndex).
+#
+#   python benchmarks/bench_search.py [--students 500000]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from database import Database  # noqa: E402
+from migrations import migrate  # noqa: E402
+from search import name_index, search_names  # noqa: E402
+
+FIRST_NAMES = ["Shourav", "Ratna", "Mehedi", "Akkas", "Monuara", "James", "Olivia", "Amelia", "Noah",
+               "Isla", "George", "Ava", "Arthur", "Mia", "Leo", "Grace", "Oscar", "Freya", "Harry", "Ivy"]
+LAST_NAMES = ["Smith", "Jones", "Taylor", "Brown", "Williams", "Wilson", "Johnson", "Davies", "Patel",
+              "Khan", "Ahmed", "Hossain", "Rahman", "Evans", "Thomas", "Roberts", "Walker", "Wright"]
+
+
+def seed(db, students):
+    migrate(db)
+    rng = random.Random(42)
+    rows = ((f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}{i}", "Somewhere", "07000000000",
+             "Level 1", "Unpaid") for i in range(students))
+    with db.transaction() as c:
+        c.executemany("INSERT INTO students (name, address, phone, progress, payment_status) VALUES (?, ?, ?, ?, ?)", rows)
+    db.execute("ANALYZE")
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Name search benchmark")
+    parser.add_argument("--students", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        seed(db, args.students)
+
+        start = time.perf_counter()
+        index = name_index("students", db=db)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        print(f"{args.students} students (best of {args.repeat}); prefix index built in {build_ms:.0f} ms")
+        print(f"{'term':<16}{'LIKE %term%':>16}{'FTS5':>16}{'FTS5 first 50':>16}{'prefix top 8':>16}")
+        for term in ["Smith12345", "Ratna Khan", "Hoss", "Mehedi Rahman4"]:
+            like_ms, like_rows = timed(lambda: db.query("SELECT id, name FROM students WHERE name LIKE ?",
+                                                        ('%' + term + '%',)), args.repeat)
+            fts_ms, fts_rows = timed(lambda: search_names("students", term, db=db), args.repeat)
+            page_ms, _ = timed(lambda: search_names("students", term, limit=50, db=db), args.repeat)
+            prefix_ms, _ = timed(lambda: index.search(term, 8), args.repeat)
+            print(f"{term:<16}{like_ms:>10.2f} ms ({like_rows}){fts_ms:>8.2f} ms ({fts_rows}){page_ms:>10.2f} ms"
+                  f"{prefix_ms:>13.3f} ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Benchmark: scheduling.find_slots() over a busy calendar, cold (bitmaps
+# built from the lessons table) and warm (bitmaps reused).
+#
+#   python benchmarks/bench_slots.py [--instructors 200] [--days 90] [--lessons-per-day 6]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bookings import book_lesson, format_time  # noqa: E402
+from database import Database  # noqa: E402
+from migrations import migrate  # noqa: E402
+from scheduling import find_slots  # noqa: E402
+
+FIRST_DAY = date(2026, 1, 5)
+NOW = datetime(2026, 1, 5)  # bookings and searches leave out times before this
+
+
+def seed(db, instructors, days, lessons_per_day):
+    migrate(db)
+    rng = random.Random(42)
+    with db.transaction() as c:
+        c.executemany("INSERT INTO instructors (name) VALUES (?)", ((f"Instructor {i}",) for i in range(instructors)))
+        c.executemany("INSERT INTO students (name) VALUES (?)", ((f"Student {i}",) for i in range(instructors * 20)))
+        rows = []
+        for instructor_id in range(1, instructors + 1):
+            for day in range(days):
+                lesson_date = (FIRST_DAY + timedelta(days=day)).isoformat()
+                # Hourly lessons at random hours of the working day
+                for hour in rng.sample(range(8, 20), lessons_per_day):
+                    rows.append((rng.randint(1, instructors * 20), instructor_id, "Standard", lesson_date,
+                                 format_time(hour * 60), 60, "Unpaid"))
+        c.executemany("""INSERT INTO lessons (student_id, instructor_id, lesson_type, date, start_time, duration, status)
+                         VALUES (?, ?, ?, ?, ?, ?, ?)""", rows)
+    db.execute("ANALYZE")
+    return len(rows)
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Slot finder benchmark")
+    parser.add_argument("--instructors", type=int, default=200)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--lessons-per-day", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        lessons = seed(db, args.instructors, args.days, args.lessons_per_day)
+        date_from = FIRST_DAY.isoformat()
+        date_to = (FIRST_DAY + timedelta(days=args.days - 1)).isoformat()
+
+        def search(**options):
+            return find_slots("Standard", date_from, date_to, now=NOW, db=db, **options)
+
+        cold_ms, _ = timed(search, 1)
+        print(f"{args.instructors} instructors, {args.days} days, {lessons} lessons")
+        print(f"cold (build bitmaps) {cold_ms:>9.2f} ms")
+        for label, options in [("all instructors", {}),
+                               ("+ student", {"student_id": 7}),
+                               ("3 preferred", {"instructor_ids": [3, 50, 150]}),
+                               ("50 slots", {"limit": 50})]:
+            ms, slots = timed(lambda: search(**options), args.repeat)
+            print(f"{label:<20} {ms:>9.2f} ms  first: {slots[0].date} {slots[0].start_time} "
+                  f"instructor {slots[0].instructor_id}")
+
+        # A booking by this workstation, then one by another connection:
+        # both are patched in from the calendar change log
+        book_lesson(1, 2, "Standard", date_from, "08:00", now=NOW, db=db)
+        ms, slots = timed(search, 1)
+        print(f"after a booking      {ms:>9.2f} ms  first: {slots[0].date} {slots[0].start_time} "
+              f"instructor {slots[0].instructor_id}")
+        other = Database(db.path)
+        book_lesson(2, slots[0].instructor_id, "Standard", date_from, slots[0].start_time, now=NOW, db=other)
+        other.close()
+        ms, slots = timed(search, 1)
+        print(f"after another's      {ms:>9.2f} ms  first: {slots[0].date} {slots[0].start_time} "
+              f"instructor {slots[0].instructor_id}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Startup time of the desk application: fresh processes that import main,
+# open and migrate the database and build the main window up to its first
+# paint, as a double-click launch does. Prints the median of each phase and
+# of the whole launch, and exits 1 if the launch is slower than --target ms.
+# Without a display only the import and the database are timed.
+#
+# One untimed launch first writes the bytecode cache (kept under a temporary
+# PYTHONPYCACHEPREFIX, as an installed copy would have it) and the resized
+# logo, so the runs measure an everyday start, not the first one.
+#
+#   python benchmarks/bench_startup.py [--runs 10] [--db driving_school.db] [--target 300]
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Runs in each child; prints the phases in ms as JSON
+LAUNCH = """
+import sys, time
+began = time.perf_counter()
+import main
+imported = time.perf_counter()
+from database import set_db_path
+set_db_path(sys.argv[1])
+main.create_db()
+migrated = time.perf_counter()
+phases = {"import": imported - began, "database": migrated - imported}
+try:
+    import tkinter as tk
+    root = tk.Tk()
+except Exception:
+    root = None
+if root is not None:
+    app = main.Application(root)
+    root.update()
+    phases["first paint"] = time.perf_counter() - migrated
+print(__import__("json").dumps({name: seconds * 1000 for name, seconds in phases.items()}), flush=True)
+if root is not None:
+    root.destroy()
+"""
+
+
+def launch(db_path, env):
+    began = time.perf_counter()
+    child = subprocess.Popen([sys.executable, "-c", LAUNCH, db_path], cwd=ROOT, env=env, stdout=subprocess.PIPE,
+                             text=True)
+    line = child.stdout.readline()
+    total = (time.perf_counter() - began) * 1000
+    child.communicate()
+    if child.returncode or not line:
+        raise SystemExit(f"launch failed with status {child.returncode}")
+    phases = json.loads(line)
+    phases["launch"] = total
+    return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Desk application startup time")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--db", default=os.path.join(ROOT, "driving_school.db"), help="copied, not changed")
+    parser.add_argument("--target", type=float, default=300, help="launch time to stay under, in ms")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "startup.db")
+        shutil.copyfile(args.db, db_path)
+        env = dict(os.environ, PYTHONPYCACHEPREFIX=os.path.join(tmp, "pycache"))
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        launch(db_path, env)
+        runs = [launch(db_path, env) for _ in range(args.runs)]
+
+    print(f"{args.runs} launches (median ms; launch includes starting Python)")
+    for phase in runs[0]:
+        print(f"  {phase:<12} {statistics.median(run[phase] for run in runs):8.1f}")
+    if "first paint" not in runs[0]:
+        print("  (no display: first paint not timed)")
+    launch_ms = statistics.median(run["launch"] for run in runs)
+    print(f"target {args.target:.0f} ms: {'met' if launch_ms <= args.target else 'MISSED'}")
+    if launch_ms > args.target:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# Synthetic driving school data at a chosen scale, for benchmarks and for
+# trying the app on something bigger than the bundled three students. The
+# same --seed, --start and --today give the same database.
+#
+# Scale follows the lesson count: a student takes about LESSONS_PER_STUDENT
+# lessons and an instructor teaches about LESSONS_PER_INSTRUCTOR, spread over
+# --days days from --start (by default two years of history and one ahead).
+# Each lesson gets its own instructor slot (one hour between 08:00 and
+# 20:00), so instructors are never double booked. Lessons before --today are
+# mostly paid, with a payment row each.
+#
+# Rows are generated and inserted BATCH_SIZE at a time through the importer's
+# bulk lesson path, so memory stays flat from 1k to 10M lessons.
+#
+#   python benchmarks/generate_data.py big.db --lessons 1000000 [--seed 1]
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from math import gcd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bookings import format_time  # noqa: E402
+from catalog import lesson_types  # noqa: E402
+from database import Database  # noqa: E402
+from importer import insert_lessons  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+BATCH_SIZE = 50000
+LESSONS_PER_STUDENT = 20
+LESSONS_PER_INSTRUCTOR = 2000
+FIRST_HOUR = 8
+HOURS_PER_DAY = 12
+
+FIRST_NAMES = ["Aisha", "Ben", "Chloe", "Daniel", "Ella", "Farhan", "Grace", "Harry", "Isla", "Jack", "Kavya",
+               "Liam", "Maya", "Noah", "Olivia", "Priya", "Quinn", "Ratna", "Sophie", "Shourav", "Tom", "Uma",
+               "Victor", "Wei", "Xavier", "Yasmin", "Zoe", "Åsa", "José", "Zoë", "Mohammed", "Fatima", "Oliver",
+               "Amelia", "George", "Ava", "Arjun", "Mia", "Leo", "Freya"]
+LAST_NAMES = ["Smith", "Jones", "Taylor", "Brown", "Williams", "Wilson", "Johnson", "Davies", "Patel", "Khan",
+              "Sarkar", "Ahmed", "Evans", "Thomas", "Roberts", "Walker", "Wright", "Robinson", "Thompson", "White",
+              "Hughes", "Edwards", "Green", "Hall", "Wood", "Harris", "Lewis", "Martin", "Jackson", "Clarke",
+              "Nguyen", "Chen", "Singh", "Begum", "Kowalski", "O'Brien", "García", "Müller", "Rossi", "Novak"]
+STREETS = ["High Street", "Station Road", "Church Lane", "Park Avenue", "Mill Road", "Victoria Road", "Green Lane",
+           "Manor Road", "Kings Road", "Queens Road"]
+TOWNS = ["London", "Leeds", "Bristol", "Leicester", "Luton", "Reading", "Slough", "Croydon", "Dhaka", "Savar"]
+BRANCHES = ["North", "South", "East", "West", "Central"]
+INSTRUCTOR_TYPES = ["Full-time", "Part-time"]
+# Lesson types by how often they are booked; names not in the catalog are skipped
+LESSON_MIX = {"Introductory": 10, "Standard": 70, "Pass Plus": 8, "Driving Test": 12}
+PAID_SHARE = 0.85  # of lessons before today
+
+
+def person_name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def phone(rng):
+    return f"07{rng.randrange(10 ** 9):09d}"
+
+
+def insert_people(c, table, sql, rows):
+    first_id = c.execute(f"SELECT IFNULL(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+    names = []
+    batch = []
+    for row in rows:
+        batch.append(row)
+        names.append(row[0])
+        if len(batch) >= BATCH_SIZE:
+            c.executemany(sql, batch)
+            batch = []
+    c.executemany(sql, batch)
+    return first_id, names
+
+
+# Generate into db (an empty, migrated database); returns the row counts
+def generate(db, lessons, students=None, instructors=None, start=None, days=3 * 365, seed=1, today=None,
+             progress=None):
+    rng = random.Random(seed)
+    students = students or max(1, lessons // LESSONS_PER_STUDENT)
+    instructors = instructors or max(1, -(-lessons // LESSONS_PER_INSTRUCTOR))
+    today = today or date.today()
+    start = start or today - timedelta(days=2 * 365)
+    today = today.isoformat()
+    catalog = lesson_types(db)
+    mix = [(name, weight) for name, weight in LESSON_MIX.items() if name in catalog] or [(next(iter(catalog)), 1)]
+    type_names = [name for name, _ in mix]
+    type_weights = [weight for _, weight in mix]
+
+    slots = instructors * days * HOURS_PER_DAY
+    if lessons > slots:
+        raise ValueError(f"{lessons} lessons do not fit {instructors} instructors over {days} days")
+    # Walking the slots with a stride coprime to their number visits each
+    # one once, in a scattered order, without remembering which are taken
+    stride = rng.randrange(slots // 3 + 1, slots) if slots > 2 else 1
+    while gcd(stride, slots) != 1:
+        stride += 1
+    slot = rng.randrange(slots)
+
+    with db.transaction(immediate=True) as c:
+        first_student, student_names = insert_people(
+            c, "students", "INSERT INTO students (name, address, phone, progress, payment_status, branch) "
+                           "VALUES (?, ?, ?, ?, ?, ?)",
+            ((person_name(rng), f"{rng.randint(1, 250)} {rng.choice(STREETS)}, {rng.choice(TOWNS)}", phone(rng),
+              f"Level {rng.randint(1, 10)}", rng.choice(["Paid", "Unpaid"]), rng.choice(BRANCHES))
+             for _ in range(students)))
+        first_instructor, instructor_names = insert_people(
+            c, "instructors", "INSERT INTO instructors (name, phone, email, instructor_type, branch) "
+                              "VALUES (?, ?, ?, ?, ?)",
+            ((name, phone(rng), f"{name.lower().replace(' ', '.')}.{n}@example.com", rng.choice(INSTRUCTOR_TYPES),
+              rng.choice(BRANCHES))
+             for n, name in enumerate(person_name(rng) for _ in range(instructors))))
+
+    insert_sql = ("INSERT INTO lessons (student_id, student_name, instructor_id, instructor_name, lesson_type, date, "
+                  "start_time, duration, status, payment) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+    payments = 0
+    done = 0
+    while done < lessons:
+        rows, paid = [], []
+        for _ in range(min(BATCH_SIZE, lessons - done)):
+            instructor, rest = divmod(slot, days * HOURS_PER_DAY)
+            day, hour = divmod(rest, HOURS_PER_DAY)
+            slot = (slot + stride) % slots
+            student = rng.randrange(students)
+            lesson_type = rng.choices(type_names, type_weights)[0]
+            lesson_date = (start + timedelta(days=day)).isoformat()
+            status = "Paid" if lesson_date < today and rng.random() < PAID_SHARE else "Unpaid"
+            price = catalog[lesson_type].price
+            rows.append((first_student + student, student_names[student], first_instructor + instructor,
+                         instructor_names[instructor], lesson_type, lesson_date,
+                         format_time((FIRST_HOUR + hour) * 60), catalog[lesson_type].duration, status, price))
+            if status == "Paid":
+                paid.append((first_student + student, price, lesson_date))
+        with db.transaction(immediate=True) as c:
+            insert_lessons(c, insert_sql, rows)
+            c.executemany("INSERT INTO payments (student_id, amount, payment_date) VALUES (?, ?, ?)", paid)
+        done += len(rows)
+        payments += len(paid)
+        if progress:
+            progress(done, lessons)
+
+    db.execute("ANALYZE")
+    return {"students": students, "instructors": instructors, "lessons": lessons, "payments": payments}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic driving school database")
+    parser.add_argument("path", help="database file to create")
+    parser.add_argument("--lessons", type=int, default=100_000)
+    parser.add_argument("--students", type=int, help=f"default: lessons / {LESSONS_PER_STUDENT}")
+    parser.add_argument("--instructors", type=int, help=f"default: lessons / {LESSONS_PER_INSTRUCTOR}")
+    parser.add_argument("--start", type=date.fromisoformat, help="first lesson date (default: two years ago)")
+    parser.add_argument("--days", type=int, default=3 * 365, help="days lessons are spread over")
+    parser.add_argument("--today", type=date.fromisoformat, help="lessons before this are paid (default: today)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if os.path.exists(args.path):
+        parser.exit(1, f"{args.path} already exists\n")
+    db = Database(args.path)
+    migrate(db)
+    began = time.perf_counter()
+
+    def report_progress(done, total):
+        print(f"\r{done:,} / {total:,} lessons", end="", file=sys.stderr, flush=True)
+
+    counts = generate(db, args.lessons, args.students, args.instructors, args.start, args.days, args.seed,
+                      args.today, progress=report_progress)
+    db.close()
+    print(file=sys.stderr)
+    print(", ".join(f"{count:,} {table}" for table, count in counts.items()) +
+          f" in {time.perf_counter() - began:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
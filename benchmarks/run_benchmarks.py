@@ -0,0 +1,256 @@
+# Benchmark harness: times every query path the app uses against generated
+# databases (generate_data.py) of one or more sizes, prints a table and
+# writes the results as JSON, so runs on two versions can be compared.
+#
+#   python benchmarks/run_benchmarks.py --lessons 1000 100000 1000000 [--output results.json]
+#   python benchmarks/run_benchmarks.py --lessons 100000 --compare results-before.json
+#   python benchmarks/run_benchmarks.py --db driving_school.db            (read-only paths)
+#
+# Generated databases are kept in --data-dir and reused by later runs. They
+# use fixed dates, so the same --lessons and --seed always give the same data.
+# Paths that write (booking, updating a student, recomputing progress) undo
+# their change, and only run on generated databases unless --writes is given.
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, time as clock_time, timezone
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from bookings import BookingConflict, book_lesson  # noqa: E402
+from database import Database  # noqa: E402
+from exporter import export  # noqa: E402
+from generate_data import FIRST_NAMES, LAST_NAMES, generate  # noqa: E402
+from migrations import migrate  # noqa: E402
+from pagination import fetch_page  # noqa: E402
+from progress import refresh_progress  # noqa: E402
+from reports import dashboard_summary, read_dashboard, write_report  # noqa: E402
+from scheduling import find_slots  # noqa: E402
+from search import name_index, name_search_sql, search_names  # noqa: E402
+from services import delete_rows, lesson_progress, update_students  # noqa: E402
+
+DATA_START = date(2024, 1, 1)
+DATA_TODAY = date(2026, 1, 1)
+DATA_NOW = datetime.combine(DATA_TODAY, clock_time(7, 0))  # "now" for the paths that leave out the past
+RESULTS_VERSION = 1
+
+# Columns of the View Students / View Lessons tables (main.py)
+STUDENT_COLUMNS = ["id", "name", "address", "phone", "progress", "lesson_progress", "payment_status"]
+LESSON_COLUMNS = ["id", "student_id", "student_name", "instructor_id", "instructor_name", "lesson_type", "date",
+                  "start_time", "duration", "payment", "status"]
+
+
+def search_term(rng):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return rng.choice([first[:3], f"{first[:2]} {last[:2]}", last[:4]])
+
+
+# name -> (what it stands for in the app, repeat factor, writes, run(db, rng, scratch))
+def benchmark_paths(max_student, max_instructor):
+    def random_student(rng):
+        return rng.randint(1, max_student)
+
+    def students_page(db, rng, scratch):
+        return fetch_page(*name_search_sql("students", "", STUDENT_COLUMNS, db), db=db).rows
+
+    def students_by_name(db, rng, scratch):
+        return fetch_page(*name_search_sql("students", search_term(rng), STUDENT_COLUMNS, db), db=db).rows
+
+    def lessons_by_student(db, rng, scratch):
+        return fetch_page(f"SELECT {', '.join(LESSON_COLUMNS)} FROM lessons WHERE student_id = ?",
+                          (random_student(rng),), db=db).rows
+
+    def book_and_cancel(db, rng, scratch):
+        try:
+            lesson_id = book_lesson(random_student(rng), rng.randint(1, max_instructor), "Standard",
+                                    DATA_TODAY.isoformat(), f"{rng.randint(8, 19):02d}:{rng.choice(['00', '30'])}",
+                                    now=DATA_NOW, db=db)
+        except BookingConflict:
+            return []
+        scratch.append(lesson_id)
+        return [lesson_id]
+
+    def update_student(db, rng, scratch):
+        student_id = random_student(rng)
+        phone = db.query_value("SELECT phone FROM students WHERE id = ?", (student_id,))
+        return [update_students([(student_id, {"phone": phone})], db)]
+
+    def print_report(db, rng, scratch):
+        return write_report(os.path.join(scratch.directory, "report.pdf"), rows_per_volume=50000, db=db)
+
+    def export_lessons(db, rng, scratch):
+        return [export("lessons", os.path.join(scratch.directory, "lessons.csv"), db=db)]
+
+    return {
+        "search_names": ("name search, Update/Delete Student (FTS)", 1, False,
+                         lambda db, rng, scratch: search_names("students", search_term(rng), limit=50, db=db)),
+        "name_index_search": ("type-ahead picker, Book Lesson (prefix index)", 1, False,
+                              lambda db, rng, scratch: name_index("students", db=db).search(search_term(rng))),
+        "students_page": ("View Students, first page", 1, False, students_page),
+        "students_by_name": ("View Students, searched", 1, False, students_by_name),
+        "lessons_by_student_id": ("View Lessons, search by student_id", 1, False, lessons_by_student),
+        "show_report_counts": ("show_report counts, uncached", 0.2, False,
+                               lambda db, rng, scratch: read_dashboard(12, 10, db)),
+        "show_report_cached": ("show_report counts, from the read cache", 1, False,
+                               lambda db, rng, scratch: dashboard_summary(db=db)),
+        "calculate_progress": ("calculate_progress for one student", 1, False,
+                               lambda db, rng, scratch: lesson_progress([random_student(rng)], db)),
+        "recompute_progress": ("progress recomputed from lessons, one student", 1, True,
+                               lambda db, rng, scratch: refresh_progress([random_student(rng)], db)),
+        "find_slots": ("Find Free Slots, two weeks", 0.2, False,
+                       lambda db, rng, scratch: find_slots("Standard", DATA_TODAY.isoformat(), now=DATA_NOW,
+                                                           db=db)),
+        "book_lesson": ("Book Lesson with clash check", 0.2, True, book_and_cancel),
+        "update_student": ("Update Student", 0.2, True, update_student),
+        "print_report": ("print_report, whole PDF", 0, False, print_report),
+        "export_lessons": ("Export Lessons to CSV", 0, False, export_lessons),
+    }
+
+
+class Scratch(list):
+    # Lessons a write benchmark made, to remove afterwards, and a directory
+    # for files
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def time_path(run, db, repeat, seed, scratch):
+    rng = random.Random(seed)
+    run(db, rng, scratch)  # warm up: caches, prepared statements, page cache
+    times, rows = [], 0
+    for _ in range(repeat):
+        began = time.perf_counter()
+        result = run(db, rng, scratch)
+        times.append((time.perf_counter() - began) * 1000)
+        rows += len(result) if hasattr(result, "__len__") else 1
+    times.sort()
+    return {"runs": repeat, "min_ms": times[0], "median_ms": statistics.median(times),
+            "p95_ms": percentile(times, 0.95), "max_ms": times[-1], "rows_per_run": rows / repeat}
+
+
+def dataset_path(data_dir, lessons, seed):
+    path = os.path.join(data_dir, f"lessons-{lessons}-seed-{seed}.db")
+    if not os.path.exists(path):
+        print(f"generating {lessons:,} lessons into {path}", file=sys.stderr)
+        db = Database(path + ".part")
+        migrate(db)
+        generate(db, lessons, start=DATA_START, today=DATA_TODAY, seed=seed)
+        db.close()
+        os.replace(path + ".part", path)
+    return path
+
+
+def run_dataset(path, names, repeat, writes, seed):
+    db = Database(path)
+    migrate(db)
+    counts = dict(db.query("SELECT name, value FROM summary_counts"))
+    paths = benchmark_paths(db.query_value("SELECT MAX(id) FROM students") or 1,
+                            db.query_value("SELECT MAX(id) FROM instructors") or 1)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in names:
+            description, factor, writes_data, run = paths[name]
+            if writes_data and not writes:
+                continue
+            scratch = Scratch(tmp)
+            try:
+                result = time_path(run, db, max(1, int(repeat * factor)), seed, scratch)
+            finally:
+                if scratch:
+                    delete_rows("lessons", scratch, db)
+            result["description"] = description
+            results[name] = result
+            print(f"  {name:<24}{result['median_ms']:>10.3f}{result['p95_ms']:>10.3f}{result['runs']:>6}",
+                  file=sys.stderr)
+    db.close()
+    return {"path": os.path.basename(path), "counts": counts, "results": results}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Median change per path against an earlier results file, matched by dataset
+def compare(results, old_path, threshold):
+    with open(old_path, encoding="utf-8") as f:
+        old = {dataset["counts"].get("lessons"): dataset for dataset in json.load(f)["datasets"]}
+    regressions = 0
+    print(f"\ncompared with {old_path} (median ms; regression: over {threshold:.0%} slower)")
+    for dataset in results["datasets"]:
+        before = old.get(dataset["counts"].get("lessons"))
+        if before is None:
+            continue
+        print(f"{dataset['counts'].get('lessons'):,} lessons\n  {'path':<24}{'before':>10}{'after':>10}{'change':>9}")
+        for name, result in dataset["results"].items():
+            if name not in before["results"]:
+                continue
+            old_ms, new_ms = before["results"][name]["median_ms"], result["median_ms"]
+            change = new_ms / old_ms - 1 if old_ms else 0
+            flag = "  REGRESSION" if change > threshold else ""
+            regressions += bool(flag)
+            print(f"  {name:<24}{old_ms:>10.3f}{new_ms:>10.3f}{change:>+9.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the app's query paths at several scales")
+    parser.add_argument("--lessons", type=int, nargs="+", default=[1_000, 100_000])
+    parser.add_argument("--db", help="benchmark this database instead of generated ones")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "driving-school-bench"),
+                        help="where generated databases are kept between runs")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=50, help="runs of the quick paths (slow ones run fewer)")
+    parser.add_argument("--paths", nargs="+", help="only these paths")
+    parser.add_argument("--writes", action="store_true", help="run the writing paths on --db too")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", metavar="OLD_JSON", help="report the change against an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    names = list(benchmark_paths(1, 1))
+    if args.paths:
+        unknown = set(args.paths) - set(names)
+        if unknown:
+            parser.error(f"unknown paths: {', '.join(sorted(unknown))}; choose from {', '.join(names)}")
+        names = [name for name in names if name in args.paths]
+
+    results = {"format": RESULTS_VERSION, "revision": git_revision(),
+               "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+               "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+               "platform": platform.platform(), "repeat": args.repeat, "seed": args.seed, "datasets": []}
+    if args.db:
+        datasets = [(args.db, args.writes)]
+    else:
+        os.makedirs(args.data_dir, exist_ok=True)
+        datasets = [(dataset_path(args.data_dir, lessons, args.seed), True) for lessons in args.lessons]
+    for path, writes in datasets:
+        print(f"{path}\n  {'path':<24}{'median ms':>10}{'p95 ms':>10}{'runs':>6}", file=sys.stderr)
+        results["datasets"].append(run_dataset(path, names, args.repeat, writes, args.seed))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}", file=sys.stderr)
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# Stress test: several processes (front-desk workstations) sharing one
+# database file, each running a mix of reads (name search, a student's
+# lessons, the dashboard figures) and writes (booking a lesson, editing a
+# student) for a fixed time. Prints p50/p99 latency per operation and the
+# errors and busy retries seen, once per journal mode.
+#
+#   python benchmarks/stress_concurrency.py [--processes 6] [--seconds 10] [--writes 0.2]
+#                                           [--journal-modes delete,wal]
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bookings import BookingConflict, book_lesson, format_time  # noqa: E402
+from database import Database  # noqa: E402
+from migrations import migrate  # noqa: E402
+from reports import read_dashboard  # noqa: E402
+from search import search_names  # noqa: E402
+
+FIRST_DAY = date(2026, 1, 5)
+NOW = datetime(2026, 1, 5)  # bookings before this would be refused as in the past
+DAYS = 120
+STUDENTS = 20000
+INSTRUCTORS = 50
+OPERATIONS = ["search", "lessons", "dashboard", "book", "update"]
+
+
+def seed(db, lessons):
+    migrate(db)
+    rng = random.Random(42)
+    with db.transaction(immediate=True) as c:
+        c.executemany("INSERT INTO instructors (name) VALUES (?)", ((f"Instructor {i}",) for i in range(INSTRUCTORS)))
+        c.executemany("INSERT INTO students (name, phone) VALUES (?, ?)",
+                      ((f"Student {i}", f"07{i:09d}") for i in range(STUDENTS)))
+        # Hourly lessons; the slots taken are spread so bookings mostly succeed
+        taken = rng.sample([(instructor_id, day, hour) for instructor_id in range(1, INSTRUCTORS + 1)
+                            for day in range(DAYS) for hour in range(8, 20)], lessons)
+        c.executemany("""INSERT INTO lessons (student_id, instructor_id, lesson_type, date, start_time, duration, status)
+                         VALUES (?, ?, 'Standard', ?, ?, 60, 'Unpaid')""",
+                      ((rng.randint(1, STUDENTS), instructor_id, (FIRST_DAY + timedelta(days=day)).isoformat(),
+                        format_time(hour * 60)) for instructor_id, day, hour in taken))
+    db.execute("ANALYZE")
+
+
+def run_operation(db, operation, rng):
+    if operation == "search":
+        search_names("students", f"Student {rng.randint(1, 999)}", limit=20, db=db)
+    elif operation == "lessons":
+        db.query("""SELECT id, lesson_type, date, start_time, status FROM lessons
+                    WHERE student_id = ? ORDER BY date DESC LIMIT 50""", (rng.randint(1, STUDENTS),))
+    elif operation == "dashboard":
+        read_dashboard(12, 10, db)
+    elif operation == "book":
+        try:
+            book_lesson(rng.randint(1, STUDENTS), rng.randint(1, INSTRUCTORS), "Standard",
+                        (FIRST_DAY + timedelta(days=rng.randrange(DAYS))).isoformat(),
+                        format_time(rng.randint(8 * 4, 19 * 4) * 15), now=NOW, db=db)
+        except BookingConflict:
+            pass  # the slot was taken: a normal answer, not a failure
+    else:
+        db.execute("UPDATE students SET phone = ? WHERE id = ?",
+                   (f"07{rng.randrange(10 ** 9):09d}", rng.randint(1, STUDENTS)))
+
+
+def worker(path, journal_mode, seconds, writes, seed_value, start, results):
+    db = Database(path, journal_mode)
+    rng = random.Random(seed_value)
+    latencies = {operation: [] for operation in OPERATIONS}
+    errors = {operation: 0 for operation in OPERATIONS}
+    db.connection()
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        if rng.random() < writes:
+            operation = rng.choice(["book", "update"])
+        else:
+            operation = rng.choices(["search", "lessons", "dashboard"], weights=[5, 4, 1])[0]
+        began = time.perf_counter()
+        try:
+            run_operation(db, operation, rng)
+        except sqlite3.OperationalError:
+            errors[operation] += 1
+            continue
+        latencies[operation].append(time.perf_counter() - began)
+    results.put((latencies, errors, db.busy_retries))
+    db.close()
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000 if values else float("nan")
+
+
+def run(journal_mode, args, tmp):
+    path = os.path.join(tmp, f"stress-{journal_mode}.db")
+    db = Database(path, journal_mode)
+    seed(db, args.lessons)
+    db.close()
+
+    start = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=worker, args=(path, journal_mode, args.seconds, args.writes, n,
+                                                            start, results))
+               for n in range(args.processes)]
+    for process in workers:
+        process.start()
+    time.sleep(0.5)  # let every worker connect
+    start.set()
+    latencies = {operation: [] for operation in OPERATIONS}
+    errors = {operation: 0 for operation in OPERATIONS}
+    retries = 0
+    for _ in workers:
+        worker_latencies, worker_errors, worker_retries = results.get()
+        for operation in OPERATIONS:
+            latencies[operation].extend(worker_latencies[operation])
+            errors[operation] += worker_errors[operation]
+        retries += worker_retries
+    for process in workers:
+        process.join()
+
+    print(f"journal_mode={journal_mode}: {args.processes} processes, {args.seconds} s, "
+          f"{args.writes:.0%} writes, {retries} busy retries")
+    print(f"  {'operation':<10} {'count':>8} {'ops/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for operation in OPERATIONS:
+        values = sorted(latencies[operation])
+        print(f"  {operation:<10} {len(values):>8} {len(values) / args.seconds:>8.0f} "
+              f"{percentile(values, 0.5):>8.2f} {percentile(values, 0.99):>8.2f} {errors[operation]:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process read/write stress test")
+    parser.add_argument("--processes", type=int, default=6)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writes", type=float, default=0.2, help="share of operations that write")
+    parser.add_argument("--lessons", type=int, default=50000)
+    parser.add_argument("--journal-modes", default="delete,wal")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for journal_mode in args.journal_modes.split(","):
+            run(journal_mode.strip().upper(), args, tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from cache import invalidate
+from database import get_db
+
+# Booking lessons into the calendar. A lesson runs from start_time ("HH:MM")
+# for duration minutes, and neither its instructor nor its student may be in
+# another lesson at the same time.
+#
+# Lessons are capped at MAX_DURATION minutes, so only lessons starting less
+# than MAX_DURATION before the new one can reach into it. The clash check is
+# therefore one short range seek on the (instructor_id, date, start_time) and
+# (student_id, date, start_time) indexes from migration 10, however many
+# lessons there are. The check and the write run in one BEGIN IMMEDIATE
+# transaction: two clerks booking the same slot at the same moment are queued
+# by SQLite's write lock, and the second one's check sees the first lesson.
+#
+# Lessons without a start time (booked before times were recorded, or
+# imported without one) are not part of the check.
+
+MAX_DURATION = 240
+DEFAULT_DURATION = 60
+DAY_MINUTES = 24 * 60
+
+Clash = namedtuple("Clash", "lesson_id who name start_time duration")
+
+# One lesson of a series: lesson_id is None if it was not booked
+Occurrence = namedtuple("Occurrence", "date start_time lesson_id clashes")
+
+# Recurrences offered for a series: name -> days between lessons
+RECURRENCES = {"Weekly": 7, "Every 2 weeks": 14, "Daily": 1}
+MAX_SERIES = 52
+
+
+class BookingConflict(ValueError):
+    def __init__(self, clashes):
+        self.clashes = clashes
+        super().__init__("; ".join(
+            f"{clash.name or clash.who.title()} already has lesson {clash.lesson_id} at {clash.start_time} "
+            f"({clash.duration} min)" for clash in clashes))
+
+
+# "2025-3-3" -> "2025-03-03"; dates are stored zero-padded so they sort and
+# compare as text
+def normalize_date(value):
+    try:
+        year, month, day = (int(part) for part in value.strip().split("-"))
+        return date(year, month, day).isoformat()
+    except (AttributeError, ValueError):
+        raise ValueError("Date must be YYYY-MM-DD") from None
+
+
+# "9:30" -> 570 (minutes after midnight)
+def parse_time(value):
+    try:
+        hours, minutes = (int(part) for part in value.strip().split(":"))
+    except (AttributeError, ValueError):
+        raise ValueError("Start time must be HH:MM") from None
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError("Start time must be HH:MM")
+    return hours * 60 + minutes
+
+
+def format_time(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def parse_duration(value):
+    try:
+        duration = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("Duration must be a whole number of minutes") from None
+    if not 0 < duration <= MAX_DURATION:
+        raise ValueError(f"Duration must be between 1 and {MAX_DURATION} minutes")
+    return duration
+
+
+# Minutes after midnight of an "HH:MM" column
+def minutes_sql(column):
+    return f"(substr({column}, 1, 2) * 60 + substr({column}, 4, 2))"
+
+
+# Checked (date, start, duration) of a lesson; raises ValueError
+def lesson_slot(lesson_date, start_time, duration):
+    lesson_date = normalize_date(lesson_date)
+    start = parse_time(start_time)
+    duration = parse_duration(duration)
+    if start + duration > DAY_MINUTES:
+        raise ValueError("A lesson must finish by midnight")
+    return lesson_date, start, duration
+
+
+# Raises ValueError if a lesson on lesson_date at start (minutes) would have
+# begun before now (default: the clock)
+def check_not_past(lesson_date, start, now=None):
+    now = now or datetime.now()
+    if (lesson_date, start) < (now.date().isoformat(), now.hour * 60 + now.minute):
+        raise ValueError("Cannot book a lesson in the past")
+
+
+# Lessons of the instructor and of the student that overlap
+# [start, start + duration) on lesson_date. Run inside the transaction that
+# writes the lesson.
+def find_clashes(c, lesson_date, start, duration, instructor_id, student_id, exclude_id=None):
+    clashes = []
+    for who, column, person_id in [("instructor", "instructor_id", instructor_id),
+                                   ("student", "student_id", student_id)]:
+        rows = c.execute(f"""SELECT id, {who}_name, start_time, duration FROM lessons
+                             WHERE {column} = ? AND date = ? AND start_time >= ? AND start_time < ?
+                               AND {minutes_sql('start_time')} + duration > ? AND id IS NOT ?""",
+                         (person_id, lesson_date, format_time(max(start - MAX_DURATION, 0)),
+                          format_time(start + duration), start, exclude_id))
+        clashes.extend(Clash(lesson_id, who, *rest) for lesson_id, *rest in rows)
+    return clashes
+
+
+# Names of the student and the instructor, which are copied onto the lesson;
+# raises ValueError if either does not exist. Run inside the transaction that
+# writes the lesson.
+def lesson_names(c, student_id, instructor_id):
+    names = []
+    for who, table, person_id in [("student", "students", student_id),
+                                  ("instructor", "instructors", instructor_id)]:
+        row = c.execute(f"SELECT name FROM {table} WHERE id = ?", (person_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"No {who} with id {person_id}")
+        names.append(row[0])
+    return names
+
+
+# Book a lesson and return its id; raises BookingConflict if the instructor
+# or the student is busy then, ValueError for an unknown student or
+# instructor, a bad date, time or duration or one before now (default: the
+# clock)
+def book_lesson(student_id, instructor_id, lesson_type, lesson_date, start_time, duration=DEFAULT_DURATION,
+                status="Unpaid", db=None, now=None):
+    db = db or get_db()
+    lesson_date, start, duration = lesson_slot(lesson_date, start_time, duration)
+    check_not_past(lesson_date, start, now)
+    with db.transaction(immediate=True) as c:
+        student_name, instructor_name = lesson_names(c, student_id, instructor_id)
+        clashes = find_clashes(c, lesson_date, start, duration, instructor_id, student_id)
+        if clashes:
+            raise BookingConflict(clashes)
+        # Names are copied onto the lesson, and its price as the catalog has it now
+        cursor = c.execute(
+            """INSERT INTO lessons (student_id, student_name, instructor_id, instructor_name, lesson_type, date,
+                                    start_time, duration, status, payment)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, IFNULL((SELECT price FROM lesson_types WHERE name = ?), 0))""",
+            (student_id, student_name, instructor_id, instructor_name, lesson_type, lesson_date, format_time(start),
+             duration, status, lesson_type))
+    # The new lesson can raise the student's lesson progress
+    invalidate("lessons", "students", db=db)
+    return cursor.lastrowid
+
+
+# Book count lessons, every_days apart from first_date, at the same time.
+# Every occurrence is checked and all of them are inserted with one
+# executemany() in a single transaction. Returns an Occurrence per lesson.
+# If any of them clashes nothing is booked (lesson_id None throughout) unless
+# skip_clashes is set, in which case the free ones are booked. The first
+# lesson may not be before now (default: the clock), and the student and the
+# instructor must exist (else ValueError).
+def book_series(student_id, instructor_id, lesson_type, first_date, start_time, duration=DEFAULT_DURATION,
+                count=10, every_days=7, status="Unpaid", skip_clashes=False, db=None, now=None):
+    db = db or get_db()
+    first_date, start, duration = lesson_slot(first_date, start_time, duration)
+    check_not_past(first_date, start, now)
+    if not 0 < count <= MAX_SERIES:
+        raise ValueError(f"A series is 1 to {MAX_SERIES} lessons")
+    if every_days < 1:
+        raise ValueError("Lessons in a series must be at least a day apart")
+    first = date.fromisoformat(first_date)
+    dates = [(first + timedelta(days=every_days * n)).isoformat() for n in range(count)]
+
+    with db.transaction(immediate=True) as c:
+        student_name, instructor_name = lesson_names(c, student_id, instructor_id)
+        clashes = [find_clashes(c, lesson_date, start, duration, instructor_id, student_id) for lesson_date in dates]
+        free = [lesson_date for lesson_date, found in zip(dates, clashes) if not found]
+        lesson_ids = {}
+        if free and (skip_clashes or len(free) == count):
+            c.executemany(
+                """INSERT INTO lessons (student_id, student_name, instructor_id, instructor_name, lesson_type, date,
+                                        start_time, duration, status, payment)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, IFNULL((SELECT price FROM lesson_types WHERE name = ?), 0))""",
+                [(student_id, student_name, instructor_id, instructor_name, lesson_type, lesson_date,
+                  format_time(start), duration, status, lesson_type) for lesson_date in free])
+            # One statement, one writer: the rows got consecutive ids
+            last_id = c.execute("SELECT last_insert_rowid()").fetchone()[0]
+            lesson_ids = dict(zip(free, range(last_id - len(free) + 1, last_id + 1)))
+    if lesson_ids:
+        invalidate("lessons", "students", db=db)
+    return [Occurrence(lesson_date, format_time(start), lesson_ids.get(lesson_date), found)
+            for lesson_date, found in zip(dates, clashes)]
+
+
+# Move an existing lesson, with the same checks as booking it. A blank
+# start_time leaves the lesson untimed (lessons from before times were kept).
+# If the date, start time and duration are the ones stored, only the status
+# is written: they are not checked again, so the status of a lesson whose
+# date predates the checks (e.g. "23") can still be changed.
+def reschedule_lesson(lesson_id, lesson_date, start_time, duration, status, db=None):
+    db = db or get_db()
+    with db.transaction(immediate=True) as c:
+        lesson = c.execute("SELECT instructor_id, student_id, date, start_time, duration FROM lessons WHERE id = ?",
+                           (lesson_id,)).fetchone()
+        if lesson is None:
+            raise ValueError(f"No lesson with id {lesson_id}")
+        instructor_id, student_id, *stored = lesson
+        if not slot_changed(stored, lesson_date, start_time, duration):
+            c.execute("UPDATE lessons SET status = ? WHERE id = ?", (status, lesson_id))
+        elif not start_time.strip():
+            c.execute("UPDATE lessons SET date = ?, start_time = NULL, duration = NULL, status = ? WHERE id = ?",
+                      (normalize_date(lesson_date), status, lesson_id))
+        else:
+            lesson_date, start, duration = lesson_slot(lesson_date, start_time, duration)
+            clashes = find_clashes(c, lesson_date, start, duration, instructor_id, student_id, exclude_id=lesson_id)
+            if clashes:
+                raise BookingConflict(clashes)
+            c.execute("UPDATE lessons SET date = ?, start_time = ?, duration = ?, status = ? WHERE id = ?",
+                      (lesson_date, format_time(start), duration, status, lesson_id))
+    invalidate("lessons", db=db)
+
+
+# Whether (date, start_time, duration) differ from the stored ones, compared
+# as text; an untimed lesson's duration is not part of its slot
+def slot_changed(stored, lesson_date, start_time, duration):
+    def text(value):
+        return "" if value is None else str(value).strip()
+
+    old_date, old_start, old_duration = stored
+    if not text(start_time):
+        return text(lesson_date) != text(old_date) or old_start is not None
+    return ((text(lesson_date), text(start_time), text(duration)) !=
+            (text(old_date), text(old_start), text(old_duration)))
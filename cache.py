@@ -0,0 +1,108 @@
+import threading
+from collections import namedtuple
+
+from database import get_db
+
+# Process-wide read cache for small, slowly changing data (the lesson type
+# catalog, the dashboard figures). Each entry is tagged with the tables it was
+# read from, and the write paths drop the tags they touch with invalidate().
+#
+# Writes from other connections (another workstation, or another thread of
+# this one) are caught with PRAGMA data_version: when it changes on the
+# reading thread's connection, something else committed and the whole cache is
+# dropped. data_version does not move for a connection's own commits, which
+# is what the explicit invalidation is for.
+#
+# Tags are table names: "students", "instructors", "lessons", "payments",
+# "lesson_types".
+
+CacheStats = namedtuple("CacheStats", "hits misses invalidations entries")
+
+_entries = {}      # (db path, key) -> (tags, value)
+_lock = threading.Lock()
+_local = threading.local()  # per thread: db path -> last data_version seen
+_generation = 0    # bumped by every invalidation, so a load that raced one is not stored
+_hits = _misses = _invalidations = 0
+_versions = {}     # (db path, tag) -> times invalidated; (db path, None) -> times cleared
+
+
+def check_data_version(db):
+    seen = getattr(_local, "data_versions", None)
+    if seen is None:
+        seen = _local.data_versions = {}
+    version = db.query_value("PRAGMA data_version")
+    if seen.get(db.path) != version:
+        # Changed by another connection, or the first look from this thread
+        # (it cannot tell what happened before)
+        seen[db.path] = version
+        clear(db)
+
+
+# The cached value for key, or load() read now and cached under tags
+def cached(key, load, tags=(), db=None):
+    global _hits, _misses
+    db = db or get_db()
+    check_data_version(db)
+    entry_key = (db.path, key)
+    with _lock:
+        entry = _entries.get(entry_key)
+        if entry is not None:
+            _hits += 1
+            return entry[1]
+        _misses += 1
+        generation = _generation
+
+    value = load()
+    with _lock:
+        if generation == _generation:
+            _entries[entry_key] = (frozenset(tags), value)
+    return value
+
+
+# Drop every entry tagged with any of tags
+def invalidate(*tags, db=None):
+    global _generation, _invalidations
+    db = db or get_db()
+    tags = set(tags)
+    with _lock:
+        _generation += 1
+        _invalidations += 1
+        for tag in tags:
+            _versions[db.path, tag] = _versions.get((db.path, tag), 0) + 1
+        for entry_key in [k for k, (entry_tags, _) in _entries.items() if k[0] == db.path and entry_tags & tags]:
+            del _entries[entry_key]
+
+
+def clear(db=None):
+    global _generation, _invalidations
+    db = db or get_db()
+    with _lock:
+        _generation += 1
+        _invalidations += 1
+        _versions[db.path, None] = _versions.get((db.path, None), 0) + 1
+        for entry_key in [k for k in _entries if k[0] == db.path]:
+            del _entries[entry_key]
+
+
+# A value that changes whenever any of tags may have changed, for screens
+# that keep data on show and reload it only when it is stale. A commit by
+# another connection counts as a change to every tag: which tables it touched
+# is not known.
+def data_versions(tags, db=None):
+    db = db or get_db()
+    check_data_version(db)
+    with _lock:
+        return tuple(_versions.get((db.path, tag), 0) for tag in (None, *tags))
+
+
+def cache_stats():
+    with _lock:
+        return CacheStats(_hits, _misses, _invalidations, len(_entries))
+
+
+# db.execute(sql, params), then drop the entries tagged with tags
+def execute_write(sql, params=(), tags=(), db=None):
+    db = db or get_db()
+    cursor = db.execute(sql, params)
+    invalidate(*tags, db=db)
+    return cursor
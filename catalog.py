@@ -0,0 +1,60 @@
+from collections import OrderedDict, namedtuple
+
+from bookings import DEFAULT_DURATION
+from cache import cached
+from cache import invalidate as invalidate_cache
+from database import get_db
+
+# The lesson_types catalog: price, progress weight and length of each lesson
+# type. It is read into an in-memory map kept in the read cache (cache.py)
+# under the "lesson_types" tag; save_lesson_type() / delete_lesson_type()
+# invalidate it, as does a change made on another workstation, and
+# invalidate() drops it after any other change to the table.
+LessonType = namedtuple("LessonType", "name price progress_weight duration")
+
+
+def lesson_types(db=None):
+    db = db or get_db()
+
+    def load():
+        rows = db.query("SELECT name, price, progress_weight, duration FROM lesson_types ORDER BY position, name")
+        return OrderedDict((row[0], LessonType(*row)) for row in rows)
+
+    return cached("lesson_types", load, tags=("lesson_types",), db=db)
+
+
+def lesson_type_names(db=None):
+    return list(lesson_types(db))
+
+
+# Price of a lesson type, or 0 for a type that is not in the catalog
+def lesson_price(name, db=None):
+    lesson_type = lesson_types(db).get(name)
+    return lesson_type.price if lesson_type else 0
+
+
+# Minutes a lesson of this type is booked for
+def lesson_duration(name, db=None):
+    lesson_type = lesson_types(db).get(name)
+    return lesson_type.duration if lesson_type else DEFAULT_DURATION
+
+
+def invalidate(db=None):
+    invalidate_cache("lesson_types", db=db)
+
+
+def save_lesson_type(name, price, progress_weight, duration=DEFAULT_DURATION, db=None):
+    db = db or get_db()
+    db.execute("""INSERT INTO lesson_types (name, price, progress_weight, duration, position)
+                  VALUES (?, ?, ?, ?, (SELECT IFNULL(MAX(position), -1) + 1 FROM lesson_types))
+                  ON CONFLICT(name) DO UPDATE SET price = excluded.price, progress_weight = excluded.progress_weight,
+                                                  duration = excluded.duration""",
+               (name, price, progress_weight, duration))
+    # Weights feed students' lesson progress too
+    invalidate_cache("lesson_types", "students", db=db)
+
+
+def delete_lesson_type(name, db=None):
+    db = db or get_db()
+    db.execute("DELETE FROM lesson_types WHERE name = ?", (name,))
+    invalidate_cache("lesson_types", "students", db=db)
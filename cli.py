@@ -0,0 +1,208 @@
+import argparse
+import csv
+import json
+import sys
+
+import services
+from bookings import RECURRENCES
+from database import get_db, set_db_path
+from exporter import EXPORTS, FORMATS, export
+from migrations import migrate
+from reports import dashboard_summary, write_report
+
+# Command line for the common desk operations, for scripts and nightly jobs.
+# Lists of records are read from a JSON Lines or CSV file ("-" for JSON Lines
+# on stdin) and go through services.py in batches.
+#
+#   python cli.py add students --file new-students.csv
+#   python cli.py add instructors name="Sam Lee" phone=0700 email=sam@example.com instructor_type=Full-time
+#   python cli.py search students "ra sa"
+#   python cli.py book --student 3 --instructor 2 --type Standard --date 2025-03-03 --time 09:30 [--count 10]
+#   python cli.py book --file bookings.jsonl
+#   python cli.py progress 3 4 5
+#   python cli.py report [--from 2025-01-01] [--to 2025-12-31] [--branch North] [--output report.pdf]
+#   python cli.py report --summary
+#   python cli.py export lessons lessons-2025.csv.gz --from 2025-01-01
+#
+# Exits with status 1 if any record failed.
+
+
+def read_records(path):
+    if path == "-":
+        return [json.loads(line) for line in sys.stdin if line.strip()]
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if path.lower().endswith(".csv"):
+            # Empty cells are missing values, not empty strings
+            return [{key.strip().lower(): value for key, value in row.items() if value}
+                    for row in csv.DictReader(f)]
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def print_json(value):
+    print(json.dumps(value, ensure_ascii=False, default=str))
+
+
+def add(args):
+    records = read_records(args.file) if args.file else []
+    if args.fields:
+        record = {}
+        for field in args.fields:
+            name, separator, value = field.partition("=")
+            if not separator:
+                raise ValueError(f"Expected field=value, got {field!r}")
+            record[name] = value
+        records.append(record)
+    if not records:
+        raise ValueError("Nothing to add: give field=value pairs or --file")
+    ids = services.add_people(args.table, records)
+    for row_id in ids:
+        print(row_id)
+    print(f"Added {len(ids)} {args.table}", file=sys.stderr)
+    return 0
+
+
+def search(args):
+    rows = services.search(args.table, args.term, args.limit)
+    for row in rows:
+        if args.json:
+            print_json(row)
+        else:
+            print(f"{row['id']} - {row['name']}")
+    return 0
+
+
+def booking_from(record):
+    try:
+        return services.Booking(int(record["student_id"]), int(record["instructor_id"]), record["lesson_type"],
+                                record.get("date"), record.get("start_time"), record.get("duration"),
+                                record.get("status") or "Unpaid", str(record.get("confirmed", "")).lower()
+                                in ("1", "true", "yes"))
+    except KeyError as e:
+        raise ValueError(f"Booking is missing {e.args[0]}") from None
+
+
+def book(args):
+    if args.file:
+        bookings = [booking_from(record) for record in read_records(args.file)]
+        results = services.book_lessons(bookings)
+        for number, result in enumerate(results, start=1):
+            if result.error is None:
+                print(f"{number}: booked lesson {result.lesson_id}")
+            else:
+                print(f"{number}: {result.error}")
+        failed = sum(result.error is not None for result in results)
+        print(f"Booked {len(results) - failed} of {len(results)} lessons", file=sys.stderr)
+        return 1 if failed else 0
+
+    missing = [option for option, value in [("--student", args.student), ("--instructor", args.instructor),
+                                            ("--type", args.lesson_type), ("--date", args.date),
+                                            ("--time", args.time)] if value is None]
+    if missing:
+        raise ValueError(f"Give --file, or {', '.join(missing)}")
+    booking = services.Booking(args.student, args.instructor, args.lesson_type, args.date, args.time, args.duration,
+                               args.status, args.confirmed)
+    if args.count == 1:
+        print(f"Booked lesson {services.book(booking)}")
+        return 0
+    occurrences = services.book_recurring(booking, args.count, RECURRENCES[args.repeat], args.skip_clashes)
+    for occurrence in occurrences:
+        if occurrence.lesson_id is not None:
+            outcome = f"booked lesson {occurrence.lesson_id}"
+        else:
+            outcome = "clash" if occurrence.clashes else "free, not booked"
+        print(f"{occurrence.date} {occurrence.start_time}: {outcome}")
+    return 0 if any(occurrence.lesson_id is not None for occurrence in occurrences) else 1
+
+
+def progress(args):
+    found = services.lesson_progress(args.student_ids)
+    for student_id in args.student_ids:
+        print(f"{student_id}: {found[student_id]}%" if student_id in found else f"{student_id}: no such student")
+    return 0 if len(found) == len(set(args.student_ids)) else 1
+
+
+def report(args):
+    if args.summary:
+        print_json(dashboard_summary()._asdict())
+        return 0
+    for path in write_report(args.output, args.date_from, args.date_to, args.branch, args.rows_per_volume):
+        print(path)
+    return 0
+
+
+def export_rows(args):
+    count = export(args.kind, args.path, fmt=args.format, date_from=args.date_from, date_to=args.date_to,
+                   instructor_id=args.instructor_id, branch=args.branch)
+    print(f"Exported {count} {args.kind} to {args.path}", file=sys.stderr)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Driving school operations from the command line")
+    parser.add_argument("--db", help="database file (default: the application's)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("add", help="add students or instructors")
+    command.add_argument("table", choices=sorted(services.ROSTERS))
+    command.add_argument("fields", nargs="*", metavar="field=value", help="one record")
+    command.add_argument("--file", help="records as JSON Lines or CSV ('-': JSON Lines on stdin)")
+    command.set_defaults(run=add)
+
+    command = commands.add_parser("search", help="find students or instructors by name")
+    command.add_argument("table", choices=sorted(services.ROSTERS))
+    command.add_argument("term")
+    command.add_argument("--limit", type=int, default=20)
+    command.add_argument("--json", action="store_true", help="whole rows as JSON Lines")
+    command.set_defaults(run=search)
+
+    command = commands.add_parser("book", help="book lessons")
+    command.add_argument("--file", help="bookings as JSON Lines or CSV: student_id, instructor_id, lesson_type, "
+                                        "date, start_time, optional duration, status, confirmed")
+    command.add_argument("--student", type=int)
+    command.add_argument("--instructor", type=int)
+    command.add_argument("--type", dest="lesson_type")
+    command.add_argument("--date")
+    command.add_argument("--time")
+    command.add_argument("--duration", type=int, help="minutes (default: the lesson type's)")
+    command.add_argument("--status", default="Unpaid")
+    command.add_argument("--confirmed", action="store_true", help="prerequisites were taken elsewhere")
+    command.add_argument("--count", type=int, default=1, help="book a series of this many lessons")
+    command.add_argument("--repeat", choices=sorted(RECURRENCES), default="Weekly")
+    command.add_argument("--skip-clashes", action="store_true", help="book a series' free dates only")
+    command.set_defaults(run=book)
+
+    command = commands.add_parser("progress", help="students' lesson progress")
+    command.add_argument("student_ids", nargs="+", type=int)
+    command.set_defaults(run=progress)
+
+    command = commands.add_parser("report", help="print the PDF report")
+    command.add_argument("--output", default="driving_school_report.pdf")
+    command.add_argument("--from", dest="date_from")
+    command.add_argument("--to", dest="date_to")
+    command.add_argument("--branch")
+    command.add_argument("--rows-per-volume", type=int)
+    command.add_argument("--summary", action="store_true", help="print the dashboard figures as JSON instead")
+    command.set_defaults(run=report)
+
+    command = commands.add_parser("export", help="export to CSV or JSON Lines")
+    command.add_argument("kind", choices=sorted(EXPORTS))
+    command.add_argument("path", help="output file; .jsonl for JSON Lines, add .gz to compress")
+    command.add_argument("--format", choices=FORMATS)
+    command.add_argument("--from", dest="date_from")
+    command.add_argument("--to", dest="date_to")
+    command.add_argument("--instructor", type=int, dest="instructor_id")
+    command.add_argument("--branch")
+    command.set_defaults(run=export_rows)
+
+    args = parser.parse_args()
+    if args.db:
+        set_db_path(args.db)
+    migrate(get_db())
+    try:
+        sys.exit(args.run(args))
+    except (OSError, ValueError) as e:
+        parser.exit(1, f"{args.command} failed: {e}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from profiler import connection_class
+
+DB_PATH = "driving_school.db"
+
+# Several front-desk PCs share one database file. In WAL mode readers and the
+# one writer no longer block each other, so a long report or export does not
+# hold up bookings. WAL needs every process to reach the file on the same
+# machine (a local disk, not a network share); pass journal_mode="DELETE"
+# where that is not the case, and the busy timeout and retries below still
+# apply.
+JOURNAL_MODE = "WAL"
+
+# How long SQLite itself waits for another connection's lock, and then how
+# often we retry (with jittered exponential backoff from RETRY_DELAY seconds)
+# when it still reports the database as busy. Some busy errors skip the wait
+# altogether, e.g. a read transaction that can no longer be upgraded.
+BUSY_TIMEOUT = 2.0
+RETRIES = 5
+RETRY_DELAY = 0.02
+
+# How many prepared statements each connection keeps around (the sqlite3
+# module reuses a compiled statement when the exact same SQL text is executed
+# again, so the query strings below should stay constants).
+STATEMENT_CACHE_SIZE = 256
+
+
+# Shared data-access layer. Every thread gets one long-lived, configured
+# connection (the Tk thread plus any worker threads), instead of every click
+# paying for connect/parse/close.
+class Database:
+    def __init__(self, path=DB_PATH, journal_mode=JOURNAL_MODE):
+        self.path = path
+        self.journal_mode = journal_mode
+        self.busy_retries = 0  # busy errors retried, for the stress test
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: we open transactions ourselves in transaction()
+            # (timed per statement when profiling is on, see profiler.py)
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False,
+                                   factory=connection_class(), cached_statements=STATEMENT_CACHE_SIZE)
+            self.configure(conn)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def configure(self, conn):
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA cache_size = -8000")  # 8 MB page cache per connection
+        if self.journal_mode:
+            # Stored in the file, so only the first connection really switches
+            # it; if another workstation has the file open in the old mode
+            # the switch is left to a later connection
+            try:
+                mode = self.with_retry(conn.execute, f"PRAGMA journal_mode = {self.journal_mode}").fetchone()[0]
+            except sqlite3.OperationalError:
+                mode = None
+            if mode == "wal":
+                # Commits are durable at checkpoints rather than each fsync;
+                # the database cannot be corrupted, only lose the last commits
+                # on power loss
+                conn.execute("PRAGMA synchronous = NORMAL")
+
+    # Call fn(*args), retrying with backoff while the database is busy
+    def with_retry(self, fn, *args):
+        for attempt in range(RETRIES + 1):
+            try:
+                return fn(*args)
+            except sqlite3.OperationalError as e:
+                if attempt == RETRIES or not is_busy(e):
+                    raise
+                self.busy_retries += 1
+                time.sleep(RETRY_DELAY * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    # Statements outside a transaction() commit on their own and can simply be
+    # retried; inside one only BEGIN and COMMIT are (see transaction())
+    def run(self, method, sql, params):
+        conn = self.connection()
+        if conn.in_transaction:
+            return getattr(conn, method)(sql, params)
+        return self.with_retry(getattr(conn, method), sql, params)
+
+    # --- Queries ---
+    def query(self, sql, params=()):
+        return self.run("execute", sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        return self.run("execute", sql, params).fetchone()
+
+    def query_value(self, sql, params=(), default=None):
+        row = self.query_one(sql, params)
+        return row[0] if row is not None else default
+
+    # Yield the rows of sql in lists of at most chunk_size, so a big result
+    # is never held in memory at once
+    def stream(self, sql, params=(), chunk_size=1000):
+        cursor = self.run("execute", sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            cursor.close()
+
+    def execute(self, sql, params=()):
+        # Outside transaction() every statement commits on its own
+        return self.run("execute", sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        # seq_of_params may be a generator, which a retry could not replay
+        return self.run("executemany", sql, list(seq_of_params))
+
+    # --- Transactions ---
+    @contextmanager
+    def transaction(self, immediate=False):
+        conn = self.connection()
+        if conn.in_transaction:
+            # Nested scope: the outer transaction() commits or rolls back
+            yield conn
+            return
+        # Writers should pass immediate=True: the write lock is then taken
+        # (and waited for) up front, instead of failing half way through when
+        # a read transaction cannot be upgraded
+        self.with_retry(conn.execute, "BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            # A busy COMMIT leaves the transaction open, so it can be retried
+            self.with_retry(conn.execute, "COMMIT")
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def is_busy(error):
+    message = str(error)
+    return "database is locked" in message or "database is busy" in message or "database table is locked" in message
+
+
+_db = None
+_db_lock = threading.Lock()
+
+
+# The application-wide Database (created on first use)
+def get_db():
+    global _db
+    with _db_lock:
+        if _db is None:
+            _db = Database()
+        return _db
+
+
+# Point the application at another database file (tests, benchmarks, tools)
+def set_db_path(path, journal_mode=JOURNAL_MODE):
+    global _db
+    with _db_lock:
+        if _db is not None:
+            _db.close()
+        _db = Database(path, journal_mode)
+        return _db
@@ -0,0 +1,129 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from database import get_db
+
+
+# One piece of background work and the callbacks that get its outcome
+class Job:
+    def __init__(self, key, on_done, on_error):
+        self.key = key
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancelled = False
+        self.future = None
+
+    # A job already running stops at its next SQLite progress check (see
+    # BackgroundExecutor._run)
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+
+# Runs database and report work on worker threads so the Tk mainloop never
+# waits on SQLite. Outcomes are queued by the workers and delivered on the Tk
+# thread from a root.after() poll, so callbacks can touch widgets freely.
+#
+# Jobs submitted with a key replace any unfinished job with the same key
+# (a newer search makes the previous one stale); a stale job is cancelled and
+# its callbacks never run.
+class BackgroundExecutor:
+    POLL_MS = 30
+    PROGRESS_STEPS = 1000  # SQLite VM instructions between cancellation checks
+
+    def __init__(self, root, max_workers=2):
+        self.root = root
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+        self.results = queue.Queue()
+        self.jobs = set()
+        self.latest = {}           # key -> newest Job submitted with that key
+        self.busy_listeners = []   # called with the number of unfinished jobs
+        self._polling = False
+
+    def submit(self, fn, *args, on_done=None, on_error=None, key=None, **kwargs):
+        if key is not None and key in self.latest:
+            self.latest[key].cancel()
+        job = Job(key, on_done, on_error)
+        if key is not None:
+            self.latest[key] = job
+        self.jobs.add(job)
+        job.future = self.pool.submit(self._run, job, fn, args, kwargs)
+        self._notify()
+        self._schedule_poll()
+        return job
+
+    def cancel(self, key):
+        job = self.latest.pop(key, None)
+        if job is not None:
+            job.cancel()
+
+    def cancel_all(self):
+        for job in list(self.jobs):
+            job.cancel()
+        self.latest.clear()
+
+    def shutdown(self):
+        self.cancel_all()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    # Worker thread
+    def _run(self, job, fn, args, kwargs):
+        if job.cancelled:
+            self.results.put((job, None, None))
+            return
+        # A statement of this job fails with "interrupted" once the job is
+        # cancelled. The handler asks about this job alone, unlike
+        # Connection.interrupt(), which could land on the worker's next job
+        # if this one finished first.
+        conn = get_db().connection()
+        conn.set_progress_handler(lambda: job.cancelled, self.PROGRESS_STEPS)
+        try:
+            self.results.put((job, fn(*args, **kwargs), None))
+        except Exception as e:
+            self.results.put((job, None, e))
+        finally:
+            conn.set_progress_handler(None, 0)
+
+    # Tk thread
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+
+    def _poll(self):
+        while True:
+            try:
+                job, result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self._deliver(job, result, error)
+
+        # Jobs cancelled before they started never report back
+        self.jobs = {job for job in self.jobs if not job.future.cancelled()}
+        self._notify()
+        self._polling = False
+        if self.jobs:
+            self._schedule_poll()
+
+    def _deliver(self, job, result, error):
+        self.jobs.discard(job)
+        if self.latest.get(job.key) is job:
+            del self.latest[job.key]
+        if job.cancelled:
+            return
+        try:
+            if error is None:
+                if job.on_done is not None:
+                    job.on_done(result)
+            elif job.on_error is not None:
+                job.on_error(error)
+            else:
+                raise error
+        except Exception as e:
+            # Same reporting as an exception in any other Tk callback
+            self.root.report_callback_exception(type(e), e, e.__traceback__)
+
+    def _notify(self):
+        for listener in self.busy_listeners:
+            listener(len(self.jobs))
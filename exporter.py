@@ -0,0 +1,141 @@
+import argparse
+import csv
+import gzip
+import json
+import os
+
+from database import get_db, set_db_path
+from migrations import migrate
+
+# Bulk export of lessons and the student / instructor rosters to CSV or JSON
+# Lines. Rows are read from a cursor CHUNK_SIZE at a time and written
+# straight out, so memory use does not depend on how many rows there are.
+# A path ending in .gz is gzip-compressed. The file is written next to its
+# final name and renamed into place once complete.
+#
+#   python exporter.py lessons lessons-2025.csv.gz --from 2025-01-01 --to 2025-12-31
+
+CHUNK_SIZE = 5000
+
+FORMATS = ("csv", "jsonl")
+
+# kind -> columns exported, in order
+#
+# Lessons come out by date, the order both lesson date indexes deliver them
+# in, so a date or instructor filter never has to sort (and hold) its rows.
+EXPORTS = {
+    "lessons": ["id", "student_id", "student_name", "instructor_id", "instructor_name", "lesson_type", "date",
+                "start_time", "duration", "status", "payment"],
+    "students": ["id", "name", "address", "phone", "progress", "lesson_progress", "payment_status", "branch"],
+    "instructors": ["id", "name", "phone", "email", "instructor_type", "branch"],
+}
+
+
+def export_filters(kind, date_from=None, date_to=None, instructor_id=None, branch=None):
+    clauses, params = [], []
+    if kind == "lessons":
+        if date_from:
+            clauses.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("date <= ?")
+            params.append(date_to)
+        if instructor_id is not None:
+            clauses.append("instructor_id = ?")
+            params.append(instructor_id)
+        if branch:
+            clauses.append("instructor_id IN (SELECT id FROM instructors WHERE branch = ?)")
+            params.append(branch)
+    elif branch:
+        clauses.append("branch = ?")
+        params.append(branch)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    return where, params
+
+
+# "csv" or "jsonl" from a file name such as lessons.jsonl.gz
+def format_for(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    extension = os.path.splitext(name)[1].lower().lstrip(".")
+    if extension in ("json", "ndjson"):
+        return "jsonl"
+    return extension if extension in FORMATS else "csv"
+
+
+def open_output(path, compress):
+    if compress:
+        # Level 6 (zlib's usual default) is several times faster than gzip's 9
+        # for a slightly bigger file
+        return gzip.open(path, "wt", compresslevel=6, newline="", encoding="utf-8")
+    return open(path, "w", newline="", encoding="utf-8")
+
+
+# Export kind ("lessons", "students" or "instructors") to path and return
+# the number of rows written. fmt and compress default from the file name.
+#   date_from / date_to: lessons on these dates (inclusive, YYYY-MM-DD)
+#   instructor_id:       lessons with this instructor
+#   branch:              rows of this branch (lessons: the instructor's)
+def export(kind, path, fmt=None, compress=None, date_from=None, date_to=None, instructor_id=None, branch=None,
+           chunk_size=CHUNK_SIZE, db=None):
+    if kind not in EXPORTS:
+        raise ValueError(f"Unknown export: {kind}")
+    fmt = fmt or format_for(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    if compress is None:
+        compress = path.endswith(".gz")
+    db = db or get_db()
+
+    columns = EXPORTS[kind]
+    where, params = export_filters(kind, date_from, date_to, instructor_id, branch)
+    order = "date, id" if kind == "lessons" else "id"
+    sql = f"SELECT {', '.join(columns)} FROM {kind}{where} ORDER BY {order}"
+
+    partial = path + ".part"
+    count = 0
+    try:
+        with open_output(partial, compress) as f:
+            if fmt == "csv":
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                for rows in db.stream(sql, params, chunk_size):
+                    writer.writerows(rows)
+                    count += len(rows)
+            else:
+                for rows in db.stream(sql, params, chunk_size):
+                    f.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows)
+                    count += len(rows)
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export lessons, students or instructors to CSV or JSON Lines")
+    parser.add_argument("kind", choices=sorted(EXPORTS))
+    parser.add_argument("path", help="output file; .jsonl for JSON Lines, add .gz to compress")
+    parser.add_argument("--format", choices=FORMATS, help="override the format implied by the file name")
+    parser.add_argument("--from", dest="date_from", help="first lesson date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", help="last lesson date (YYYY-MM-DD)")
+    parser.add_argument("--instructor", type=int, dest="instructor_id", help="only this instructor's lessons")
+    parser.add_argument("--branch")
+    parser.add_argument("--db", help="database file (default: the application's)")
+    args = parser.parse_args()
+
+    if args.db:
+        set_db_path(args.db)
+    migrate(get_db())
+
+    try:
+        count = export(args.kind, args.path, fmt=args.format, date_from=args.date_from, date_to=args.date_to,
+                       instructor_id=args.instructor_id, branch=args.branch)
+    except (OSError, ValueError) as e:
+        parser.exit(1, f"Export failed: {e}\n")
+    print(f"Exported {count} {args.kind} to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import argparse
+import csv
+import os
+import sqlite3
+from collections import namedtuple
+
+from bookings import DEFAULT_DURATION, format_time, normalize_date, parse_duration, parse_time
+from cache import invalidate
+from catalog import lesson_types
+from database import get_db, set_db_path
+from migrations import add_bulk_lessons, migrate
+
+# Bulk CSV import of students, instructors and lessons. The file is read a
+# row at a time, each row is checked and cleaned, and good rows are inserted
+# with executemany() in batches of BATCH_SIZE, one transaction per batch.
+# Rows that fail a check are written, with the reason, to a rejected-rows CSV
+# next to the input instead of stopping the import.
+#
+#   python importer.py lessons lessons.csv [--db driving_school.db]
+
+BATCH_SIZE = 20000
+IMPORT_CACHE_SIZE = -131072  # KiB, i.e. 128 MB while an import runs
+
+ImportResult = namedtuple("ImportResult", "imported rejected rejected_path")
+
+STATUSES = ("Paid", "Unpaid")
+
+
+def required(row, column):
+    value = row.get(column, "").strip()
+    if not value:
+        raise ValueError(f"{column} is required")
+    return value
+
+
+def optional(row, column, default=None):
+    value = row.get(column, "").strip()
+    return value or default
+
+
+def choice(row, column, choices, default):
+    value = optional(row, column)
+    if value is None:
+        return default
+    for option in choices:
+        if value.lower() == option.lower():
+            return option
+    raise ValueError(f"{column} must be one of {', '.join(choices)}")
+
+
+def whole_number(row, column):
+    value = required(row, column)
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{column} must be a whole number") from None
+
+
+# Dates are stored as YYYY-MM-DD; "2025-3-3" is accepted and padded
+def iso_date(row, column):
+    value = required(row, column)
+    try:
+        return normalize_date(value)
+    except ValueError:
+        raise ValueError(f"{column} must be a date (YYYY-MM-DD)") from None
+
+
+# Optional start_time / duration of a lesson. Imported lessons are history
+# and are not checked for clashes (see bookings.py).
+def lesson_time(row):
+    start_time = optional(row, "start_time")
+    duration = optional(row, "duration")
+    if start_time is not None:
+        start_time = format_time(parse_time(start_time))
+        duration = duration or DEFAULT_DURATION
+    return start_time, parse_duration(duration) if duration is not None else None
+
+
+# --- Row cleaners: CSV row (dict) -> values for the INSERT, or ValueError ---
+def clean_student(row, context):
+    return (required(row, "name"), optional(row, "address"), optional(row, "phone"),
+            optional(row, "progress", "Level 1"), choice(row, "payment_status", STATUSES, "Unpaid"),
+            optional(row, "branch"))
+
+
+def clean_instructor(row, context):
+    email = optional(row, "email")
+    if email is not None and "@" not in email:
+        raise ValueError("email is not an email address")
+    return (required(row, "name"), optional(row, "phone"), email, optional(row, "instructor_type"),
+            optional(row, "branch"))
+
+
+def clean_lesson(row, context):
+    student_id = whole_number(row, "student_id")
+    instructor_id = whole_number(row, "instructor_id")
+    student_name = context["students"].get(student_id)
+    if student_name is None:
+        raise ValueError(f"no student with id {student_id}")
+    instructor_name = context["instructors"].get(instructor_id)
+    if instructor_name is None:
+        raise ValueError(f"no instructor with id {instructor_id}")
+
+    lesson_type = required(row, "lesson_type")
+    catalog_entry = context["lesson_types"].get(lesson_type)
+    if catalog_entry is None:
+        raise ValueError(f"unknown lesson type {lesson_type!r}")
+    # The price it was booked at if given, else today's catalog price
+    payment = whole_number(row, "payment") if optional(row, "payment") else catalog_entry.price
+
+    return (student_id, student_name, instructor_id, instructor_name, lesson_type, iso_date(row, "date"),
+            *lesson_time(row), choice(row, "status", STATUSES, "Unpaid"), payment)
+
+
+def lesson_context(db):
+    return {
+        "students": dict(db.query("SELECT id, name FROM students")),
+        "instructors": dict(db.query("SELECT id, name FROM instructors")),
+        "lesson_types": lesson_types(db),
+    }
+
+
+# Lessons go in with the per-row summary and progress triggers switched off;
+# they are caught up set-based for the whole batch before it commits
+def insert_lessons(c, insert_sql, rows):
+    first_id = c.execute("SELECT IFNULL(MAX(id), 0) + 1 FROM lessons").fetchone()[0]
+    c.execute("INSERT INTO bulk_loads (name) VALUES ('lessons')")
+    c.executemany(insert_sql, rows)
+    add_bulk_lessons(c, first_id)
+    c.execute("DELETE FROM bulk_loads")
+
+
+def insert_rows(c, insert_sql, rows):
+    c.executemany(insert_sql, rows)
+
+
+# kind -> (required CSV columns, INSERT statement, cleaner, context loader, batch writer)
+IMPORTS = {
+    "students": (
+        ["name"],
+        "INSERT INTO students (name, address, phone, progress, payment_status, branch) VALUES (?, ?, ?, ?, ?, ?)",
+        clean_student, None, insert_rows),
+    "instructors": (
+        ["name"],
+        "INSERT INTO instructors (name, phone, email, instructor_type, branch) VALUES (?, ?, ?, ?, ?)",
+        clean_instructor, None, insert_rows),
+    "lessons": (
+        ["student_id", "instructor_id", "lesson_type", "date"],
+        "INSERT INTO lessons (student_id, student_name, instructor_id, instructor_name, lesson_type, date, "
+        "start_time, duration, status, payment) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        clean_lesson, lesson_context, insert_lessons),
+}
+
+
+def rejected_path_for(path):
+    base, _ = os.path.splitext(path)
+    return f"{base}.rejected.csv"
+
+
+# Import the CSV file at path into kind ("students", "instructors" or
+# "lessons"). Batches already committed stay if a later one fails.
+def import_csv(kind, path, batch_size=BATCH_SIZE, rejected_path=None, db=None):
+    if kind not in IMPORTS:
+        raise ValueError(f"Unknown import: {kind}")
+    db = db or get_db()
+    required_columns, insert_sql, clean, load_context, write_batch = IMPORTS[kind]
+    context = load_context(db) if load_context else None
+    rejected_path = rejected_path or rejected_path_for(path)
+
+    imported = rejected = 0
+    rejects_file = rejects = None
+    conn = db.connection()
+    cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+    # Inserts land all over the lesson indexes; a bigger page cache keeps
+    # them from being re-read from disk on every batch
+    conn.execute(f"PRAGMA cache_size = {IMPORT_CACHE_SIZE}")
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            header = [column.strip().lower() for column in next(reader, [])]
+            missing = [column for column in required_columns if column not in header]
+            if missing:
+                raise ValueError(f"{os.path.basename(path)} is missing column(s): {', '.join(missing)}")
+
+            def reject(line, values, reason):
+                nonlocal rejects_file, rejects, rejected
+                if rejects is None:
+                    rejects_file = open(rejected_path, "w", newline="", encoding="utf-8")
+                    rejects = csv.writer(rejects_file)
+                    rejects.writerow(["line", "error"] + header)
+                rejects.writerow([line, reason] + values)
+                rejected += 1
+
+            batch = []  # (line, raw values, cleaned values)
+            for line, values in enumerate(reader, start=2):
+                if not any(values):
+                    continue
+                try:
+                    batch.append((line, values, clean(dict(zip(header, values)), context)))
+                except ValueError as e:
+                    reject(line, values, str(e))
+                if len(batch) >= batch_size:
+                    imported += insert_batch(db, write_batch, insert_sql, batch, reject)
+                    batch = []
+            if batch:
+                imported += insert_batch(db, write_batch, insert_sql, batch, reject)
+    finally:
+        conn.execute(f"PRAGMA cache_size = {cache_size}")
+        if rejects_file is not None:
+            rejects_file.close()
+        # Lessons move students' lesson progress as well
+        invalidate(kind, "students", db=db)
+
+    return ImportResult(imported, rejected, rejected_path if rejected else None)
+
+
+def insert_batch(db, write_batch, insert_sql, batch, reject):
+    try:
+        with db.transaction(immediate=True) as c:
+            write_batch(c, insert_sql, [cleaned for _, _, cleaned in batch])
+        return len(batch)
+    except sqlite3.IntegrityError:
+        pass
+
+    # Something in the batch broke a constraint: insert row by row to find it
+    inserted = 0
+    with db.transaction(immediate=True) as c:
+        for line, values, cleaned in batch:
+            c.execute("SAVEPOINT import_row")
+            try:
+                c.execute(insert_sql, cleaned)
+            except sqlite3.IntegrityError as e:
+                c.execute("ROLLBACK TO import_row")
+                reject(line, values, str(e))
+            else:
+                inserted += 1
+            c.execute("RELEASE import_row")
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import students, instructors or lessons from a CSV file")
+    parser.add_argument("kind", choices=sorted(IMPORTS))
+    parser.add_argument("path")
+    parser.add_argument("--db", help="database file (default: the application's)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.db:
+        set_db_path(args.db)
+    migrate(get_db())
+
+    try:
+        result = import_csv(args.kind, args.path, batch_size=args.batch_size)
+    except (OSError, ValueError) as e:
+        parser.exit(1, f"Import failed: {e}\n")
+    print(f"Imported {result.imported} {args.kind}.")
+    if result.rejected:
+        print(f"Rejected {result.rejected} row(s); see {result.rejected_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,121 @@
-import sqlite3
 import tkinter as tk
-from tkinter import messagebox, simpledialog, ttk 
-from fpdf import FPDF  # type: ignore # Import FPDF library
-import webbrowser
-from PIL import Image, ImageTk
+from tkinter import filedialog, messagebox, ttk
+import hashlib
+import os
+from bookings import DEFAULT_DURATION, RECURRENCES, BookingConflict, reschedule_lesson
+from cache import cache_stats, data_versions
+from catalog import lesson_types
+from database import get_db
+from migrations import migrate
+import profiler
+from reports import dashboard_summary, write_report
+from scheduling import WINDOW_DAYS, find_slots
+from search import name_search_sql
+from services import (Booking, PrerequisiteMissing, add_instructors, add_students, book, book_recurring, delete_rows,
+                      get_row, lesson_progress, update_instructors, update_students)
+from executor import BackgroundExecutor
+from exporter import export
+from importer import import_csv
+from widgets import BusyIndicator, PagedListbox, TypeAheadPicker, VirtualTable
+
+REPORT_PATH = "driving_school_report.pdf"
+
+LOGO_PATH = "logo.png"
+LOGO_SIZE = (400, 400)
+# Resized copies of images, made once so that startup only has to load them
+IMAGE_CACHE_DIR = ".image_cache"
 
 # Database Setup
 def create_db():
-    conn = sqlite3.connect("driving_school.db")
-    c = conn.cursor()
-
-    # Create students table
-    c.execute('''CREATE TABLE IF NOT EXISTS students (
-                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                 name TEXT,
-                 address TEXT,
-                 phone TEXT,
-                 progress TEXT,
-                 payment_status TEXT)''')
-
-    # Create instructors table
-    c.execute('''CREATE TABLE IF NOT EXISTS instructors (
-                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                 name TEXT,
-                 phone TEXT,
-                 email TEXT,
-                 instructor_type TEXT)''')
-
-    # Create lessons table (with payment column)
-    c.execute('''CREATE TABLE IF NOT EXISTS lessons (
-                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                 student_id INTEGER,
-                 student_name TEXT
-                 instructor_id INTEGER,
-                 instructor_name TEXT
-                 lesson_type TEXT,
-                 date TEXT,
-                 payment INTEGER,  -- Payment for the lesson
-                 status TEXT,
-                 FOREIGN KEY(student_id) REFERENCES students(id),
-                 FOREIGN KEY(instructor_id) REFERENCES instructors(id))''')
-
-    # Create payments table
-    c.execute('''CREATE TABLE IF NOT EXISTS payments (
-                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                 student_id INTEGER,
-                 amount INTEGER,
-                 payment_date TEXT,
-                 FOREIGN KEY(student_id) REFERENCES students(id))''')
-
-
-    conn.commit()
-    conn.close()
+    # Create or upgrade the schema (tables, fixes and indexes)
+    migrate(get_db())
+
+
+EXPORT_FILE_TYPES = [("CSV", "*.csv"), ("CSV, gzipped", "*.csv.gz"),
+                     ("JSON Lines", "*.jsonl"), ("JSON Lines, gzipped", "*.jsonl.gz")]
+
+
+# Path of a PNG copy of the image at path resized to size, made with PIL the
+# first time (PIL is slow to import, so it is only loaded then). Copies are
+# named after the source's hash, so a new logo gets a new copy.
+def scaled_image(path, size, cache_dir=IMAGE_CACHE_DIR):
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    width, height = size
+    scaled_path = os.path.join(cache_dir, f"{digest}-{width}x{height}.png")
+    if not os.path.exists(scaled_path):
+        from PIL import Image
+
+        os.makedirs(cache_dir, exist_ok=True)
+        with Image.open(path) as img:
+            img = img.resize(size, Image.LANCZOS)
+        # Another instance may be starting at the same time
+        partial_path = f"{scaled_path}.{os.getpid()}"
+        img.save(partial_path, "PNG")
+        os.replace(partial_path, scaled_path)
+    return scaled_path
+
+
+# One line per lesson of a series booking, for the result dialogs
+def describe_occurrences(occurrences):
+    lines = []
+    for occurrence in occurrences:
+        if occurrence.lesson_id is not None:
+            outcome = f"booked (lesson {occurrence.lesson_id})"
+        elif occurrence.clashes:
+            outcome = f"clash: {BookingConflict(occurrence.clashes)}"
+        else:
+            outcome = "free"
+        lines.append(f"{occurrence.date} {occurrence.start_time}: {outcome}")
+    return "\n".join(lines)
+
+
+# The Reporting screen's dashboard figures as text
+def dashboard_text(summary):
+    lines = [f"Total lessons booked: {summary.lessons_booked}",
+             f"Total students: {summary.students}",
+             f"Total instructors: {summary.instructors}",
+             f"Total payments received: £{summary.revenue}",
+             f"Paid lesson revenue: £{summary.lesson_revenue}",
+             f"Outstanding (unpaid lessons): £{summary.outstanding}"]
+
+    lines += ["", "Lessons by type and status:"]
+    for lesson_type, status, count in summary.lessons_by_type:
+        lines.append(f"    {lesson_type or '(none)'} - {status or '(none)'}: {count}")
+
+    if summary.revenue_by_month:
+        lines += ["", "Revenue by month:"]
+        for month, payments, amount in summary.revenue_by_month:
+            lines.append(f"    {month}: £{amount} ({payments} payments)")
+
+    if summary.instructor_load:
+        lines += ["", "Busiest instructors:"]
+        for name, lessons, unpaid in summary.instructor_load:
+            lines.append(f"    {name}: {lessons} lessons ({unpaid} unpaid)")
+
+    stats = cache_stats()
+    lines += ["", f"Read cache: {stats.hits} hits, {stats.misses} misses, {stats.entries} entries"]
+    return "\n".join(lines)
+
+
+# Destroy a form's widgets (those gridded from from_row down) before it is
+# built again. Panels are kept for the session (see Application), so every
+# rebuild would otherwise be laid over the widgets of the one before.
+def clear_form(frame, from_row=0):
+    for widget in frame.grid_slaves():
+        if int(widget.grid_info()["row"]) >= from_row:
+            widget.destroy()
+
+
+# Ask where to save an export of kind, then write it on a worker thread
+def ask_export_path(executor, kind, **filters):
+    path = filedialog.asksaveasfilename(title=f"Export {kind}", initialfile=f"{kind}.csv",
+                                        defaultextension=".csv", filetypes=EXPORT_FILE_TYPES)
+    if not path:
+        return
+    executor.submit(export, kind, path, key="export", **filters,
+                    on_done=lambda count: messagebox.showinfo("Export", f"Exported {count} {kind} to {path}"),
+                    on_error=lambda e: messagebox.showerror("Error", f"Export failed: {e}"))
 
 
 # Main Application Window
@@ -68,6 +132,16 @@ class Application:
         self.root.columnconfigure(1, weight=1)  # Right frame expands
         self.root.rowconfigure(0, weight=1)
 
+        # Worker threads for database and report jobs
+        self.executor = BackgroundExecutor(root)
+
+        # Management panels, built the first time they are opened and then
+        # kept: panel class -> (frame, panel, data versions when last shown)
+        self.panels = {}
+        self.current_panel = None
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        self.create_menu()
         self.create_widgets()
         # Set background colors
         # Set background colors
@@ -84,6 +158,37 @@ class Application:
 
        
 
+    def create_menu(self):
+        menubar = tk.Menu(self.root)
+        file_menu = tk.Menu(menubar, tearoff=0)
+        for kind in ("students", "instructors", "lessons"):
+            file_menu.add_command(label=f"Import {kind.capitalize()} from CSV...",
+                                  command=lambda kind=kind: self.import_file(kind))
+        file_menu.add_separator()
+        for kind in ("students", "instructors", "lessons"):
+            file_menu.add_command(label=f"Export {kind.capitalize()}...",
+                                  command=lambda kind=kind: ask_export_path(self.executor, kind))
+        file_menu.add_separator()
+        file_menu.add_command(label="Exit", command=self.on_close)
+        menubar.add_cascade(label="File", menu=file_menu)
+        self.root.config(menu=menubar)
+
+    def import_file(self, kind):
+        path = filedialog.askopenfilename(title=f"Import {kind}",
+                                          filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not path:
+            return
+
+        def imported(result):
+            message = f"Imported {result.imported} {kind}."
+            if result.rejected:
+                message += f"\n\n{result.rejected} row(s) were rejected; see {result.rejected_path}"
+            messagebox.showinfo("Import", message)
+
+        # Runs in batches on a worker thread; Cancel keeps the batches already committed
+        self.executor.submit(import_csv, kind, path, key="import", on_done=imported,
+                             on_error=lambda e: messagebox.showerror("Error", f"Import failed: {e}"))
+
     def create_widgets(self):
         # Buttons for different management systems
 
@@ -97,14 +202,8 @@ class Application:
 
         # Add logo image
         try:
-            # Open the image using PIL
-            img = Image.open("logo.png")  # Replace "logo.png" with your image file
-
-            # Resize the image using PIL
-            img = img.resize((400, 400), Image.LANCZOS)
-
-            # Convert back to PhotoImage
-            self.logo_img = ImageTk.PhotoImage(img)  # Assign to self.logo_img
+            # Tk loads the cached resized copy itself (see scaled_image)
+            self.logo_img = tk.PhotoImage(file=scaled_image(LOGO_PATH, LOGO_SIZE))  # Assign to self.logo_img
 
             logo_label = tk.Label(self.main_frame, image=self.logo_img, bg="#00A300")
             logo_label.grid(row=0, column=0, pady=5, padx=20,)
@@ -133,26 +232,69 @@ class Application:
         ttk.Button(self.main_frame, text="Reporting", style='My.TButton',
                 command=lambda: self.open_management_window(Reporting)).grid(row=4, column=0, pady=(5, 100), padx=20, sticky="ew")
 
+        # Progress indicator while background jobs run
+        self.busy_indicator = BusyIndicator(self.main_frame, self.executor, bg="#00A300")
+        self.busy_indicator.grid(row=6, column=0, pady=(0, 20))
+
         # Right frame for content
         self.right_frame = tk.Frame(self.root, bg="#007500")
         self.right_frame.grid(row=0, column=1, sticky="nsew")
     
         # Add welcome message to right frame
-        welcome_label = tk.Label(self.right_frame, text="Welcome to IT Driving School!", font=("Arial", 24, "bold"), bg="#007500", fg="white")
-        welcome_label.pack(expand=True, pady=50)  # Center the label with padding
-
+        self.welcome_label = tk.Label(self.right_frame, text="Welcome to IT Driving School!", font=("Arial", 24, "bold"), bg="#007500", fg="white")
+        self.welcome_label.pack(expand=True, pady=50)  # Center the label with padding
+
+    def on_close(self):
+        # Stop queries still running so the process can exit straight away
+        self.executor.shutdown()
+        self.root.destroy()
+
+    # Show the panel of window_class in the right frame. Panels are kept when
+    # another is opened, with their forms, lists and searches as they were
+    # (results still on their way land in them too); coming back reloads a
+    # panel's lists only if its tables have changed since it was last shown.
+    # The panel is shown straight away and the check runs on a worker.
     def open_management_window(self, window_class):
-        # Clear any existing widgets in the right frame
-        for widget in self.right_frame.winfo_children():
-            widget.destroy()
+        if self.current_panel is not None:
+            self.panels[self.current_panel][0].pack_forget()
+        else:
+            self.welcome_label.pack_forget()
+
+        if window_class not in self.panels:
+            frame = tk.Frame(self.right_frame, bg=self.right_frame.cget("bg"))
+            self.panels[window_class] = (frame, window_class(frame, self.executor), None)
+        self.current_panel = window_class
+        self.panels[window_class][0].pack(fill="both", expand=True)
 
-        # Create an instance of the window class
-        window_instance = window_class(self.right_frame) 
+        def check(versions):
+            frame, panel, seen = self.panels[window_class]
+            if seen is not None and seen != versions:
+                panel.refresh()
+            self.panels[window_class] = (frame, panel, versions)
+
+        # Keyed per panel: a quick switch elsewhere does not cancel the check
+        self.executor.submit(data_versions, window_class.TABLES, key=("panel-versions", window_class),
+                             on_done=check, on_error=lambda e: messagebox.showerror("Error", f"Error checking for changes: {e}"))
 
 
 class StudentManagement:
-    def __init__(self, parent_frame):
+    # Tables whose changes make the panel's lists stale (see Application)
+    TABLES = ("students",)
+
+    # Columns of the View Students table: (column, heading, width)
+    LIST_COLUMNS = [("id", "ID", 50), ("name", "Name", 150), ("address", "Address", 200),
+                    ("phone", "Phone", 110), ("progress", "Progress", 80), ("lesson_progress", "Lesson Progress %", 110),
+                    ("payment_status", "Payment Status", 110)]
+
+    def __init__(self, parent_frame, executor):
         self.window = parent_frame
+        self.executor = executor
+        self.students_table = None
+        self.view_students_search = None
+        self.update_students_search = None
+        self.update_students_results = None
+        self.delete_students_search = None
+        self.delete_students_results = None
 
         # Create button style
         button_style = ttk.Style()
@@ -211,6 +353,7 @@ class StudentManagement:
     def show_add_student_form(self):
         self.hide_all_forms()
         self.add_student_frame.grid()
+        clear_form(self.add_student_frame)
         # Create labels and entry fields for the add student form within the frame
         tk.Label(self.add_student_frame, text="Name:").grid(row=0, column=0, padx=5, pady=5)
         self.name_entry = tk.Entry(self.add_student_frame)
@@ -252,19 +395,18 @@ class StudentManagement:
                 return
             # --- End of Input Validation ---
 
-            conn = sqlite3.connect("driving_school.db")
-            c = conn.cursor()
-            try:
-                c.execute("INSERT INTO students (name, address, phone, progress, payment_status) VALUES (?, ?, ?, ?, ?)",
-                        (name, address, phone, progress, payment_status))
-                conn.commit()
+            def added(_):
                 messagebox.showinfo("Success", "Student added successfully!")
-            except Exception as e:
+                self.clear_add_student_form()
+
+            def failed(e):
                 messagebox.showerror("Error", f"Failed to add student: {e}")
-            finally:
-                conn.close()
                 self.clear_add_student_form()
 
+            self.executor.submit(add_students, [{"name": name, "address": address, "phone": phone, "progress": progress,
+                                                 "payment_status": payment_status}],
+                                 on_done=added, on_error=failed)
+
        
 
         submit_button = ttk.Button(self.add_student_frame, text="Submit", style='Submit.TButton', command=submit_data)
@@ -280,79 +422,68 @@ class StudentManagement:
     def show_update_student_form(self):
         self.hide_all_forms()
         self.update_student_frame.grid()
+        clear_form(self.update_student_frame)
 
         # --- Search Functionality ---
         tk.Label(self.update_student_frame, text="Search by Name:").grid(row=0, column=0, padx=5, pady=5)
-        self.search_entry = tk.Entry(self.update_student_frame)
-        self.search_entry.grid(row=0, column=1, padx=5, pady=5)
+        self.update_students_search = tk.Entry(self.update_student_frame)
+        self.update_students_search.grid(row=0, column=1, padx=5, pady=5)
 
         search_button = tk.Button(self.update_student_frame, text="Search", command=self.search_student)
         search_button.grid(row=0, column=2, padx=5, pady=5)
 
         # Listbox to display search results
-        self.search_results = tk.Listbox(self.update_student_frame)
-        self.search_results.grid(row=1, column=0, columnspan=3, padx=5, pady=5, sticky="ew")
-        self.search_results.bind("<<ListboxSelect>>", self.show_update_form) 
+        self.update_students_results = PagedListbox(self.update_student_frame, executor=self.executor)
+        self.update_students_results.grid(row=1, column=0, columnspan=3, padx=5, pady=5, sticky="ew")
+        self.update_students_results.bind("<<ListboxSelect>>", self.show_update_form)
         # --- End of Search Functionality ---
 
     def search_student(self):
-        search_term = self.search_entry.get()
+        search_term = self.update_students_search.get()
         if not search_term:
             messagebox.showwarning("Warning", "Please enter a search term.")
             return
 
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-        try:
-            c.execute("SELECT id, name FROM students WHERE name LIKE ?", ('%' + search_term + '%',))
-            student_data = c.fetchall()
-            self.search_results.delete(0, tk.END) 
-            if student_data:
-                for student in student_data:
-                    self.search_results.insert(tk.END, f"{student[0]} - {student[1]}") 
-            else:
+        def loaded(count):
+            if not count:
                 messagebox.showinfo("Info", "No student found with that name.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error searching student: {e}")
-        finally:
-            conn.close()
+
+        # First page of matches; more are fetched as the list is scrolled
+        self.update_students_results.show(
+            *name_search_sql("students", search_term), on_loaded=loaded,
+            on_error=lambda e: messagebox.showerror("Error", f"Error searching student: {e}"))
 
     def show_update_form(self, event):
-        selection = self.search_results.curselection()
+        selection = self.update_students_results.curselection()
         if selection:
             selected_index = selection[0]
-            selected_student = self.search_results.get(selected_index)
+            selected_student = self.update_students_results.get(selected_index)
             student_id = selected_student.split(" - ")[0] 
 
-            # Fetch the student data based on student_id
-            conn = sqlite3.connect("driving_school.db")
-            c = conn.cursor()
-            try:
-                c.execute("SELECT * FROM students WHERE id=?", (student_id,))
-                student_data = c.fetchone()
-                
+            def show_form(student_data):
                 if student_data:
+                    clear_form(self.update_student_frame, from_row=2)
                     # Create update form elements dynamically
                     tk.Label(self.update_student_frame, text="Address:").grid(row=2, column=0, padx=5, pady=5)
                     self.address_entry = tk.Entry(self.update_student_frame)
                     self.address_entry.grid(row=2, column=1, padx=5, pady=5)
-                    self.address_entry.insert(0, student_data[2])
+                    self.address_entry.insert(0, student_data["address"])
 
                     tk.Label(self.update_student_frame, text="Phone:").grid(row=3, column=0, padx=5, pady=5)
                     self.phone_entry = tk.Entry(self.update_student_frame)
                     self.phone_entry.grid(row=3, column=1, padx=5, pady=5)
-                    self.phone_entry.insert(0, student_data[3])
+                    self.phone_entry.insert(0, student_data["phone"])
 
                      # Progress Combobox
                     tk.Label(self.update_student_frame, text="Progress:").grid(row=4, column=0, padx=5, pady=5)
-                    self.progress_var = tk.StringVar(value=student_data[4])  # Set initial value
+                    self.progress_var = tk.StringVar(value=student_data["progress"])  # Set initial value
                     progress_combobox = ttk.Combobox(self.update_student_frame, textvariable=self.progress_var)
                     progress_combobox['values'] = tuple(f"Level {i}" for i in range(1, 11))
                     progress_combobox.grid(row=4, column=1, padx=5, pady=5)
 
                     # Payment Status Combobox
                     tk.Label(self.update_student_frame, text="Payment Status:").grid(row=5, column=0, padx=5, pady=5)
-                    self.payment_status_var = tk.StringVar(value=student_data[5])  # Set initial value
+                    self.payment_status_var = tk.StringVar(value=student_data["payment_status"])  # Set initial value
                     payment_status_combobox = ttk.Combobox(self.update_student_frame, textvariable=self.payment_status_var)
                     payment_status_combobox['values'] = ("Paid", "Unpaid")
                     payment_status_combobox.grid(row=5, column=1, padx=5, pady=5)
@@ -361,10 +492,10 @@ class StudentManagement:
                     update_button = tk.Button(self.update_student_frame, text="Update", command=lambda: self.update_student(student_id))
                     update_button.grid(row=6, column=0, columnspan=2, pady=10, sticky="ew", padx=50) 
 
-            except Exception as e:
-                messagebox.showerror("Error", f"Error fetching student data: {e}")
-            finally:
-                conn.close()
+            # Fetch the student data based on student_id
+            self.executor.submit(get_row, "students", student_id,
+                                 key="student-form", on_done=show_form,
+                                 on_error=lambda e: messagebox.showerror("Error", f"Error fetching student data: {e}"))
 
     def update_student(self, student_id):
         # Get the updated values from the input fields
@@ -374,17 +505,10 @@ class StudentManagement:
         payment_status = self.payment_status_var.get()  # Get payment status value
 
         # Update the student data in the database
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-        try:
-            c.execute("""UPDATE students SET address=?, phone=?, progress=?, payment_status=? WHERE id=?""",
-                      (address, phone, progress, payment_status, student_id))
-            conn.commit()
-            messagebox.showinfo("Success", "Student updated successfully!")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to update student: {e}")
-        finally:
-            conn.close()
+        self.executor.submit(update_students, [(student_id, {"address": address, "phone": phone, "progress": progress,
+                                                             "payment_status": payment_status})],
+                             on_done=lambda _: messagebox.showinfo("Success", "Student updated successfully!"),
+                             on_error=lambda e: messagebox.showerror("Error", f"Failed to update student: {e}"))
 
     def hide_all_forms(self):
         self.add_student_frame.grid_remove()
@@ -392,123 +516,82 @@ class StudentManagement:
         self.view_students_frame.grid_remove()
         self.delete_student_frame.grid_remove()
 
+    # Reload the lists shown, after the students changed
+    def refresh(self):
+        for view in (self.students_table, self.update_students_results, self.delete_students_results):
+            if view is not None:
+                view.refresh()
+
     def view_students(self):
         self.hide_all_forms()
         self.view_students_frame.grid()
+        clear_form(self.view_students_frame)
 
         # --- Search Functionality ---
         tk.Label(self.view_students_frame, text="Search by Name:").grid(row=0, column=0, padx=5, pady=5)
-        self.search_entry = tk.Entry(self.view_students_frame)
-        self.search_entry.grid(row=0, column=1, padx=5, pady=5)
+        self.view_students_search = tk.Entry(self.view_students_frame)
+        self.view_students_search.grid(row=0, column=1, padx=5, pady=5)
 
         search_button = tk.Button(self.view_students_frame, text="Search", command=self.search_and_display_students)
         search_button.grid(row=0, column=2, padx=5, pady=5)
         # --- End of Search Functionality ---
 
-        # Frame to hold the canvas and scrollbar (placed below the search bar)
-        self.canvas_frame = tk.Frame(self.view_students_frame)
-        self.canvas_frame.grid(row=1, column=0, columnspan=3, pady=10, sticky="nsew")
-
-        # Create a canvas and scrollbar inside the canvas_frame
-        self.canvas = tk.Canvas(self.canvas_frame)
-        scrollbar = ttk.Scrollbar(self.canvas_frame, orient="vertical", command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=scrollbar.set)
-
-        # Pack canvas and scrollbar
-        self.canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-        self.inner_frame = tk.Frame(self.canvas)
-        canvas_window = self.canvas.create_window((0, 0), window=self.inner_frame, anchor="nw")
+        # Table of students (rows are loaded as the user scrolls)
+        self.students_table = VirtualTable(
+            self.view_students_frame, self.LIST_COLUMNS, self.students_query, executor=self.executor,
+            on_error=lambda e: messagebox.showerror("Error", f"Error fetching student data: {e}"))
+        self.students_table.grid(row=1, column=0, columnspan=3, pady=10, sticky="nsew")
 
         # Initial display of all students
         self.search_and_display_students()
 
-        # Update canvas scroll region (bind to configure event)
-        def on_canvas_configure(event):
-            self.canvas.itemconfig(canvas_window, width=event.width)
-            self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-
-        self.canvas.bind("<Configure>", on_canvas_configure)
-
     def search_and_display_students(self):
-        search_term = self.search_entry.get()
+        self.students_table.reload()
 
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-        try:
-            if search_term:
-                c.execute("SELECT * FROM students WHERE name LIKE ?", ('%' + search_term + '%',))
-            else:
-                c.execute("SELECT * FROM students")  # Fetch all if no search term
-
-            students = c.fetchall()
-
-            # Clear existing widgets in the inner frame
-            for widget in self.inner_frame.winfo_children():
-                widget.destroy()
-
-            # Create labels to display student details within the inner frame
-            for i, student in enumerate(students):
-                student_details = f"""
-                ID: {student[0]}
-                Name: {student[1]}
-                Address: {student[2]}
-                Phone: {student[3]}
-                Progress: {student[4]}
-                Payment Status: {student[5]}
-                """
-                tk.Label(self.inner_frame, text=student_details, justify="left").grid(row=i, column=0, sticky="w")
+    def students_query(self):
+        # All students if the search box is empty
+        columns = [column for column, _, _ in self.LIST_COLUMNS]
+        return name_search_sql("students", self.view_students_search.get(), columns)
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Error fetching student data: {e}")
-        finally:
-            conn.close()
-    
     def delete_student(self):
         self.hide_all_forms()
         self.delete_student_frame.grid()
+        clear_form(self.delete_student_frame)
 
         # --- Search Functionality ---
         tk.Label(self.delete_student_frame, text="Search by Name:").grid(row=0, column=0, padx=5, pady=5)
-        self.search_entry = tk.Entry(self.delete_student_frame)
-        self.search_entry.grid(row=0, column=1, padx=5, pady=5)
+        self.delete_students_search = tk.Entry(self.delete_student_frame)
+        self.delete_students_search.grid(row=0, column=1, padx=5, pady=5)
 
         search_button = tk.Button(self.delete_student_frame, text="Search", command=self.search_student_for_deletion)
         search_button.grid(row=0, column=2, padx=5, pady=5)
 
         # Listbox to display search results
-        self.search_results = tk.Listbox(self.delete_student_frame)
-        self.search_results.grid(row=1, column=0, columnspan=3, padx=5, pady=5, sticky="ew")
-        self.search_results.bind("<<ListboxSelect>>", self.show_delete_confirmation)
+        self.delete_students_results = PagedListbox(self.delete_student_frame, executor=self.executor)
+        self.delete_students_results.grid(row=1, column=0, columnspan=3, padx=5, pady=5, sticky="ew")
+        self.delete_students_results.bind("<<ListboxSelect>>", self.show_delete_confirmation)
         # --- End of Search Functionality ---
 
     def search_student_for_deletion(self):
-        search_term = self.search_entry.get()
+        search_term = self.delete_students_search.get()
         if not search_term:
             messagebox.showwarning("Warning", "Please enter a search term.")
             return
 
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-        try:
-            c.execute("SELECT id, name FROM students WHERE name LIKE ?", ('%' + search_term + '%',))
-            student_data = c.fetchall()
-            self.search_results.delete(0, tk.END)  # Clear previous results
-            if student_data:
-                for student in student_data:
-                    self.search_results.insert(tk.END, f"{student[0]} - {student[1]}")  # Display ID and name
-            else:
+        def loaded(count):
+            if not count:
                 messagebox.showinfo("Info", "No student found with that name.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error searching student: {e}")
-        finally:
-            conn.close()
+
+        # First page of matches; more are fetched as the list is scrolled
+        self.delete_students_results.show(
+            *name_search_sql("students", search_term), on_loaded=loaded,
+            on_error=lambda e: messagebox.showerror("Error", f"Error searching student: {e}"))
 
     def show_delete_confirmation(self, event):
-        selection = self.search_results.curselection()
+        selection = self.delete_students_results.curselection()
         if selection:
             selected_index = selection[0]
-            selected_student = self.search_results.get(selected_index)
+            selected_student = self.delete_students_results.get(selected_index)
             student_id = selected_student.split(" - ")[0]  # Extract student ID
 
             # Show confirmation dialog
@@ -517,21 +600,31 @@ class StudentManagement:
                 self.delete_student_from_db(student_id)
 
     def delete_student_from_db(self, student_id):
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-        try:
-            c.execute("DELETE FROM students WHERE id=?", (student_id,))
-            conn.commit()
+        def deleted(_):
             messagebox.showinfo("Success", "Student deleted successfully!")
             self.search_student_for_deletion()  # Refresh the search results
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to delete student: {e}")
-        finally:
-            conn.close()
+
+        self.executor.submit(delete_rows, "students", [student_id],
+                             on_done=deleted,
+                             on_error=lambda e: messagebox.showerror("Error", f"Failed to delete student: {e}"))
 # Instructor Management Window
 class InstructorManagement:
-    def __init__(self, parent_frame):
+    # Tables whose changes make the panel's lists stale (see Application)
+    TABLES = ("instructors",)
+
+    # Columns of the View Instructors table: (column, heading, width)
+    LIST_COLUMNS = [("id", "ID", 50), ("name", "Name", 150), ("phone", "Phone", 110),
+                    ("email", "Email", 200), ("instructor_type", "Instructor Type", 110)]
+
+    def __init__(self, parent_frame, executor):
         self.window = parent_frame
+        self.executor = executor
+        self.instructors_table = None
+        self.view_instructors_search = None
+        self.update_instructors_search = None
+        self.update_instructors_results = None
+        self.delete_instructors_search = None
+        self.delete_instructors_results = None
 
         # Create button style
         button_style = ttk.Style()
@@ -588,6 +681,7 @@ class InstructorManagement:
     def show_add_instructor_form(self):
         self.hide_all_forms()
         self.add_instructor_frame.grid()
+        clear_form(self.add_instructor_frame)
 
         # Create labels and entry fields for the add instructor form
         tk.Label(self.add_instructor_frame, text="Name:").grid(row=0, column=0, padx=5, pady=5)
@@ -622,19 +716,18 @@ class InstructorManagement:
                 return
             # --- End of Input Validation ---
 
-            conn = sqlite3.connect("driving_school.db")
-            c = conn.cursor()
-            try:
-                c.execute("INSERT INTO instructors (name, phone, email, instructor_type) VALUES (?, ?, ?, ?)",
-                        (name, phone, email, instructor_type))
-                conn.commit()
+            def added(_):
                 messagebox.showinfo("Success", "Instructor added successfully!")
-            except Exception as e:
+                self.clear_add_instructor_form()
+
+            def failed(e):
                 messagebox.showerror("Error", f"Failed to add instructor: {e}")
-            finally:
-                conn.close()
                 self.clear_add_instructor_form()
 
+            self.executor.submit(add_instructors, [{"name": name, "phone": phone, "email": email,
+                                                    "instructor_type": instructor_type}],
+                                 on_done=added, on_error=failed)
+
         # Create a submit button
         submit_button = tk.Button(self.add_instructor_frame, text="Submit", command=submit_data)
         submit_button.grid(row=4, column=0, columnspan=2, pady=10, sticky="ew", padx=50) 
@@ -647,143 +740,92 @@ class InstructorManagement:
     def view_instructors(self):
         self.hide_all_forms()
         self.view_instructors_frame.grid()
+        clear_form(self.view_instructors_frame)
 
         # --- Search Functionality ---
         tk.Label(self.view_instructors_frame, text="Search by Name:").grid(row=0, column=0, padx=5, pady=5)
-        self.search_entry = tk.Entry(self.view_instructors_frame)
-        self.search_entry.grid(row=0, column=1, padx=5, pady=5)
+        self.view_instructors_search = tk.Entry(self.view_instructors_frame)
+        self.view_instructors_search.grid(row=0, column=1, padx=5, pady=5)
 
         search_button = tk.Button(self.view_instructors_frame, text="Search", command=self.search_and_display_instructors)
         search_button.grid(row=0, column=2, padx=5, pady=5)
         # --- End of Search Functionality ---
 
-        # Frame to hold the canvas and scrollbar (placed below the search bar)
-        self.canvas_frame = tk.Frame(self.view_instructors_frame)
-        self.canvas_frame.grid(row=1, column=0, columnspan=3, pady=10, sticky="nsew")
-
-        # Create a canvas and scrollbar inside the canvas_frame
-        self.canvas = tk.Canvas(self.canvas_frame)  # Make canvas an instance variable
-        scrollbar = ttk.Scrollbar(self.canvas_frame, orient="vertical", command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=scrollbar.set)
-
-        # Pack canvas and scrollbar
-        self.canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-        self.inner_frame = tk.Frame(self.canvas)  # Make inner_frame an instance variable
-        canvas_window = self.canvas.create_window((0, 0), window=self.inner_frame, anchor="nw")
+        # Table of instructors (rows are loaded as the user scrolls)
+        self.instructors_table = VirtualTable(
+            self.view_instructors_frame, self.LIST_COLUMNS, self.instructors_query, executor=self.executor,
+            on_error=lambda e: messagebox.showerror("Error", f"Error fetching instructor data: {e}"))
+        self.instructors_table.grid(row=1, column=0, columnspan=3, pady=10, sticky="nsew")
 
         # Initial display of all instructors
         self.search_and_display_instructors()  # Call the search function to display instructors
 
-        # Update canvas scroll region (bind to configure event)
-        def on_canvas_configure(event):
-            self.canvas.itemconfig(canvas_window, width=event.width)
-            self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-
-        self.canvas.bind("<Configure>", on_canvas_configure)
-
     def search_and_display_instructors(self):
-        search_term = self.search_entry.get()
-
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-        try:
-            if search_term:
-                c.execute("SELECT * FROM instructors WHERE name LIKE ?", ('%' + search_term + '%',))
-            else:
-                c.execute("SELECT * FROM instructors")  # Fetch all if no search term
-
-            instructors = c.fetchall()
-
-            # Clear existing widgets in the inner frame
-            for widget in self.inner_frame.winfo_children():
-                widget.destroy()
-
-            # Create labels to display instructor details within the inner frame
-            for i, instructor in enumerate(instructors):
-                instructor_details = f"""
-                ID: {instructor[0]}
-                Name: {instructor[1]}
-                Phone: {instructor[2]}
-                Email: {instructor[3]}
-                Instructor Type: {instructor[4]} 
-                """
-                tk.Label(self.inner_frame, text=instructor_details, justify="left").grid(row=i, column=0, sticky="w")
+        self.instructors_table.reload()
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Error fetching instructor data: {e}")
-        finally:
-            conn.close()
+    def instructors_query(self):
+        # All instructors if the search box is empty
+        columns = [column for column, _, _ in self.LIST_COLUMNS]
+        return name_search_sql("instructors", self.view_instructors_search.get(), columns)
 
     def show_update_instructor_form(self):
         self.hide_all_forms()
         self.update_instructor_frame.grid()
+        clear_form(self.update_instructor_frame)
 
         # --- Search Functionality ---
         tk.Label(self.update_instructor_frame, text="Search by Name:").grid(row=0, column=0, padx=5, pady=5)
-        self.search_entry = tk.Entry(self.update_instructor_frame)
-        self.search_entry.grid(row=0, column=1, padx=5, pady=5)
+        self.update_instructors_search = tk.Entry(self.update_instructor_frame)
+        self.update_instructors_search.grid(row=0, column=1, padx=5, pady=5)
 
         search_button = tk.Button(self.update_instructor_frame, text="Search", command=self.search_instructor)
         search_button.grid(row=0, column=2, padx=5, pady=5)
 
         # Listbox to display search results
-        self.search_results = tk.Listbox(self.update_instructor_frame)
-        self.search_results.grid(row=1, column=0, columnspan=3, padx=5, pady=5, sticky="ew")
-        self.search_results.bind("<<ListboxSelect>>", self.show_instructor_update_form)
+        self.update_instructors_results = PagedListbox(self.update_instructor_frame, executor=self.executor)
+        self.update_instructors_results.grid(row=1, column=0, columnspan=3, padx=5, pady=5, sticky="ew")
+        self.update_instructors_results.bind("<<ListboxSelect>>", self.show_instructor_update_form)
         # --- End of Search Functionality ---
 
     def search_instructor(self):
-        search_term = self.search_entry.get()
+        search_term = self.update_instructors_search.get()
         if not search_term:
             messagebox.showwarning("Warning", "Please enter a search term.")
             return
 
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-        try:
-            c.execute("SELECT id, name FROM instructors WHERE name LIKE ?", ('%' + search_term + '%',))
-            instructor_data = c.fetchall()
-            self.search_results.delete(0, tk.END)
-            if instructor_data:
-                for instructor in instructor_data:
-                    self.search_results.insert(tk.END, f"{instructor[0]} - {instructor[1]}")
-            else:
+        def loaded(count):
+            if not count:
                 messagebox.showinfo("Info", "No instructor found with that name.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error searching instructor: {e}")
-        finally:
-            conn.close()
+
+        # First page of matches; more are fetched as the list is scrolled
+        self.update_instructors_results.show(
+            *name_search_sql("instructors", search_term), on_loaded=loaded,
+            on_error=lambda e: messagebox.showerror("Error", f"Error searching instructor: {e}"))
 
     def show_instructor_update_form(self, event):
-        selection = self.search_results.curselection()
+        selection = self.update_instructors_results.curselection()
         if selection:
             selected_index = selection[0]
-            selected_instructor = self.search_results.get(selected_index)
+            selected_instructor = self.update_instructors_results.get(selected_index)
             instructor_id = selected_instructor.split(" - ")[0]
 
-            # Fetch instructor data
-            conn = sqlite3.connect("driving_school.db")
-            c = conn.cursor()
-            try:
-                c.execute("SELECT * FROM instructors WHERE id=?", (instructor_id,))
-                instructor_data = c.fetchone()
-
+            def show_form(instructor_data):
                 if instructor_data:
+                    clear_form(self.update_instructor_frame, from_row=2)
                     # Create update form elements
                     tk.Label(self.update_instructor_frame, text="Phone:").grid(row=2, column=0, padx=5, pady=5)
                     self.phone_entry = tk.Entry(self.update_instructor_frame)
                     self.phone_entry.grid(row=2, column=1, padx=5, pady=5)
-                    self.phone_entry.insert(0, instructor_data[2])
+                    self.phone_entry.insert(0, instructor_data["phone"])
 
                     tk.Label(self.update_instructor_frame, text="Email:").grid(row=3, column=0, padx=5, pady=5)
                     self.email_entry = tk.Entry(self.update_instructor_frame)
                     self.email_entry.grid(row=3, column=1, padx=5, pady=5)
-                    self.email_entry.insert(0, instructor_data[3])
+                    self.email_entry.insert(0, instructor_data["email"])
 
                     # Instructor Type dropdown (for updating)
                     tk.Label(self.update_instructor_frame, text="Instructor Type:").grid(row=4, column=0, padx=5, pady=5)
-                    self.instructor_type_var = tk.StringVar(value=instructor_data[4])  # Set initial value from database
+                    self.instructor_type_var = tk.StringVar(value=instructor_data["instructor_type"])  # Set initial value from database
                     instructor_type_combobox = ttk.Combobox(self.update_instructor_frame, textvariable=self.instructor_type_var)
                     instructor_type_combobox['values'] = ("Full-time", "Part-time")
                     instructor_type_combobox.grid(row=4, column=1, padx=5, pady=5)
@@ -793,75 +835,61 @@ class InstructorManagement:
                                             command=lambda: self.update_instructor(instructor_id))
                     update_button.grid(row=5, column=0, columnspan=2, pady=10, sticky="ew", padx=50)
 
-            except Exception as e:
-                messagebox.showerror("Error", f"Error fetching instructor data: {e}")
-            finally:
-                conn.close()
+            # Fetch instructor data
+            self.executor.submit(get_row, "instructors", instructor_id,
+                                 key="instructor-form", on_done=show_form,
+                                 on_error=lambda e: messagebox.showerror("Error", f"Error fetching instructor data: {e}"))
 
     def update_instructor(self, instructor_id):
         phone = self.phone_entry.get()
         email = self.email_entry.get()
         instructor_type = self.instructor_type_var.get()
 
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-        try:
-            c.execute("""UPDATE instructors SET phone=?, email=?,  instructor_type=? WHERE id=?""",
-                      (phone, email,  instructor_type, instructor_id))
-            conn.commit()
-            messagebox.showinfo("Success", "Instructor updated successfully!")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to update instructor: {e}")
-        finally:
-            conn.close()
+        self.executor.submit(update_instructors, [(instructor_id, {"phone": phone, "email": email,
+                                                                   "instructor_type": instructor_type})],
+                             on_done=lambda _: messagebox.showinfo("Success", "Instructor updated successfully!"),
+                             on_error=lambda e: messagebox.showerror("Error", f"Failed to update instructor: {e}"))
 
     def delete_instructor(self):
         self.hide_all_forms()
         self.delete_instructor_frame.grid()
+        clear_form(self.delete_instructor_frame)
 
         # --- Search Functionality ---
         tk.Label(self.delete_instructor_frame, text="Search by Name:").grid(row=0, column=0, padx=5, pady=5)
-        self.search_entry = tk.Entry(self.delete_instructor_frame)
-        self.search_entry.grid(row=0, column=1, padx=5, pady=5)
+        self.delete_instructors_search = tk.Entry(self.delete_instructor_frame)
+        self.delete_instructors_search.grid(row=0, column=1, padx=5, pady=5)
 
         search_button = tk.Button(self.delete_instructor_frame, text="Search",
                                   command=self.search_instructor_for_deletion)
         search_button.grid(row=0, column=2, padx=5, pady=5)
 
         # Listbox to display search results
-        self.search_results = tk.Listbox(self.delete_instructor_frame)
-        self.search_results.grid(row=1, column=0, columnspan=3, padx=5, pady=5, sticky="ew")
-        self.search_results.bind("<<ListboxSelect>>", self.show_delete_confirmation)
+        self.delete_instructors_results = PagedListbox(self.delete_instructor_frame, executor=self.executor)
+        self.delete_instructors_results.grid(row=1, column=0, columnspan=3, padx=5, pady=5, sticky="ew")
+        self.delete_instructors_results.bind("<<ListboxSelect>>", self.show_delete_confirmation)
         # --- End of Search Functionality ---
 
     def search_instructor_for_deletion(self):
-        search_term = self.search_entry.get()
+        search_term = self.delete_instructors_search.get()
         if not search_term:
             messagebox.showwarning("Warning", "Please enter a search term.")
             return
 
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-        try:
-            c.execute("SELECT id, name FROM instructors WHERE name LIKE ?", ('%' + search_term + '%',))
-            instructor_data = c.fetchall()
-            self.search_results.delete(0, tk.END)  # Clear previous results
-            if instructor_data:
-                for instructor in instructor_data:
-                    self.search_results.insert(tk.END,
-                                              f"{instructor[0]} - {instructor[1]}")  # Display ID and name
-            else:
+        def loaded(count):
+            if not count:
                 messagebox.showinfo("Info", "No instructor found with that name.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error searching instructor: {e}")
-        finally:
-            conn.close()
+
+        # First page of matches; more are fetched as the list is scrolled
+        self.delete_instructors_results.show(
+            *name_search_sql("instructors", search_term), on_loaded=loaded,
+            on_error=lambda e: messagebox.showerror("Error", f"Error searching instructor: {e}"))
 
     def show_delete_confirmation(self, event):
-        selection = self.search_results.curselection()
+        selection = self.delete_instructors_results.curselection()
         if selection:
             selected_index = selection[0]
-            selected_instructor = self.search_results.get(selected_index)
+            selected_instructor = self.delete_instructors_results.get(selected_index)
             instructor_id = selected_instructor.split(" - ")[0]  # Extract instructor ID
 
             # Show confirmation dialog
@@ -871,17 +899,13 @@ class InstructorManagement:
                 self.delete_instructor_from_db(instructor_id)
 
     def delete_instructor_from_db(self, instructor_id):
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-        try:
-            c.execute("DELETE FROM instructors WHERE id=?", (instructor_id,))
-            conn.commit()
+        def deleted(_):
             messagebox.showinfo("Success", "Instructor deleted successfully!")
             self.search_instructor_for_deletion()  # Refresh the search results
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to delete instructor: {e}")
-        finally:
-            conn.close()
+
+        self.executor.submit(delete_rows, "instructors", [instructor_id],
+                             on_done=deleted,
+                             on_error=lambda e: messagebox.showerror("Error", f"Failed to delete instructor: {e}"))
 
     def hide_all_forms(self):
         self.add_instructor_frame.grid_remove()
@@ -889,10 +913,32 @@ class InstructorManagement:
         self.update_instructor_frame.grid_remove()
         self.delete_instructor_frame.grid_remove()
 
+    # Reload the lists shown, after the instructors changed
+    def refresh(self):
+        for view in (self.instructors_table, self.update_instructors_results, self.delete_instructors_results):
+            if view is not None:
+                view.refresh()
+
 # Lesson Management Window
 class LessonManagement:
-    def __init__(self, parent_frame):
+    # Tables whose changes make the panel's lists stale (see Application);
+    # lessons show the student's and instructor's names
+    TABLES = ("lessons", "students", "instructors")
+
+    # Columns of the View Lessons table: (column, heading, width)
+    LIST_COLUMNS = [("id", "ID", 50), ("student_id", "Student ID", 80), ("student_name", "Student Name", 130),
+                    ("instructor_id", "Instructor ID", 90), ("instructor_name", "Instructor Name", 130),
+                    ("lesson_type", "Lesson Type", 100), ("date", "Date", 90), ("start_time", "Time", 60),
+                    ("duration", "Minutes", 60), ("status", "Status", 70), ("payment", "Payment", 70)]
+
+    def __init__(self, parent_frame, executor):
         self.window = parent_frame
+        self.executor = executor
+        self.lessons_table = None
+        self.lesson_catalog = {}  # lesson type name -> LessonType, read when the booking form opens
+        self.view_lessons_search = None
+        self.update_lessons_search = None
+        self.update_lessons_results = None
         self.student_id_entry = None 
         
 
@@ -955,42 +1001,34 @@ class LessonManagement:
     def show_book_lesson_form(self):
         self.hide_all_forms()
         self.book_lesson_frame.grid()
+        clear_form(self.book_lesson_frame)
 
-        # --- Student ID Dropdown ---
-        tk.Label(self.book_lesson_frame, text="Student:").grid(row=0, column=0, padx=5, pady=5)
-        self.student_id_var = tk.StringVar()
-        student_id_combobox = ttk.Combobox(self.book_lesson_frame, textvariable=self.student_id_var)
-
-        # Fetch student IDs and names from the database
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-        c.execute("SELECT id, name FROM students")
-        student_data = c.fetchall()
-        conn.close()
+        # --- Student and Instructor Type-ahead Pickers ---
+        # Type part of a name (or an ID) and pick from the top matches
+        def picker_failed(e):
+            messagebox.showerror("Error", f"Error fetching students and instructors: {e}")
 
-        student_id_combobox['values'] = [f"{id} - {name}" for id, name in student_data]
-        student_id_combobox.grid(row=0, column=1, padx=5, pady=5)
+        tk.Label(self.book_lesson_frame, text="Student:").grid(row=0, column=0, padx=5, pady=5, sticky="n")
+        self.student_picker = TypeAheadPicker(self.book_lesson_frame, "students", executor=self.executor,
+                                              on_error=picker_failed)
+        self.student_picker.grid(row=0, column=1, padx=5, pady=5)
 
-        # --- Instructor ID Dropdown ---
-        tk.Label(self.book_lesson_frame, text="Instructor:").grid(row=1, column=0, padx=5, pady=5)
-        self.instructor_id_var = tk.StringVar()
-        instructor_id_combobox = ttk.Combobox(self.book_lesson_frame, textvariable=self.instructor_id_var)
+        tk.Label(self.book_lesson_frame, text="Instructor:").grid(row=1, column=0, padx=5, pady=5, sticky="n")
+        self.instructor_picker = TypeAheadPicker(self.book_lesson_frame, "instructors", executor=self.executor,
+                                                 on_error=picker_failed)
+        self.instructor_picker.grid(row=1, column=1, padx=5, pady=5)
 
-        # Fetch instructor IDs and names from the database
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-        c.execute("SELECT id, name FROM instructors")
-        instructor_data = c.fetchall()
-        conn.close()
+        def fill_lesson_types(catalog):
+            self.lesson_catalog = catalog
+            lesson_type_combobox['values'] = list(catalog)
 
-        instructor_id_combobox['values'] = [f"{id} - {name}" for id, name in instructor_data]
-        instructor_id_combobox.grid(row=1, column=1, padx=5, pady=5)
+        self.executor.submit(lesson_types, key="booking-lesson-types", on_done=fill_lesson_types,
+                             on_error=lambda e: messagebox.showerror("Error", f"Error fetching lesson types: {e}"))
 
         # --- Lesson Type Combobox ---
         tk.Label(self.book_lesson_frame, text="Lesson Type:").grid(row=2, column=0, padx=5, pady=5)
         self.lesson_type_var = tk.StringVar()
         lesson_type_combobox = ttk.Combobox(self.book_lesson_frame, textvariable=self.lesson_type_var)
-        lesson_type_combobox['values'] = ('Introductory', 'Standard', 'Pass Plus', 'Driving Test')
         lesson_type_combobox.grid(row=2, column=1, padx=5, pady=5)
 
         # --- Date Entry ---
@@ -998,346 +1036,323 @@ class LessonManagement:
         self.date_entry = tk.Entry(self.book_lesson_frame)
         self.date_entry.grid(row=3, column=1, padx=5, pady=5)
 
+        # --- Start Time and Duration Entries ---
+        tk.Label(self.book_lesson_frame, text="Start Time (HH:MM):").grid(row=4, column=0, padx=5, pady=5)
+        self.start_time_entry = tk.Entry(self.book_lesson_frame)
+        self.start_time_entry.grid(row=4, column=1, padx=5, pady=5)
+
+        tk.Label(self.book_lesson_frame, text="Duration (minutes):").grid(row=5, column=0, padx=5, pady=5)
+        self.duration_entry = tk.Entry(self.book_lesson_frame)
+        self.duration_entry.grid(row=5, column=1, padx=5, pady=5)
+        self.duration_entry.insert(0, str(DEFAULT_DURATION))
+
         # --- Payment Entry (disabled) ---
-        tk.Label(self.book_lesson_frame, text="Payment:").grid(row=4, column=0, padx=5, pady=5)
+        tk.Label(self.book_lesson_frame, text="Payment:").grid(row=6, column=0, padx=5, pady=5)
         self.payment_entry = tk.Entry(self.book_lesson_frame, state="disabled")
-        self.payment_entry.grid(row=4, column=1, padx=5, pady=5)
+        self.payment_entry.grid(row=6, column=1, padx=5, pady=5)
 
         # --- Status Dropdown ---
-        tk.Label(self.book_lesson_frame, text="Status:").grid(row=5, column=0, padx=5, pady=5)
+        tk.Label(self.book_lesson_frame, text="Status:").grid(row=7, column=0, padx=5, pady=5)
         self.status_var = tk.StringVar(value="Unpaid")
         status_combobox = ttk.Combobox(self.book_lesson_frame, textvariable=self.status_var)
         status_combobox['values'] = ("Paid", "Unpaid")
-        status_combobox.grid(row=5, column=1, padx=5, pady=5)
+        status_combobox.grid(row=7, column=1, padx=5, pady=5)
+
+        # --- Repeat Dropdown and Number of Lessons (series booking) ---
+        tk.Label(self.book_lesson_frame, text="Repeat:").grid(row=8, column=0, padx=5, pady=5)
+        self.repeat_var = tk.StringVar(value="Once")
+        repeat_combobox = ttk.Combobox(self.book_lesson_frame, textvariable=self.repeat_var, state="readonly")
+        repeat_combobox['values'] = ["Once"] + list(RECURRENCES)
+        repeat_combobox.grid(row=8, column=1, padx=5, pady=5)
+
+        tk.Label(self.book_lesson_frame, text="Number of Lessons:").grid(row=9, column=0, padx=5, pady=5)
+        self.series_count_entry = tk.Entry(self.book_lesson_frame)
+        self.series_count_entry.grid(row=9, column=1, padx=5, pady=5)
+        self.series_count_entry.insert(0, "10")
 
         # --- Function to handle lesson type selection and update payment ---
         def on_lesson_type_select(event=None):
-            lesson_type = self.lesson_type_var.get()
-            payment = 0
-            if lesson_type == "Introductory":
-                payment = 100
-            elif lesson_type == "Standard":
-                payment = 200
-            elif lesson_type == "Pass Plus":
-                payment = 300
-            elif lesson_type == "Driving Test":
-                payment = 350
+            # Prices and lengths come from the catalog loaded with the form,
+            # so choosing a type does not wait on the database
+            lesson_type = self.lesson_catalog.get(self.lesson_type_var.get())
+            payment = lesson_type.price if lesson_type else 0
 
             self.payment_entry.config(state="normal")
             self.payment_entry.delete(0, tk.END)
             self.payment_entry.insert(0, str(payment))
             self.payment_entry.config(state="disabled")
 
+            self.duration_entry.delete(0, tk.END)
+            self.duration_entry.insert(0, str(lesson_type.duration if lesson_type else DEFAULT_DURATION))
+
         # --- Bind the function to the Combobox ---
         lesson_type_combobox.bind("<<ComboboxSelected>>", on_lesson_type_select)
         
 
         def submit_data():
             # Get the selected student and instructor IDs
-            selected_student = self.student_id_var.get()
-            selected_instructor = self.instructor_id_var.get()
+            student_id = self.student_picker.selected_id()
+            instructor_id = self.instructor_picker.selected_id()
 
-            if selected_student and selected_instructor:
-                student_id = selected_student.split(" - ")[0]
-                instructor_id = selected_instructor.split(" - ")[0]
-                student_name = selected_student.split(" - ")[1]  # Extract student name
-                instructor_name = selected_instructor.split(" - ")[1]  # Extract instructor name
+            if student_id is not None and instructor_id is not None:
 
                 lesson_type = self.lesson_type_var.get()
                 date = self.date_entry.get()
+                start_time = self.start_time_entry.get()
+                duration = self.duration_entry.get()
                 status = self.status_var.get()
 
                 # Input Validation
-                if not all([student_id, instructor_id, lesson_type, date, status]):
+                if not all([student_id, instructor_id, lesson_type, date, start_time, duration, status]):
                     messagebox.showwarning("Warning", "All fields are required.")
                     return
-
-                if lesson_type == "Pass Plus":
-                    # Ask for confirmation
-                    confirm = messagebox.askyesno("Confirm Booking", "Have you completed Introductory and Standard lessons?")
-                    if confirm:
-                        # Proceed with booking (no database check)
-                        conn = sqlite3.connect("driving_school.db")
-                        c = conn.cursor()
-                        try:
-                            # Include student_name and instructor_name in the INSERT statement
-                            c.execute(
-                                "INSERT INTO lessons (student_id, student_name, instructor_id, instructor_name, lesson_type, date, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                                (student_id, student_name, instructor_id, instructor_name, lesson_type, date, status),
-                            )
-                            conn.commit()
-                            messagebox.showinfo("Success", "Lesson booked successfully!")
-                        except Exception as e:
-                            messagebox.showerror("Error", f"Failed to book lesson: {e}")
-                        finally:
-                            conn.close()
-                            self.clear_book_lesson_form()
-                    else:
-                        # User clicked "No" in the confirmation dialog, so do not proceed
+                repeat = self.repeat_var.get()
+                series_count = self.series_count_entry.get()
+                if repeat in RECURRENCES:
+                    if not series_count.isdigit():
+                        messagebox.showwarning("Warning", "Number of lessons must be a whole number.")
+                        return
+                    series_count = int(series_count)
+
+                def booked(_):
+                    messagebox.showinfo("Success", "Lesson booked successfully!")
+                    self.clear_book_lesson_form()
+
+                def failed(e, booking):
+                    if isinstance(e, PrerequisiteMissing):
+                        # They may have taken them with another school: the clerk decides
+                        if messagebox.askyesno("Confirm Booking", f"{e}.\n\nHas the student completed "
+                                                                  f"{' and '.join(e.missing)} lessons elsewhere?"):
+                            save_lesson(booking._replace(confirmed=True))
                         return
-                else:
-                    # For other lesson types, proceed with booking directly
-                    conn = sqlite3.connect("driving_school.db")
-                    c = conn.cursor()
-                    try:
-                        # Include student_name and instructor_name in the INSERT statement
-                        c.execute(
-                            "INSERT INTO lessons (student_id, student_name, instructor_id, instructor_name, lesson_type, date, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                            (student_id, student_name, instructor_id, instructor_name, lesson_type, date, status),
-                        )
-                        conn.commit()
-                        messagebox.showinfo("Success", "Lesson booked successfully!")
-                    except Exception as e:
-                        messagebox.showerror("Error", f"Failed to book lesson: {e}")
-                    finally:
-                        conn.close()
+                    # Keep what was entered so the clerk can pick another time
+                    messagebox.showerror("Error", f"Failed to book lesson: {e}")
+
+                def series_booked(occurrences, booking):
+                    booked_count = sum(occurrence.lesson_id is not None for occurrence in occurrences)
+                    if booked_count:
+                        messagebox.showinfo("Success", f"Booked {booked_count} of {len(occurrences)} lessons:\n\n"
+                                                       f"{describe_occurrences(occurrences)}")
                         self.clear_book_lesson_form()
+                        return
+                    # Nothing was booked because some of the dates clash
+                    free = sum(not occurrence.clashes for occurrence in occurrences)
+                    question = f"{describe_occurrences(occurrences)}\n\n"
+                    if free and messagebox.askyesno("Series Clashes", question + f"Book the {free} free dates "
+                                                                               "and skip the others?"):
+                        save_series(booking, skip_clashes=True)
+                    elif not free:
+                        messagebox.showerror("Error", question + "None of the dates are free.")
+
+                def save_series(booking, skip_clashes=False):
+                    # Every lesson is checked and inserted in one transaction
+                    self.executor.submit(book_recurring, booking, series_count, RECURRENCES[repeat], skip_clashes,
+                                         on_done=lambda occurrences: series_booked(occurrences, booking),
+                                         on_error=lambda e: failed(e, booking))
+
+                def save_lesson(booking):
+                    if repeat in RECURRENCES:
+                        save_series(booking)
+                        return
+                    # Checked against the instructor's and student's other
+                    # lessons in the same transaction as the insert; lesson
+                    # types with prerequisites (Pass Plus) are checked
+                    # against the student's lessons
+                    self.executor.submit(book, booking, on_done=booked, on_error=lambda e: failed(e, booking))
+
+                save_lesson(Booking(student_id, instructor_id, lesson_type, date, start_time, duration, status))
             else:
-                messagebox.showwarning("Warning", "Please select both student and instructor.")
+                messagebox.showwarning("Warning", "Please pick both student and instructor from the list.")
 
         # --- Create a submit button ---
         submit_button = tk.Button(self.book_lesson_frame, text="Submit", command=submit_data)
-        submit_button.grid(row=6, column=0,columnspan=2, pady=10, sticky="ew", padx=50)
+        submit_button.grid(row=10, column=0,columnspan=2, pady=10, sticky="ew", padx=50)
+
+        # --- Free Slot Finder ---
+        # Earliest free slots for the lesson type from the date entered (or
+        # today), with the chosen instructor if there is one; picking a slot
+        # fills in the instructor, date and start time
+        find_button = tk.Button(self.book_lesson_frame, text="Find Free Slots", command=self.find_free_slots)
+        find_button.grid(row=3, column=2, padx=5, pady=5)
+        self.slot_results = tk.Listbox(self.book_lesson_frame, width=60, height=8)
+        self.slot_results.grid(row=11, column=0, columnspan=3, padx=5, pady=5, sticky="ew")
+        self.slot_results.bind("<<ListboxSelect>>", self.use_free_slot)
+        self.free_slots = []
+
+    def find_free_slots(self):
+        lesson_type = self.lesson_type_var.get()
+        if not lesson_type:
+            messagebox.showwarning("Warning", "Please select a lesson type first.")
+            return
+        date_from = self.date_entry.get().strip() or None
+        instructor_id = self.instructor_picker.selected_id()
+        instructor_ids = [instructor_id] if instructor_id is not None else None
+        student_id = self.student_picker.selected_id()
+
+        def show_slots(slots):
+            self.free_slots = slots
+            self.slot_results.delete(0, tk.END)
+            for slot in slots:
+                self.slot_results.insert(tk.END, f"{slot.date} {slot.start_time} - {slot.instructor_name}")
+            if not slots:
+                messagebox.showinfo("Info", f"No free slots in the {WINDOW_DAYS} days searched.")
+
+        self.executor.submit(find_slots, lesson_type, date_from, instructor_ids=instructor_ids,
+                             student_id=student_id, key="free-slots", on_done=show_slots,
+                             on_error=lambda e: messagebox.showerror("Error", f"Error finding free slots: {e}"))
+
+    def use_free_slot(self, event):
+        selection = self.slot_results.curselection()
+        if selection:
+            slot = self.free_slots[selection[0]]
+            self.instructor_picker.set(f"{slot.instructor_id} - {slot.instructor_name}")
+            self.date_entry.delete(0, tk.END)
+            self.date_entry.insert(0, slot.date)
+            self.start_time_entry.delete(0, tk.END)
+            self.start_time_entry.insert(0, slot.start_time)
 
     def clear_book_lesson_form(self):
-        self.student_id_entry.delete(0, tk.END)
-        self.instructor_id_entry.delete(0, tk.END)
+        self.student_picker.set("")
+        self.instructor_picker.set("")
         self.lesson_type_var.set("")
         self.date_entry.delete(0, tk.END)
+        self.start_time_entry.delete(0, tk.END)
+        self.slot_results.delete(0, tk.END)
+        self.repeat_var.set("Once")
 
 
     def view_lessons(self):
         self.hide_all_forms()
         self.view_lessons_frame.grid()
+        clear_form(self.view_lessons_frame)
 
         # --- Search Functionality ---
         tk.Label(self.view_lessons_frame, text="Search by Student ID:").grid(row=0, column=0, padx=5, pady=5)
-        self.search_entry = tk.Entry(self.view_lessons_frame)
-        self.search_entry.grid(row=0, column=1, padx=5, pady=5)
+        self.view_lessons_search = tk.Entry(self.view_lessons_frame)
+        self.view_lessons_search.grid(row=0, column=1, padx=5, pady=5)
 
         search_button = tk.Button(self.view_lessons_frame, text="Search", command=self.search_and_display_lessons)
         search_button.grid(row=0, column=2, padx=5, pady=5)
         # --- End of Search Functionality ---
 
-        # Frame to hold the canvas and scrollbar
-        self.canvas_frame = tk.Frame(self.view_lessons_frame)
-        self.canvas_frame.grid(row=1, column=0, columnspan=3, pady=10, sticky="nsew")
-
-        # Create a canvas and scrollbar inside the canvas_frame
-        self.canvas = tk.Canvas(self.canvas_frame)
-        scrollbar = ttk.Scrollbar(self.canvas_frame, orient="vertical", command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=scrollbar.set)
-
-        # Pack canvas and scrollbar
-        self.canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-        self.inner_frame = tk.Frame(self.canvas)
-        canvas_window = self.canvas.create_window((0, 0), window=self.inner_frame, anchor="nw")
+        # Table of lessons (rows are loaded as the user scrolls)
+        self.lessons_table = VirtualTable(
+            self.view_lessons_frame, self.LIST_COLUMNS, self.lessons_query, executor=self.executor,
+            on_error=lambda e: messagebox.showerror("Error", f"Error fetching lesson data: {e}"))
+        self.lessons_table.grid(row=1, column=0, columnspan=3, pady=10, sticky="nsew")
 
         # Initial display of all lessons
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-        try:
-            c.execute("SELECT * FROM lessons")  # Fetch all lessons
-            lessons = c.fetchall()
-
-            # Clear existing widgets in the inner frame
-            for widget in self.inner_frame.winfo_children():
-                widget.destroy()
-
-            # Create labels to display lesson details
-            for i, lesson in enumerate(lessons):
-                lesson_type = lesson[3]  # Get the lesson type from the tuple
-
-                # Calculate payment based on lesson type
-                payment = 0
-                if lesson_type == "Introductory":
-                    payment = 100
-                elif lesson_type == "Standard":
-                    payment = 200
-                elif lesson_type == "Pass Plus":
-                    payment = 300
-                elif lesson_type == "Driving Test":
-                    payment = 350
-
-                lesson_details = f"""
-                ID: {lesson[0]}
-                Instructor ID: {lesson[1]}
-                Student Name: {lesson[6] if len(lesson) > 2 else ""} 
-                Instructor ID: {lesson[2]}
-                Instructor Name: {lesson[7] if len(lesson) > 4 else ""} 
-                Lesson Type: {lesson[3]}
-                Date: {lesson[4]if len(lesson) > 1 else ""}
-                Status: {lesson[5]if len(lesson) > 5 else ""}      
-                Payment: {payment}
-                """
-                tk.Label(self.inner_frame, text=lesson_details, justify="left").grid(row=i, column=0, sticky="w")
-
-        except Exception as e:
-            messagebox.showerror("Error", f"Error fetching lesson data: {e}")
-        finally:
-            conn.close()
-
-        # Update canvas scroll region (bind to configure event)
-        def on_canvas_configure(event):
-            self.canvas.itemconfig(canvas_window, width=event.width)
-            self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-
-        self.canvas.bind("<Configure>", on_canvas_configure)  # No 'self' argument here
+        self.search_and_display_lessons()
 
     def search_and_display_lessons(self):
-        search_term = self.search_entry.get()
+        self.lessons_table.reload()
 
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-        try:
-            if search_term:
-                c.execute("SELECT * FROM lessons WHERE student_id LIKE ?", ('%' + search_term + '%',))
-            else:
-                c.execute("SELECT * FROM lessons")  # Fetch all if no search term
-
-            lessons = c.fetchall()
-
-            # Clear existing widgets in the inner frame
-            for widget in self.inner_frame.winfo_children():
-                widget.destroy()
-
-            # Create labels to display lesson details
-            for i, lesson in enumerate(lessons):
-                lesson_type = lesson[3]  # Get the lesson type from the tuple
-
-                # Calculate payment based on lesson type
-                payment = 0
-                if lesson_type == "Introductory":
-                    payment = 100
-                elif lesson_type == "Standard":
-                    payment = 200
-                elif lesson_type == "Pass Plus":
-                    payment = 300
-                elif lesson_type == "Driving Test":
-                    payment = 350
-
-                lesson_details = f"""
-                ID: {lesson[0]}
-                Instructor ID: {lesson[1]}
-                Student Name: {lesson[6] if len(lesson) > 2 else ""} 
-                Instructor ID: {lesson[2]}
-                Instructor Name: {lesson[7] if len(lesson) > 4 else ""} 
-                Lesson Type: {lesson[3]}
-                Date: {lesson[4]if len(lesson) > 1 else ""}
-                Status: {lesson[5]if len(lesson) > 5 else ""}      
-                Payment: {payment}
-                """
-                tk.Label(self.inner_frame, text=lesson_details, justify="left").grid(row=i, column=0, sticky="w")
+    def lessons_query(self):
+        columns = ", ".join(column for column, _, _ in self.LIST_COLUMNS)
+        search_term = self.view_lessons_search.get()
+        if search_term:
+            return f"SELECT {columns} FROM lessons WHERE student_id = ?", (search_term,)
+        return f"SELECT {columns} FROM lessons", ()  # All lessons if no search term
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Error fetching lesson data: {e}")
-        finally:
-            conn.close()
-            
-    
     def show_update_lesson_form(self):
         self.hide_all_forms()
         self.update_lesson_frame.grid()
+        clear_form(self.update_lesson_frame)
 
         # --- Search Functionality ---
         tk.Label(self.update_lesson_frame, text="Search by Lesson ID:").grid(row=0, column=0, padx=5, pady=5)
-        self.search_entry = tk.Entry(self.update_lesson_frame)
-        self.search_entry.grid(row=0, column=1, padx=5, pady=5)
+        self.update_lessons_search = tk.Entry(self.update_lesson_frame)
+        self.update_lessons_search.grid(row=0, column=1, padx=5, pady=5)
 
         search_button = tk.Button(self.update_lesson_frame, text="Search", command=self.search_lesson_by_lesson_id)
         search_button.grid(row=0, column=2, padx=5, pady=5)
 
         # Listbox to display search results
-        self.search_results = tk.Listbox(self.update_lesson_frame)
-        self.search_results.grid(row=1, column=0, columnspan=3, padx=5, pady=5, sticky="ew")
-        self.search_results.bind("<<ListboxSelect>>", self.show_lesson_update_form)
+        self.update_lessons_results = PagedListbox(self.update_lesson_frame, executor=self.executor)
+        self.update_lessons_results.grid(row=1, column=0, columnspan=3, padx=5, pady=5, sticky="ew")
+        self.update_lessons_results.bind("<<ListboxSelect>>", self.show_lesson_update_form)
         # --- End of Search Functionality ---
 
     def search_lesson_by_lesson_id(self):
-        search_term = self.search_entry.get()
+        search_term = self.update_lessons_search.get()
         if not search_term:
             messagebox.showwarning("Warning", "Please enter a search term.")
             return
 
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-        try:
-            # Fetch lesson ID and student name
-            c.execute("SELECT l.id, s.name FROM lessons l JOIN students s ON l.student_id = s.id WHERE l.id LIKE ?", ('%' + search_term + '%',))
-            lesson_data = c.fetchall()
-            self.search_results.delete(0, tk.END)
-            if lesson_data:
-                for lesson in lesson_data:
-                    self.search_results.insert(tk.END, f"{lesson[0]} - {lesson[1]}")  # Display lesson ID and student name
-            else:
+        def loaded(count):
+            if not count:
                 messagebox.showinfo("Info", "No lesson found with that ID.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error searching lesson: {e}")
-        finally:
-            conn.close()
+
+        # Fetch lesson ID and student name
+        lesson_query = "SELECT l.id, s.name FROM lessons l JOIN students s ON l.student_id = s.id WHERE l.id LIKE ?"
+        self.update_lessons_results.show(
+            lesson_query, ('%' + search_term + '%',), on_loaded=loaded,
+            on_error=lambda e: messagebox.showerror("Error", f"Error searching lesson: {e}"))
 
     def show_lesson_update_form(self, event):
-        selection = self.search_results.curselection()
+        selection = self.update_lessons_results.curselection()
         if selection:
             selected_index = selection[0]
-            selected_lesson = self.search_results.get(selected_index)
+            selected_lesson = self.update_lessons_results.get(selected_index)
             lesson_id = selected_lesson.split(" - ")[0]  # Extract lesson ID
 
-            # Fetch lesson data
-            conn = sqlite3.connect("driving_school.db")
-            c = conn.cursor()
-            try:
-                c.execute("SELECT * FROM lessons WHERE id=?", (lesson_id,))
-                lesson_data = c.fetchone()
-
+            def show_form(lesson_data):
                 if lesson_data:
+                    clear_form(self.update_lesson_frame, from_row=2)
                     # Display student name (non-editable)
                     tk.Label(self.update_lesson_frame, text="Student Name:").grid(row=2, column=0, padx=5, pady=5)
-                    student_name_label = tk.Label(self.update_lesson_frame, text=lesson_data[7])  # Assuming student_name is at index 7
+                    student_name_label = tk.Label(self.update_lesson_frame, text=lesson_data["student_name"])
                     student_name_label.grid(row=2, column=1, padx=5, pady=5)
 
                     # --- Date Entry ---
                     tk.Label(self.update_lesson_frame, text="Date (YYYY-MM-DD):").grid(row=3, column=0, padx=5, pady=5)
                     self.date_entry = tk.Entry(self.update_lesson_frame)
                     self.date_entry.grid(row=3, column=1, padx=5, pady=5)
-                    self.date_entry.insert(0, lesson_data[4])
+                    self.date_entry.insert(0, lesson_data["date"])
+
+                    # --- Start Time and Duration Entries ---
+                    tk.Label(self.update_lesson_frame, text="Start Time (HH:MM):").grid(row=4, column=0, padx=5, pady=5)
+                    self.start_time_entry = tk.Entry(self.update_lesson_frame)
+                    self.start_time_entry.grid(row=4, column=1, padx=5, pady=5)
+                    self.start_time_entry.insert(0, lesson_data["start_time"] or "")
+
+                    tk.Label(self.update_lesson_frame, text="Duration (minutes):").grid(row=5, column=0, padx=5, pady=5)
+                    self.duration_entry = tk.Entry(self.update_lesson_frame)
+                    self.duration_entry.grid(row=5, column=1, padx=5, pady=5)
+                    self.duration_entry.insert(0, str(lesson_data["duration"] or DEFAULT_DURATION))
 
                     # --- Status Dropdown ---
-                    tk.Label(self.update_lesson_frame, text="Status:").grid(row=4, column=0, padx=5, pady=5)
-                    self.status_var = tk.StringVar(value=lesson_data[6])
+                    tk.Label(self.update_lesson_frame, text="Status:").grid(row=6, column=0, padx=5, pady=5)
+                    self.status_var = tk.StringVar(value=lesson_data["status"])
                     status_combobox = ttk.Combobox(self.update_lesson_frame, textvariable=self.status_var)
                     status_combobox['values'] = ("Paid", "Unpaid")
-                    status_combobox.grid(row=4, column=1, padx=5, pady=5)
+                    status_combobox.grid(row=6, column=1, padx=5, pady=5)
 
                     # Create an update button
                     update_button = tk.Button(self.update_lesson_frame, text="Update",
                                               command=lambda: self.update_lesson(lesson_id))
-                    update_button.grid(row=5, column=0, columnspan=2, pady=10, sticky="ew", padx=50)
+                    update_button.grid(row=7, column=0, columnspan=2, pady=10, sticky="ew", padx=50)
+
+            # Fetch lesson data
+            self.executor.submit(get_row, "lessons", lesson_id,
+                                 key="lesson-form", on_done=show_form,
+                                 on_error=lambda e: messagebox.showerror("Error", f"Error fetching lesson data: {e}"))
 
-            except Exception as e:
-                messagebox.showerror("Error", f"Error fetching lesson data: {e}")
-            finally:
-                conn.close()
-                
     def update_lesson(self, lesson_id):
         date = self.date_entry.get()
+        start_time = self.start_time_entry.get()
+        duration = self.duration_entry.get()
         status = self.status_var.get()
 
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-        try:
-            c.execute("""UPDATE lessons SET date=?, status=? WHERE id=?""", (date, status, lesson_id))
-            conn.commit()
-            messagebox.showinfo("Success", "Lesson updated successfully!")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to update lesson: {e}")
-        finally:
-            conn.close()
+        # Same clash check as booking, leaving out the lesson itself
+        self.executor.submit(reschedule_lesson, lesson_id, date, start_time, duration, status,
+                             on_done=lambda _: messagebox.showinfo("Success", "Lesson updated successfully!"),
+                             on_error=lambda e: messagebox.showerror("Error", f"Failed to update lesson: {e}"))
 
     def delete_lesson(self):
         self.hide_all_forms()
         self.delete_lesson_frame.grid()
+        clear_form(self.delete_lesson_frame)
 
         # Create input field for lesson ID
         tk.Label(self.delete_lesson_frame, text="Enter Lesson ID to delete:").grid(row=0, column=0, padx=5, pady=5)
@@ -1353,28 +1368,39 @@ class LessonManagement:
         if lesson_id:
             confirm = messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete lesson with ID {lesson_id}?")
             if confirm:
-                conn = sqlite3.connect("driving_school.db")
-                c = conn.cursor()
-                try:
-                    c.execute("DELETE FROM lessons WHERE id=?", (lesson_id,))
-                    conn.commit()
+                def deleted(_):
                     messagebox.showinfo("Success", "Lesson deleted successfully!")
-                except Exception as e:
+                    self.lesson_id_entry.delete(0, tk.END)
+
+                def failed(e):
                     messagebox.showerror("Error", f"Failed to delete lesson: {e}")
-                finally:
-                    conn.close()
                     self.lesson_id_entry.delete(0, tk.END)
 
+                self.executor.submit(delete_rows, "lessons", [lesson_id], on_done=deleted, on_error=failed)
+
     def hide_all_forms(self):
         self.book_lesson_frame.grid_remove()
         self.view_lessons_frame.grid_remove()
         self.delete_lesson_frame.grid_remove()
         self.update_lesson_frame.grid_remove()
 
+    # Reload the lists shown, after lessons, students or instructors changed
+    def refresh(self):
+        for view in (self.lessons_table, self.update_lessons_results):
+            if view is not None:
+                view.refresh()
+
 # Reporting Window
 class Reporting:
-    def __init__(self, parent_frame):
+    # Tables whose changes make the dashboard and lists stale (see Application)
+    TABLES = ("students", "instructors", "lessons", "payments")
+
+    def __init__(self, parent_frame, executor):
         self.window = parent_frame
+        self.executor = executor
+        self.report_label = None
+        self.progress_search = None
+        self.progress_results = None
         self.report_frame = tk.Frame(self.window)
         # Create button style
         button_style = ttk.Style()
@@ -1399,20 +1425,29 @@ class Reporting:
                                                 command=self.show_student_progress_form)
         self.student_progress_button.grid(row=0, column=1, padx=10, pady=10, sticky="ew")
 
+        self.query_stats_button = ttk.Button(self.window, text="Query Statistics", style='Report.TButton',
+                                             command=self.show_query_stats)
+        self.query_stats_button.grid(row=0, column=2, padx=10, pady=10, sticky="ew")
+
         # Configure column weights
-        for i in range(2):
+        for i in range(3):
             self.window.columnconfigure(i, weight=1)
 
         # Frame for report (initially hidden)
         self.report_frame = tk.Frame(self.window)
-        self.report_frame.grid(row=1, column=0, columnspan=2, pady=10)
+        self.report_frame.grid(row=1, column=0, columnspan=3, pady=10)
         self.report_frame.grid_remove()
 
         # Frame for student progress (initially hidden)
         self.student_progress_frame = tk.Frame(self.window)
-        self.student_progress_frame.grid(row=1, column=0, columnspan=2, pady=10)
+        self.student_progress_frame.grid(row=1, column=0, columnspan=3, pady=10)
         self.student_progress_frame.grid_remove()
 
+        # Frame for query statistics (initially hidden)
+        self.query_stats_frame = tk.Frame(self.window)
+        self.query_stats_frame.grid(row=1, column=0, columnspan=3, pady=10, sticky="nsew")
+        self.query_stats_frame.grid_remove()
+
     def show_report(self):
         self.hide_all_forms()  # Hide other forms
         self.report_frame.grid()  # Show the report frame
@@ -1420,160 +1455,129 @@ class Reporting:
         # Clear existing widgets in the report frame
         for widget in self.report_frame.winfo_children():
             widget.destroy()
+        self.report_label = None
+
+        def show_counts(summary):
+
+            # Display the report in a label within the frame
+            self.report_label = tk.Label(self.report_frame, text=dashboard_text(summary), justify="left",
+                                         font=("Arial", 12, "bold"), padx=20, bg="white",  )
+            self.report_label.pack()
+
+            # Optional filters for the printed report and the lessons export
+            filters = tk.Frame(self.report_frame)
+            filters.pack(pady=(20, 0))
+            self.report_filters = {}
+            for position, (label, key) in enumerate([("Date from (YYYY-MM-DD):", "date_from"),
+                                                     ("Date to:", "date_to"),
+                                                     ("Branch:", "branch"),
+                                                     ("Instructor ID (export):", "instructor_id"),
+                                                     ("Records per volume (PDF):", "rows_per_volume")]):
+                row, column = divmod(position, 3)
+                tk.Label(filters, text=label).grid(row=row, column=column * 2, padx=5, pady=5, sticky="e")
+                entry = tk.Entry(filters, width=12)
+                entry.grid(row=row, column=column * 2 + 1, padx=5, pady=5)
+                self.report_filters[key] = entry
+
+            # Print Report button with styling
+            print_button = tk.Button(self.report_frame, text="Print Report", command=self.print_report,
+                font=("Arial", 12, "bold"),
+                bg="white", fg="#00A300",
+                padx=20, pady=10,
+                relief="raised", borderwidth=3,  # Increased borderwidth for roundness
+                highlightthickness=0,  # Remove default highlight border
+                highlightbackground="blue", highlightcolor="blue")  # Blue border color
+            print_button.pack(pady=(50, 10), padx=100)
+
+            tk.Button(self.report_frame, text="Export Lessons", command=self.export_lessons,
+                      font=("Arial", 12, "bold"), bg="white", fg="#00A300", padx=20, pady=10,
+                      relief="raised", borderwidth=3, highlightthickness=0).pack(pady=(0, 50), padx=100)
+
+        # Figures come from the trigger-maintained summary tables
+        self.executor.submit(dashboard_summary, key="report", on_done=show_counts,
+                             on_error=lambda e: messagebox.showerror("Error", f"Error generating report: {e}"))
+
+    def filter_values(self, *keys):
+        return {key: self.report_filters[key].get().strip() or None for key in keys}
 
-        # Generate the report content
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-        c.execute("SELECT COUNT(*) FROM lessons WHERE status = 'Paid' OR status = 'Unpaid'")
-        lessons_count = c.fetchone()[0]
-        c.execute("SELECT COUNT(*) FROM students")
-        students_count = c.fetchone()[0]
-        c.execute("SELECT COUNT(*) FROM instructors")
-        instructors_count = c.fetchone()[0]
-        conn.close()
-
-        report_text = f"""
-        Total lessons booked: {lessons_count}
-        Total students: {students_count}
-        Total instructors: {instructors_count}
-        """
-
-        # Display the report in a label within the frame
-        tk.Label(self.report_frame, text=report_text, justify="left", font=("Arial", 12, "bold"), padx=20, bg="white",  ).pack()
-
-        # Print Report button with styling
-        print_button = tk.Button(self.report_frame, text="Print Report", command=self.print_report,
-            font=("Arial", 12, "bold"),
-            bg="white", fg="#00A300",
-            padx=20, pady=10,
-            relief="raised", borderwidth=3,  # Increased borderwidth for roundness
-            highlightthickness=0,  # Remove default highlight border
-            highlightbackground="blue", highlightcolor="blue")  # Blue border color
-        print_button.pack(pady=50, padx=100)
-                
-   
-    # Generate the report content
     def print_report(self):
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-
-        # Fetch data for the report
-        c.execute("SELECT * FROM students")
-        students = c.fetchall()
-        c.execute("SELECT * FROM instructors")
-        instructors = c.fetchall()
-        c.execute("SELECT * FROM lessons")
-        lessons = c.fetchall()
-
-        conn.close()
-
-        # Create a PDF object
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-
-        # Add report title
-        pdf.cell(200, 10, txt="Driving School Report", ln=1, align="C")
-
-        # Add student data to the PDF
-        pdf.cell(200, 10, txt="Students", ln=1, align="L")
-        for student in students:
-            student_details = f"""
-            ID: {student[0]}
-            Name: {student[1]}
-            Address: {student[2]}
-            Phone: {student[3]}
-            Progress: {student[4]}
-            Payment Status: {student[5]}
-            """
-            pdf.multi_cell(0, 10, txt=student_details)
-
-        # Add instructor data to the PDF
-        pdf.cell(200, 10, txt="Instructors", ln=1, align="L")
-        for instructor in instructors:
-            instructor_details = f"""
-            ID: {instructor[0]}
-            Name: {instructor[1]}
-            Phone: {instructor[2]}
-            Email: {instructor[3]}
-            Instructor Type: {instructor[4]}
-            """
-            pdf.multi_cell(0, 10, txt=instructor_details)
-
-        # Add lesson data to the PDF
-        pdf.cell(200, 10, txt="Lessons", ln=1, align="L")
-        for lesson in lessons:
-            lesson_details = f"""
-            ID: {lesson[0]}
-            Instructor ID: {lesson[1]}
-            Student Name: {lesson[6] if len(lesson) > 2 else ""} 
-            Instructor ID: {lesson[2]}
-            Instructor Name: {lesson[7] if len(lesson) > 4 else ""} 
-            Lesson Type: {lesson[3]}
-            Date: {lesson[4]if len(lesson) > 1 else ""}
-            Status: {lesson[5]if len(lesson) > 5 else ""}      
-            """
-            pdf.multi_cell(0, 10, txt=lesson_details)
-
-        # Save the PDF
-        try:
-            pdf.output("driving_school_report.pdf")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate PDF: {e}")
-            return  # Stop further execution if PDF generation fails
+        options = self.filter_values("date_from", "date_to", "branch", "rows_per_volume")
+        if options["rows_per_volume"] is not None:
+            try:
+                options["rows_per_volume"] = int(options["rows_per_volume"])
+            except ValueError:
+                options["rows_per_volume"] = 0
+            if options["rows_per_volume"] <= 0:
+                messagebox.showerror("Error", "Records per volume must be a positive whole number.")
+                return
+
+        # Build the PDF volumes on a worker thread, then open them
+        self.executor.submit(write_report, REPORT_PATH, key="print-report", on_done=self.open_report_pdfs,
+                             on_error=lambda e: messagebox.showerror("Error", f"Failed to generate PDF: {e}"),
+                             **options)
 
+    def export_lessons(self):
+        options = self.filter_values("date_from", "date_to", "branch", "instructor_id")
+        if options["instructor_id"] is not None:
+            if not options["instructor_id"].isdigit():
+                messagebox.showerror("Error", "Instructor ID must be a number.")
+                return
+            options["instructor_id"] = int(options["instructor_id"])
+        ask_export_path(self.executor, "lessons", **options)
+
+    def open_report_pdfs(self, paths):
+        if len(paths) > 1:
+            messagebox.showinfo("Report", f"Report written in {len(paths)} volumes:\n" + "\n".join(paths))
+        self.open_report_pdf(paths[0])
+
+    def open_report_pdf(self, path):
         # Open the generated PDF file
         try:
-            webbrowser.open_new(r'driving_school_report.pdf')
+            import webbrowser
+
+            webbrowser.open_new(path)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open PDF file: {e}")
-        
 
     def show_student_progress_form(self):
         self.hide_all_forms()
         self.student_progress_frame.grid()
+        clear_form(self.student_progress_frame)
 
         # --- Search Functionality ---
         tk.Label(self.student_progress_frame, text="Search by Student Name:").grid(row=0, column=0, padx=5, pady=5)
-        self.search_entry = tk.Entry(self.student_progress_frame)
-        self.search_entry.grid(row=0, column=1, padx=5, pady=5)
+        self.progress_search = tk.Entry(self.student_progress_frame)
+        self.progress_search.grid(row=0, column=1, padx=5, pady=5)
 
         search_button = tk.Button(self.student_progress_frame, text="Search", command=self.search_student_for_progress)
         search_button.grid(row=0, column=2, padx=5, pady=5)
 
         # Listbox to display search results
-        self.search_results = tk.Listbox(self.student_progress_frame)
-        self.search_results.grid(row=1, column=0, columnspan=3, padx=5, pady=5, sticky="ew")
-        self.search_results.bind("<<ListboxSelect>>", self.calculate_progress_for_selected_student)
+        self.progress_results = PagedListbox(self.student_progress_frame, executor=self.executor)
+        self.progress_results.grid(row=1, column=0, columnspan=3, padx=5, pady=5, sticky="ew")
+        self.progress_results.bind("<<ListboxSelect>>", self.calculate_progress_for_selected_student)
         # --- End of Search Functionality ---
 
     def search_student_for_progress(self):
-        search_term = self.search_entry.get()
+        search_term = self.progress_search.get()
         if not search_term:
             messagebox.showwarning("Warning", "Please enter a search term.")
             return
 
-        conn = sqlite3.connect("driving_school.db")
-        c = conn.cursor()
-        try:
-            c.execute("SELECT id, name FROM students WHERE name LIKE ?", ('%' + search_term + '%',))
-            student_data = c.fetchall()
-            self.search_results.delete(0, tk.END)
-            if student_data:
-                for student in student_data:
-                    self.search_results.insert(tk.END, f"{student[0]} - {student[1]}")
-            else:
+        def loaded(count):
+            if not count:
                 messagebox.showinfo("Info", "No student found with that name.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error searching student: {e}")
-        finally:
-            conn.close()
+
+        # First page of matches; more are fetched as the list is scrolled
+        self.progress_results.show(
+            *name_search_sql("students", search_term), on_loaded=loaded,
+            on_error=lambda e: messagebox.showerror("Error", f"Error searching student: {e}"))
 
     def calculate_progress_for_selected_student(self, event):
-        selection = self.search_results.curselection()
+        selection = self.progress_results.curselection()
         if selection:
             selected_index = selection[0]
-            selected_student = self.search_results.get(selected_index)
+            selected_student = self.progress_results.get(selected_index)
             student_id = selected_student.split(" - ")[0]  # Extract student ID
 
             # Now you have the student_id, you can use your existing calculate_progress logic
@@ -1582,39 +1586,96 @@ class Reporting:
 
     def calculate_progress(self, student_id):  # Modified to accept student_id
         if student_id:
-            conn = sqlite3.connect("driving_school.db")
-            c = conn.cursor()
-            try:
-                c.execute("SELECT lesson_type FROM lessons WHERE student_id=?", (student_id,))
-                lessons = c.fetchall()
-
-                total_progress = 0
-                for lesson in lessons:
-                    lesson_type = lesson[0]  # Get the lesson type string
-
-                    # Calculate progress based on lesson type
-                    if lesson_type == "Introductory":
-                        total_progress = 20  # Example progress for Introductory
-                    elif lesson_type == "Standard":
-                        total_progress = 60  # Example progress for Standard
-                    elif lesson_type == "Pass Plus":
-                        total_progress = 95  # Example progress for Pass Plus
-                    elif lesson_type == "Driving Test":
-                        total_progress = 100
-                    # Add more elif blocks for other lesson types if needed
-
-                # Display the progress
+            def show_progress(progress):
+                total_progress = progress.get(int(student_id), 0)
+                # Display the progress, in place of the last student's
+                clear_form(self.student_progress_frame, from_row=2)
                 result_label = tk.Label(self.student_progress_frame, text=f"Student ID: {student_id}\nProgress: {total_progress}%", justify="left")
                 result_label.grid(row=2, column=0, columnspan=2, pady=5)
 
-            except Exception as e:
-                messagebox.showerror("Error", f"Error calculating progress: {e}")
-            finally:
-                conn.close()
+            # Kept up to date by triggers on lessons (see progress.py)
+            self.executor.submit(lesson_progress, [int(student_id)], key="progress", on_done=show_progress,
+                                 on_error=lambda e: messagebox.showerror("Error", f"Error calculating progress: {e}"))
+
+    def show_query_stats(self):
+        self.hide_all_forms()
+        self.query_stats_frame.grid()
+        for widget in self.query_stats_frame.winfo_children():
+            widget.destroy()
+
+        if not profiler.enabled():
+            tk.Label(self.query_stats_frame, justify="left", font=("Arial", 12),
+                     text=f"Query statistics are off.\n\nTo collect them, set {profiler.ENV_VAR} to the slow-query "
+                          f"threshold in ms\n(e.g. {profiler.ENV_VAR}={profiler.SLOW_QUERY_MS}) and restart "
+                          f"the application.").pack(padx=20, pady=20)
+            return
+
+        stats = cache_stats()
+        tk.Label(self.query_stats_frame, font=("Arial", 10),
+                 text=f"Statements slower than {profiler.slow_query_ms():g} ms are logged with their query plan. "
+                      f"Read cache: {stats.hits} hits, {stats.misses} misses, {stats.entries} entries."
+                 ).grid(row=0, column=0, columnspan=3, padx=5, pady=5, sticky="w")
+
+        # Statement shapes, slowest in total first
+        columns = ("calls", "rows", "total_ms", "mean_ms", "p50_ms", "p95_ms", "max_ms")
+        statements = ttk.Treeview(self.query_stats_frame, columns=columns, height=12)
+        statements.heading("#0", text="Statement")
+        statements.column("#0", width=420)
+        for column in columns:
+            statements.heading(column, text=column.replace("_ms", " ms").capitalize())
+            statements.column(column, width=70, anchor="e")
+        for shape in profiler.statement_stats():
+            statements.insert("", "end", text=shape.shape,
+                              values=(shape.calls, shape.rows, *(f"{value:.2f}" for value in shape[3:8])))
+        statements.grid(row=1, column=0, columnspan=3, padx=5, pady=5, sticky="nsew")
+
+        # Slow-query log with plans; full scans are flagged
+        tk.Label(self.query_stats_frame, text="Slow queries (newest first):").grid(row=2, column=0, padx=5,
+                                                                                  sticky="w")
+        slow_log = tk.Text(self.query_stats_frame, height=10, width=110, wrap="none")
+        for query in profiler.slow_queries():
+            flag = f"  FULL SCAN of {', '.join(query.full_scans)}" if query.full_scans else ""
+            slow_log.insert("end", f"{query.time}  {query.ms:.1f} ms, {query.rows} rows{flag}\n  {query.sql.strip()}\n"
+                                   f"  params: {query.params}\n")
+            for line in query.plan or ["(no plan)"]:
+                slow_log.insert("end", f"    {line}\n")
+        slow_log.configure(state="disabled")
+        slow_log.grid(row=3, column=0, columnspan=3, padx=5, pady=5, sticky="nsew")
+
+        tk.Button(self.query_stats_frame, text="Refresh", command=self.show_query_stats).grid(row=4, column=0, pady=5)
+        tk.Button(self.query_stats_frame, text="Reset", command=self.reset_query_stats).grid(row=4, column=1, pady=5)
+        tk.Button(self.query_stats_frame, text="Save to File...", command=self.save_query_stats).grid(row=4, column=2,
+                                                                                                     pady=5)
+
+    def reset_query_stats(self):
+        profiler.reset()
+        self.show_query_stats()
+
+    def save_query_stats(self):
+        path = filedialog.asksaveasfilename(title="Save query statistics", initialfile="query-stats.json",
+                                            defaultextension=".json", filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            profiler.dump(path, cache=cache_stats()._asdict())
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save query statistics: {e}")
+            return
+        messagebox.showinfo("Query Statistics", f"Saved to {path}")
 
     def hide_all_forms(self):
         self.report_frame.grid_remove()
         self.student_progress_frame.grid_remove()
+        self.query_stats_frame.grid_remove()
+
+    # Read the dashboard figures and the student search again, after the data changed
+    def refresh(self):
+        if self.report_label is not None:
+            self.executor.submit(dashboard_summary, key="report",
+                                 on_done=lambda summary: self.report_label.config(text=dashboard_text(summary)),
+                                 on_error=lambda e: messagebox.showerror("Error", f"Error generating report: {e}"))
+        if self.progress_results is not None:
+            self.progress_results.refresh()
 
 
 # Main Program
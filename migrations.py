@@ -0,0 +1,501 @@
+import sqlite3
+
+from bookings import normalize_date
+from database import get_db
+from progress import recompute_progress, student_progress_sql, weight_sql
+
+# Versioned schema migrations. The version the database is at lives in
+# PRAGMA user_version; migrate() applies every newer step, each in its own
+# transaction together with the version bump.
+
+# Lessons table as the code expects it. The column order follows the table in
+# the shipped driving_school.db (SELECT * indexes depend on it), with payment
+# appended.
+LESSONS_COLUMNS = [
+    ("id", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    ("student_id", "INTEGER"),
+    ("instructor_id", "INTEGER"),
+    ("lesson_type", "TEXT"),
+    ("date", "TEXT"),
+    ("status", "TEXT"),
+    ("student_name", "TEXT"),
+    ("instructor_name", "TEXT"),
+    ("payment", "INTEGER"),  # Payment for the lesson
+    ("start_time", "TEXT"),  # HH:MM
+    ("duration", "INTEGER"),  # minutes
+]
+
+
+def lessons_table_sql(table="lessons"):
+    columns = ",\n    ".join(f"{name} {decl}" for name, decl in LESSONS_COLUMNS)
+    return f'''CREATE TABLE IF NOT EXISTS {table} (
+    {columns},
+    FOREIGN KEY(student_id) REFERENCES students(id),
+    FOREIGN KEY(instructor_id) REFERENCES instructors(id))'''
+
+
+def table_columns(c, table):
+    return [row[1] for row in c.execute(f"PRAGMA table_info({table})")]
+
+
+# 1: base tables
+def create_tables(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS students (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 name TEXT,
+                 address TEXT,
+                 phone TEXT,
+                 progress TEXT,
+                 payment_status TEXT)''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS instructors (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 name TEXT,
+                 phone TEXT,
+                 email TEXT,
+                 instructor_type TEXT)''')
+
+    c.execute(lessons_table_sql())
+
+    c.execute('''CREATE TABLE IF NOT EXISTS payments (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 student_id INTEGER,
+                 amount INTEGER,
+                 payment_date TEXT,
+                 FOREIGN KEY(student_id) REFERENCES students(id))''')
+
+
+# 2: the old CREATE TABLE for lessons was missing commas, so databases
+# created by it have no instructor_id/lesson_type columns, and older ones have
+# no payment column. Rebuild the table with the right columns, keeping rows.
+def repair_lessons_table(c):
+    existing = table_columns(c, "lessons")
+    wanted = [name for name, _ in LESSONS_COLUMNS]
+    if existing == wanted:
+        return
+
+    c.execute("DROP TABLE IF EXISTS lessons_new")
+    c.execute(lessons_table_sql("lessons_new"))
+    common = ", ".join(name for name in wanted if name in existing)
+    c.execute(f"INSERT INTO lessons_new ({common}) SELECT {common} FROM lessons")
+    c.execute("DROP TABLE lessons")
+    c.execute("ALTER TABLE lessons_new RENAME TO lessons")
+
+
+# 3: indexes for the lookups the screens run
+def add_lookup_indexes(c):
+    c.execute("CREATE INDEX IF NOT EXISTS idx_lessons_student ON lessons(student_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_lessons_instructor_date ON lessons(instructor_id, date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_students_name ON students(name COLLATE NOCASE)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_instructors_name ON instructors(name COLLATE NOCASE)")
+    c.execute("ANALYZE")
+
+
+# 4: FTS5 shadow tables for name search, kept in sync by triggers. Skipped
+# when this SQLite build has no FTS5; search.py then falls back to LIKE.
+def add_name_search_index(c):
+    for table in ("students", "instructors"):
+        try:
+            c.execute(f"""CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+                          name, content='{table}', content_rowid='id',
+                          tokenize='unicode61 remove_diacritics 2', prefix='2 3')""")
+        except sqlite3.OperationalError:
+            return
+
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+                      INSERT INTO {table}_fts(rowid, name) VALUES (new.id, new.name);
+                      END""")
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+                      INSERT INTO {table}_fts({table}_fts, rowid, name) VALUES ('delete', old.id, old.name);
+                      END""")
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF name ON {table} BEGIN
+                      INSERT INTO {table}_fts({table}_fts, rowid, name) VALUES ('delete', old.id, old.name);
+                      INSERT INTO {table}_fts(rowid, name) VALUES (new.id, new.name);
+                      END""")
+        c.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+# 5: branch the student/instructor belongs to, for per-branch reports, and
+# an index for reports over a date range
+def add_branches(c):
+    for table in ("students", "instructors"):
+        if "branch" not in table_columns(c, table):
+            c.execute(f"ALTER TABLE {table} ADD COLUMN branch TEXT")
+        c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_branch ON {table}(branch)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_lessons_date ON lessons(date)")
+
+
+# "YYYY-MM" of a stored date; dates entered by hand may lack zero padding
+# ("2025-3-3"), so the month is read up to the second dash
+def month_sql(column):
+    rest = f"substr({column}, 6)"
+    return (f"CASE WHEN instr({rest}, '-') > 1 "
+            f"THEN printf('%s-%02d', substr({column}, 1, 4), CAST(substr({rest}, 1, instr({rest}, '-') - 1) AS INTEGER)) "
+            f"ELSE substr({column}, 1, 7) END")
+
+
+# Rows of a summary table are upserted on the way in and decremented (and
+# dropped at zero) on the way out
+def summary_add(table, keys, values, counters):
+    columns = ", ".join(list(keys) + list(counters))
+    placeholders = ", ".join(list(values) + [str(v) for v in counters.values()])
+    updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in counters)
+    return (f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT({', '.join(keys)}) DO UPDATE SET {updates};")
+
+
+def summary_remove(table, keys, values, counters):
+    match = " AND ".join(f"{k} = {v}" for k, v in zip(keys, values))
+    updates = ", ".join(f"{c} = {c} - {v}" for c, v in counters.items())
+    first = next(iter(counters))
+    return (f"UPDATE {table} SET {updates} WHERE {match}; "
+            f"DELETE FROM {table} WHERE {match} AND {first} <= 0;")
+
+
+def create_trigger(c, name, event, table, body, when=None):
+    condition = f" WHEN {when}" if when else ""
+    c.execute(f"DROP TRIGGER IF EXISTS {name}")
+    c.execute(f"CREATE TRIGGER {name} AFTER {event} ON {table}{condition} BEGIN {body} END")
+
+
+def count_change(table, delta):
+    return f"UPDATE summary_counts SET value = value + ({delta}) WHERE name = '{table}';"
+
+
+def revenue_summary(row):
+    return ("summary_revenue_by_month", ["month"], [f"IFNULL({month_sql(f'{row}.payment_date')}, '')"],
+            {"payments": 1, "amount": f"IFNULL({row}.amount, 0)"})
+
+
+def lesson_type_summary(row):
+    return ("summary_lessons_by_type", ["lesson_type", "status"],
+            [f"IFNULL({row}.lesson_type, '')", f"IFNULL({row}.status, '')"], {"lessons": 1})
+
+
+def instructor_load_summary(row):
+    return ("summary_instructor_load", ["instructor_id"], [f"IFNULL({row}.instructor_id, 0)"],
+            {"lessons": 1, "unpaid": f"({row}.status IS 'Unpaid')"})
+
+
+# Recompute every summary table from the base tables
+def rebuild_summaries(c):
+    c.execute("DELETE FROM summary_counts")
+    for table in ("students", "instructors", "lessons"):
+        c.execute(f"INSERT INTO summary_counts (name, value) SELECT '{table}', COUNT(*) FROM {table}")
+    c.execute("DELETE FROM summary_revenue_by_month")
+    c.execute(f"""INSERT INTO summary_revenue_by_month (month, payments, amount)
+                  SELECT IFNULL({month_sql('payment_date')}, '') AS m, COUNT(*), IFNULL(SUM(amount), 0)
+                  FROM payments GROUP BY m""")
+    c.execute("DELETE FROM summary_lessons_by_type")
+    c.execute("""INSERT INTO summary_lessons_by_type (lesson_type, status, lessons)
+                 SELECT IFNULL(lesson_type, ''), IFNULL(status, ''), COUNT(*) FROM lessons GROUP BY 1, 2""")
+    c.execute("DELETE FROM summary_instructor_load")
+    c.execute("""INSERT INTO summary_instructor_load (instructor_id, lessons, unpaid)
+                 SELECT IFNULL(instructor_id, 0), COUNT(*), SUM(status IS 'Unpaid') FROM lessons GROUP BY 1""")
+
+
+# 6: totals for the Reporting dashboard, kept current by triggers so it reads
+# a handful of rows however big the tables get
+def add_summary_tables(c):
+    c.execute("""CREATE TABLE IF NOT EXISTS summary_counts (
+                 name TEXT PRIMARY KEY,
+                 value INTEGER NOT NULL DEFAULT 0)""")
+    c.execute("""CREATE TABLE IF NOT EXISTS summary_revenue_by_month (
+                 month TEXT NOT NULL PRIMARY KEY,
+                 payments INTEGER NOT NULL DEFAULT 0,
+                 amount INTEGER NOT NULL DEFAULT 0)""")
+    c.execute("""CREATE TABLE IF NOT EXISTS summary_lessons_by_type (
+                 lesson_type TEXT NOT NULL,
+                 status TEXT NOT NULL,
+                 lessons INTEGER NOT NULL DEFAULT 0,
+                 PRIMARY KEY (lesson_type, status))""")
+    # Lessons with no instructor are counted under instructor_id 0
+    c.execute("""CREATE TABLE IF NOT EXISTS summary_instructor_load (
+                 instructor_id INTEGER PRIMARY KEY,
+                 lessons INTEGER NOT NULL DEFAULT 0,
+                 unpaid INTEGER NOT NULL DEFAULT 0)""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_summary_instructor_load ON summary_instructor_load(lessons)")
+
+    for table in ("students", "instructors", "lessons"):
+        create_trigger(c, f"{table}_count_insert", "INSERT", table, count_change(table, 1))
+        create_trigger(c, f"{table}_count_delete", "DELETE", table, count_change(table, -1))
+
+    create_trigger(c, "payments_summary_insert", "INSERT", "payments", summary_add(*revenue_summary("new")))
+    create_trigger(c, "payments_summary_delete", "DELETE", "payments", summary_remove(*revenue_summary("old")))
+    create_trigger(c, "payments_summary_update", "UPDATE OF amount, payment_date", "payments",
+                   summary_remove(*revenue_summary("old")) + summary_add(*revenue_summary("new")))
+
+    create_trigger(c, "lessons_summary_insert", "INSERT", "lessons",
+                   summary_add(*lesson_type_summary("new")) + summary_add(*instructor_load_summary("new")))
+    create_trigger(c, "lessons_summary_delete", "DELETE", "lessons",
+                   summary_remove(*lesson_type_summary("old")) + summary_remove(*instructor_load_summary("old")))
+    create_trigger(c, "lessons_summary_update", "UPDATE OF lesson_type, status, instructor_id", "lessons",
+                   summary_remove(*lesson_type_summary("old")) + summary_remove(*instructor_load_summary("old")) +
+                   summary_add(*lesson_type_summary("new")) + summary_add(*instructor_load_summary("new")))
+
+    rebuild_summaries(c)
+
+
+# Lesson types with their price and progress weight as they were hard-coded
+# before the lesson_types catalog; migration 8 seeds the catalog from them
+LEGACY_LESSON_TYPES = [
+    ("Introductory", 100, 20),
+    ("Standard", 200, 60),
+    ("Pass Plus", 300, 95),
+    ("Driving Test", 350, 100),
+]
+
+
+def legacy_weight_sql(column):
+    cases = " ".join(f"WHEN '{name}' THEN {weight}" for name, _, weight in LEGACY_LESSON_TYPES)
+    return f"CASE {column} {cases} ELSE 0 END"
+
+
+# A new lesson can only raise a student's progress; any other change
+# recomputes it for the students involved from their own lessons
+def create_progress_triggers(c, weight, insert_when=None):
+    create_trigger(c, "lessons_progress_insert", "INSERT", "lessons",
+                   f"""UPDATE students SET lesson_progress = MAX(lesson_progress, {weight('new.lesson_type')})
+                       WHERE id = new.student_id;""", when=insert_when)
+    create_trigger(c, "lessons_progress_delete", "DELETE", "lessons",
+                   f"""UPDATE students SET lesson_progress = {student_progress_sql('old.student_id', weight)}
+                       WHERE id = old.student_id;""")
+    create_trigger(c, "lessons_progress_update", "UPDATE OF student_id, lesson_type", "lessons",
+                   f"""UPDATE students SET lesson_progress = {student_progress_sql('students.id', weight)}
+                       WHERE id IN (old.student_id, new.student_id);""")
+
+
+# 7: lesson-based progress cached on each student (see progress.py)
+def add_lesson_progress(c):
+    if "lesson_progress" not in table_columns(c, "students"):
+        c.execute("ALTER TABLE students ADD COLUMN lesson_progress INTEGER NOT NULL DEFAULT 0")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_students_lesson_progress ON students(lesson_progress)")
+    create_progress_triggers(c, legacy_weight_sql)
+    recompute_progress(c, weight=legacy_weight_sql)
+
+
+# 8: lesson_types catalog of prices and progress weights (see catalog.py).
+# Each lesson keeps the price it was booked at in lessons.payment, so
+# revenue is a SUM over the (status, payment) index.
+def add_lesson_type_catalog(c):
+    c.execute("""CREATE TABLE IF NOT EXISTS lesson_types (
+                 name TEXT PRIMARY KEY,
+                 price INTEGER NOT NULL,
+                 progress_weight INTEGER NOT NULL DEFAULT 0,
+                 position INTEGER NOT NULL DEFAULT 0)""")
+    c.executemany("INSERT OR IGNORE INTO lesson_types (name, price, progress_weight, position) VALUES (?, ?, ?, ?)",
+                  [(name, price, weight, position) for position, (name, price, weight)
+                   in enumerate(LEGACY_LESSON_TYPES)])
+
+    c.execute("""UPDATE lessons SET payment = IFNULL((SELECT price FROM lesson_types WHERE name = lessons.lesson_type), 0)
+                 WHERE payment IS NULL""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_lessons_status_payment ON lessons(status, payment)")
+
+    # Progress now follows the catalog's weights, including when they change
+    create_progress_triggers(c, weight_sql)
+    for event, names in [("INSERT", "new.name"), ("DELETE", "old.name"),
+                         ("UPDATE OF name, progress_weight", "old.name, new.name")]:
+        trigger = f"lesson_types_progress_{event.split()[0].lower()}"
+        c.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        c.execute(f"""CREATE TRIGGER {trigger} AFTER {event} ON lesson_types BEGIN
+                      UPDATE students SET lesson_progress = {student_progress_sql('students.id')}
+                      WHERE id IN (SELECT student_id FROM lessons WHERE lesson_type IN ({names}));
+                      END""")
+    recompute_progress(c)
+
+
+# While a row is in bulk_loads the per-row lesson insert triggers stand down;
+# the bulk writer brings the summaries and progress up to date itself, once
+# per batch, with add_bulk_lessons()
+NOT_BULK_LOADING = "NOT EXISTS (SELECT 1 FROM bulk_loads)"
+
+
+# 9: switch for bulk lesson imports (see importer.py)
+def add_bulk_load_switch(c):
+    c.execute("CREATE TABLE IF NOT EXISTS bulk_loads (name TEXT)")
+    create_trigger(c, "lessons_count_insert", "INSERT", "lessons", count_change("lessons", 1),
+                   when=NOT_BULK_LOADING)
+    create_trigger(c, "lessons_summary_insert", "INSERT", "lessons",
+                   summary_add(*lesson_type_summary("new")) + summary_add(*instructor_load_summary("new")),
+                   when=NOT_BULK_LOADING)
+    create_progress_triggers(c, weight_sql, insert_when=NOT_BULK_LOADING)
+
+
+# What the lesson insert triggers would have done for every lesson with
+# id >= first_id, done set-based. Call in the transaction that inserted them.
+def add_bulk_lessons(c, first_id):
+    # NOT INDEXED: read just the new rows by rowid rather than walk a whole
+    # index for its GROUP BY order
+    new_lessons = "FROM lessons NOT INDEXED WHERE id >= ?"
+    c.execute(f"UPDATE summary_counts SET value = value + (SELECT COUNT(*) {new_lessons}) WHERE name = 'lessons'",
+              (first_id,))
+    c.execute(f"""INSERT INTO summary_lessons_by_type (lesson_type, status, lessons)
+                  SELECT IFNULL(lesson_type, ''), IFNULL(status, ''), COUNT(*) {new_lessons} GROUP BY 1, 2
+                  ON CONFLICT(lesson_type, status) DO UPDATE SET lessons = lessons + excluded.lessons""",
+              (first_id,))
+    c.execute(f"""INSERT INTO summary_instructor_load (instructor_id, lessons, unpaid)
+                  SELECT IFNULL(instructor_id, 0), COUNT(*), SUM(status IS 'Unpaid') {new_lessons} GROUP BY 1
+                  ON CONFLICT(instructor_id) DO UPDATE SET lessons = lessons + excluded.lessons,
+                                                           unpaid = unpaid + excluded.unpaid""",
+              (first_id,))
+    c.execute(f"""UPDATE students SET lesson_progress = p.progress
+                  FROM (SELECT student_id, MAX({weight_sql('lesson_type')}) AS progress
+                        {new_lessons} GROUP BY student_id) AS p
+                  WHERE students.id = p.student_id AND p.progress > students.lesson_progress""", (first_id,))
+    c.execute("INSERT INTO calendar_changes (instructor_id, date) VALUES (NULL, NULL)")
+
+
+# 10: lesson start times and durations for the clash check in bookings.py.
+# Dates typed without zero padding are padded so one day is one index key,
+# and the student_id index grows into the per-day slot index.
+def add_lesson_times(c):
+    existing = table_columns(c, "lessons")
+    for name, decl in LESSONS_COLUMNS:
+        if name not in existing:
+            c.execute(f"ALTER TABLE lessons ADD COLUMN {name} {decl}")
+
+    padded = "'[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+    updates = []
+    for lesson_id, value in c.execute(f"SELECT id, date FROM lessons WHERE date NOT GLOB {padded}").fetchall():
+        try:
+            updates.append((normalize_date(value), lesson_id))
+        except ValueError:
+            pass  # left as entered
+    c.executemany("UPDATE lessons SET date = ? WHERE id = ?", updates)
+
+    c.execute("CREATE INDEX IF NOT EXISTS idx_lessons_instructor_slot ON lessons(instructor_id, date, start_time)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_lessons_student_slot ON lessons(student_id, date, start_time)")
+    c.execute("DROP INDEX IF EXISTS idx_lessons_student")
+
+
+# Changes to timed lessons are logged as (instructor_id, date) so the slot
+# finder can patch just those days of its bitmaps (see scheduling.py). Only
+# the newest CALENDAR_LOG_SIZE entries are kept; a reader that has fallen
+# further behind rebuilds. An entry with a NULL instructor_id means "reload
+# everything".
+CALENDAR_LOG_SIZE = 10000
+
+
+def calendar_change(row):
+    return (f"INSERT INTO calendar_changes (instructor_id, date) VALUES ({row}.instructor_id, {row}.date);"
+            f"DELETE FROM calendar_changes WHERE id <= last_insert_rowid() - {CALENDAR_LOG_SIZE};")
+
+
+# 11: how long each lesson type is booked for, and the calendar change log,
+# for the slot finder
+def add_slot_finder(c):
+    if "duration" not in table_columns(c, "lesson_types"):
+        c.execute("ALTER TABLE lesson_types ADD COLUMN duration INTEGER NOT NULL DEFAULT 60")
+    c.execute("""CREATE TABLE IF NOT EXISTS calendar_changes (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 instructor_id INTEGER,
+                 date TEXT)""")
+    create_trigger(c, "lessons_calendar_insert", "INSERT", "lessons", calendar_change("new"),
+                   when=f"new.start_time IS NOT NULL AND {NOT_BULK_LOADING}")
+    create_trigger(c, "lessons_calendar_delete", "DELETE", "lessons", calendar_change("old"),
+                   when="old.start_time IS NOT NULL")
+    create_trigger(c, "lessons_calendar_update", "UPDATE OF instructor_id, date, start_time, duration", "lessons",
+                   calendar_change("old") + calendar_change("new"),
+                   when="old.start_time IS NOT NULL OR new.start_time IS NOT NULL")
+
+
+# Likewise changes to student and instructor names are logged for the
+# type-ahead pickers' in-memory prefix index (see search.NameIndex)
+NAME_LOG_SIZE = 10000
+
+
+def name_change(table, row):
+    return (f"INSERT INTO name_changes (table_name, row_id) VALUES ('{table}', {row}.id);"
+            f"DELETE FROM name_changes WHERE id <= last_insert_rowid() - {NAME_LOG_SIZE};")
+
+
+# 12: name change log for the type-ahead pickers
+def add_name_change_log(c):
+    c.execute("""CREATE TABLE IF NOT EXISTS name_changes (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 table_name TEXT NOT NULL,
+                 row_id INTEGER)""")
+    for table in ("students", "instructors"):
+        create_trigger(c, f"{table}_names_insert", "INSERT", table, name_change(table, "new"))
+        create_trigger(c, f"{table}_names_delete", "DELETE", table, name_change(table, "old"))
+        create_trigger(c, f"{table}_names_update", "UPDATE OF id, name", table,
+                       name_change(table, "old") + name_change(table, "new"))
+
+
+# 13: an index for each column the View tables and the API sort on, so a
+# page is an index seek (see pagination.fetch_page). Names sort as their
+# search indexes do, without case. Every lessons index slows imports and
+# bookings, so lessons get one only for the student name: the ids, date and
+# status already lead an index, and the other columns are sorted by scanning.
+SORT_INDEXES = {
+    "students": ["address", "phone", "progress", "payment_status"],
+    "instructors": ["phone", "email", "instructor_type"],
+    "lessons": ["student_name COLLATE NOCASE"],
+}
+
+
+def add_sort_indexes(c):
+    for table, columns in SORT_INDEXES.items():
+        for column in columns:
+            name = column.split()[0]
+            c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{name} ON {table}({column})")
+    c.execute("ANALYZE")
+
+
+# 14: drop the lessons indexes migration 13 used to add, and the
+# (instructor_id, date) one that idx_lessons_instructor_slot begins with
+UNUSED_LESSON_INDEXES = ["instructor_date", "instructor_id", "instructor_name", "lesson_type", "start_time",
+                         "duration", "payment", "status"]
+
+
+def drop_unused_lesson_indexes(c):
+    for name in UNUSED_LESSON_INDEXES:
+        c.execute(f"DROP INDEX IF EXISTS idx_lessons_{name}")
+
+
+MIGRATIONS = [
+    (1, "create tables", create_tables),
+    (2, "repair lessons table", repair_lessons_table),
+    (3, "add lookup indexes", add_lookup_indexes),
+    (4, "add name search index", add_name_search_index),
+    (5, "add branches", add_branches),
+    (6, "add summary tables", add_summary_tables),
+    (7, "add lesson progress", add_lesson_progress),
+    (8, "add lesson type catalog", add_lesson_type_catalog),
+    (9, "add bulk load switch", add_bulk_load_switch),
+    (10, "add lesson times", add_lesson_times),
+    (11, "add slot finder", add_slot_finder),
+    (12, "add name change log", add_name_change_log),
+    (13, "add sort indexes", add_sort_indexes),
+    (14, "drop unused lesson indexes", drop_unused_lesson_indexes),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(db=None):
+    db = db or get_db()
+    return db.query_value("PRAGMA user_version")
+
+
+# Bring the database up to LATEST_VERSION; returns the steps that ran
+def migrate(db=None):
+    db = db or get_db()
+    applied = []
+    if schema_version(db) >= LATEST_VERSION:
+        db.execute("PRAGMA optimize")
+        return applied
+
+    for version, name, step in MIGRATIONS:
+        with db.transaction(immediate=True) as c:
+            # Re-read inside the write lock so two workstations starting
+            # together don't both apply the same step
+            if c.execute("PRAGMA user_version").fetchone()[0] >= version:
+                continue
+            step(c)
+            c.execute(f"PRAGMA user_version = {version}")
+        applied.append(name)
+
+    # Let SQLite refresh planner statistics for tables that changed a lot
+    db.execute("PRAGMA optimize")
+    return applied
@@ -0,0 +1,85 @@
+from collections import namedtuple
+
+from database import get_db
+
+# Keyset pagination for the list and search screens. A page is fetched with
+# "WHERE (sort key, id) > (last key, last id) ... LIMIT n" instead of OFFSET,
+# so page 10,000 costs the same as page 1.
+#
+# next_cursor / prev_cursor are the (sort key, id) of the last / first row of
+# the page, or None when there is nothing further in that direction.
+Page = namedtuple("Page", "rows next_cursor prev_cursor")
+
+PAGE_SIZE = 50
+
+
+# Names sort as their indexes (migrations 3 and 13) have them
+COLLATIONS = {"name": "NOCASE", "student_name": "NOCASE", "instructor_name": "NOCASE"}
+
+
+def sort_key_sql(order_by):
+    collation = COLLATIONS.get(order_by)
+    return f"{order_by} COLLATE {collation}" if collation else order_by
+
+
+# sql is a plain SELECT (no ORDER BY / LIMIT) whose rows include an id column.
+# Pass after=page.next_cursor for the next page, before=page.prev_cursor for
+# the previous one.
+#
+# Rows are sorted on the column itself, so an index on it (migration 13)
+# serves both the order and the cursor seek: a page reads page_size rows
+# whatever its depth. Columns left unindexed, such as a lesson's duration or
+# payment, are scanned from the cursor on and only the page_size + 1 first
+# rows kept, so such a sort costs a pass over the table per page.
+#
+# SQLite sorts NULLs first, and as they fall out of row-value comparisons,
+# the NULL rows and the others are read as two runs by separate queries: a
+# page that crosses from one run to the other is completed from the next.
+def fetch_page(sql, params=(), order_by="id", descending=False, page_size=PAGE_SIZE,
+               after=None, before=None, db=None):
+    db = db or get_db()
+    key = sort_key_sql(order_by)
+    backwards = before is not None
+    # Walking backwards means reading the other way and flipping the rows
+    reverse = descending != backwards
+    direction = "DESC" if reverse else "ASC"
+    compare = "<" if reverse else ">"
+
+    # (condition, params) of each run from the cursor on, in reading order
+    cursor = before if backwards else after
+    if cursor is None:
+        runs = [("1", ())]
+    elif order_by == "id":
+        runs = [(f"id {compare} ?", (cursor[1],))]
+    else:
+        if cursor[0] is None:
+            nulls = [(f"{order_by} IS NULL AND id {compare} ?", (cursor[1],))]
+            values = [] if reverse else [(f"{order_by} IS NOT NULL", ())]
+        else:
+            nulls = [(f"{order_by} IS NULL", ())] if reverse else []
+            # The first term is for the planner: it seeks on a collated
+            # column's index only with the bare comparison
+            values = [(f"{key} {compare}= ? AND ({key}, id) {compare} (?, ?)", (cursor[0], *cursor))]
+        runs = values + nulls if reverse else nulls + values
+
+    rows = []
+    for condition, run_params in runs:
+        # one extra row tells us whether there is more
+        rows += db.query(f"SELECT *, {order_by}, id FROM ({sql}) WHERE {condition} "
+                         f"ORDER BY {key} {direction}, id {direction} LIMIT ?",
+                         (*params, *run_params, page_size + 1 - len(rows)))
+        if len(rows) > page_size:
+            break
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    keys = [(row[-2], row[-1]) for row in rows]
+    rows = [row[:-2] for row in rows]
+    if not rows:
+        return Page([], None, None)
+
+    if backwards:
+        return Page(rows, keys[-1], keys[0] if more else None)
+    return Page(rows, keys[-1] if more else None, keys[0] if after is not None else None)
@@ -0,0 +1,295 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import deque, namedtuple
+from datetime import datetime
+from itertools import chain
+
+# Opt-in query instrumentation, for "the app is slow" reports: every
+# statement run on a connection opened while profiling is on is timed, from
+# execute until its last row is read (or its cursor is dropped), and counted
+# under its shape, the SQL with literals and IN lists folded, so
+# "WHERE id = 3" and "WHERE id = 4" add to one latency histogram.
+#
+# Statements slower than the slow-query threshold go into a log with their
+# EXPLAIN QUERY PLAN (taken once per shape), and plans that scan a whole
+# table are flagged.
+#
+# Turn it on by setting DRIVING_SCHOOL_PROFILE before starting the app, the
+# API or the command line (the value is the slow-query threshold in ms; any
+# non-number means SLOW_QUERY_MS), or call enable() before the first query.
+# Connections opened while it is off are plain sqlite3 connections and cost
+# nothing. See the Query Statistics view in the Reporting screen, or dump().
+
+SLOW_QUERY_MS = 100
+SLOW_LOG_SIZE = 200
+ENV_VAR = "DRIVING_SCHOOL_PROFILE"
+
+# Histogram bucket upper bounds in ms; the last bucket holds everything slower
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+StatementStats = namedtuple("StatementStats", "shape calls rows total_ms mean_ms p50_ms p95_ms max_ms histogram")
+SlowQuery = namedtuple("SlowQuery", "time shape sql params ms rows plan full_scans")
+
+_enabled = False
+_slow_ms = SLOW_QUERY_MS
+_lock = threading.Lock()
+_statements = {}   # shape -> [calls, rows, total seconds, max seconds, bucket counts]
+_plans = {}        # shape -> (plan lines, full scans), for shapes that were slow
+_slow_log = deque(maxlen=SLOW_LOG_SIZE)
+_shapes = {}       # sql text -> shape
+MAX_SHAPE_CACHE = 10000
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN \((?:\?, )*\?\)", re.IGNORECASE)
+_VALUES_ROWS = re.compile(r"(\(\?(?:, \?)*\))(?:, \1)+")
+_SPACE = re.compile(r"\s+")
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH)\b", re.IGNORECASE)
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+_TEMPORARY = re.compile(r"^(?:MATERIALIZE|CO-ROUTINE) (\w+)")
+
+
+def enable(slow_ms=SLOW_QUERY_MS):
+    global _enabled, _slow_ms
+    _enabled = True
+    _slow_ms = slow_ms
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+def slow_query_ms():
+    return _slow_ms
+
+
+# The sqlite3.connect() factory for a new connection
+def connection_class():
+    return Connection if _enabled else sqlite3.Connection
+
+
+def statement_shape(sql):
+    shape = _shapes.get(sql)
+    if shape is None:
+        shape = _SPACE.sub(" ", sql).strip()
+        shape = _NUMBER.sub("?", _STRING.sub("?", shape))
+        shape = _VALUES_ROWS.sub(r"\1, ...", _IN_LIST.sub("IN (?, ...)", shape))
+        if len(_shapes) < MAX_SHAPE_CACHE:
+            _shapes[sql] = shape
+    return shape
+
+
+# (plan lines, tables scanned in full) of sql, or (None, ()) if it cannot be explained
+def query_plan(conn, sql, params):
+    if not _EXPLAINABLE.match(sql):
+        return None, ()
+    try:
+        # Plain sqlite3 execute: explaining is not itself counted
+        rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    except (sqlite3.Error, ValueError):
+        return None, ()
+    temporary = {match.group(1) for match in (_TEMPORARY.match(row[3]) for row in rows) if match}
+    plan = ["  " * depth(rows, row) + row[3] for row in rows]
+    full_scans = tuple(match.group(1) for match in (_FULL_SCAN.match(row[3]) for row in rows)
+                       if match and match.group(1) not in temporary)
+    return plan, full_scans
+
+
+def depth(rows, row):
+    parents = {r[0]: r[1] for r in rows}
+    level, parent = 0, row[1]
+    while parent in parents:
+        level += 1
+        parent = parents[parent]
+    return level
+
+
+def record(conn, sql, params, seconds, rows):
+    shape = statement_shape(sql)
+    bucket = bisect_left(BUCKETS_MS, seconds * 1000)
+    with _lock:
+        stats = _statements.get(shape)
+        if stats is None:
+            stats = _statements[shape] = [0, 0, 0.0, 0.0, [0] * (len(BUCKETS_MS) + 1)]
+        stats[0] += 1
+        stats[1] += rows
+        stats[2] += seconds
+        stats[3] = max(stats[3], seconds)
+        stats[4][bucket] += 1
+        slow = seconds * 1000 >= _slow_ms
+        explained = shape in _plans
+    if not slow:
+        return
+    if not explained:
+        plan = query_plan(conn, sql, params)
+        with _lock:
+            _plans.setdefault(shape, plan)
+    with _lock:
+        plan, full_scans = _plans[shape]
+        _slow_log.append(SlowQuery(datetime.now().isoformat(timespec="seconds"), shape, sql,
+                                   repr(params)[:200], seconds * 1000, rows, plan, full_scans))
+
+
+# Cursor that times its statement from execute until the last row is read,
+# the cursor is closed or reused, or it is dropped half read
+class Cursor(sqlite3.Cursor):
+    _sql = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        began = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        except sqlite3.Error:
+            record(self.connection, sql, parameters, time.perf_counter() - began, 0)
+            raise
+        self._sql, self._params = sql, parameters
+        self._seconds, self._rows = time.perf_counter() - began, 0
+        if self.description is None:
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        # Explained (if slow) with the first parameters; the rest may be a
+        # generator, which is left to run lazily
+        remaining = iter(seq_of_parameters)
+        first = next(remaining, None)
+        began = time.perf_counter()
+        try:
+            super().executemany(sql, remaining if first is None else chain([first], remaining))
+        finally:
+            record(self.connection, sql, () if first is None else first, time.perf_counter() - began,
+                   max(self.rowcount, 0))
+        return self
+
+    def fetchone(self):
+        began = time.perf_counter()
+        row = super().fetchone()
+        self._read(began, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        began = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._read(began, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        began = time.perf_counter()
+        rows = super().fetchall()
+        self._read(began, len(rows), True)
+        return rows
+
+    def __next__(self):
+        began = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._read(began, 0, True)
+            raise
+        self._read(began, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+    def _read(self, began, rows, done):
+        if self._sql is not None:
+            self._seconds += time.perf_counter() - began
+            self._rows += rows
+            if done:
+                self._finish()
+
+    def _finish(self):
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            record(self.connection, sql, self._params, self._seconds, self._rows)
+
+
+class Connection(sqlite3.Connection):
+    def cursor(self, factory=Cursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# Statement shapes with their latencies, slowest in total first
+def statement_stats():
+    with _lock:
+        items = [(shape, stats[0], stats[1], stats[2], stats[3], list(stats[4]))
+                 for shape, stats in _statements.items()]
+    result = []
+    for shape, calls, rows, total, slowest, histogram in items:
+        result.append(StatementStats(shape, calls, rows, total * 1000, total * 1000 / calls,
+                                     histogram_percentile(histogram, 0.5, slowest * 1000),
+                                     histogram_percentile(histogram, 0.95, slowest * 1000), slowest * 1000,
+                                     histogram))
+    result.sort(key=lambda stats: stats.total_ms, reverse=True)
+    return result
+
+
+# Upper bound of the bucket the fraction-th call falls in (at most the slowest)
+def histogram_percentile(histogram, fraction, slowest_ms):
+    rank = max(1, round(sum(histogram) * fraction))
+    seen = 0
+    for bound, count in zip(BUCKETS_MS, histogram):
+        seen += count
+        if seen >= rank:
+            return min(bound, slowest_ms)
+    return slowest_ms
+
+
+# The slow-query log, newest first
+def slow_queries():
+    with _lock:
+        return list(reversed(_slow_log))
+
+
+def reset():
+    with _lock:
+        _statements.clear()
+        _plans.clear()
+        _slow_log.clear()
+
+
+# Write the statistics and slow-query log to path as JSON; sections are
+# extra top-level entries (e.g. the read cache's counters)
+def dump(path, **sections):
+    report = {"time": datetime.now().isoformat(timespec="seconds"), "enabled": _enabled,
+              "slow_query_ms": _slow_ms, "buckets_ms": BUCKETS_MS,
+              "statements": [stats._asdict() for stats in statement_stats()],
+              "slow_queries": [query._asdict() for query in slow_queries()], **sections}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+def enable_from_environment():
+    value = os.environ.get(ENV_VAR)
+    if value:
+        try:
+            enable(float(value))
+        except ValueError:
+            enable()
+
+
+enable_from_environment()
@@ -0,0 +1,46 @@
+from database import get_db
+
+# Lesson-based progress of a student: the progress weight (a percentage, from
+# the lesson_types catalog) of the furthest lesson type they have booked. It
+# is stored in students.lesson_progress so the roster can show and sort by
+# it; the triggers added by migrations keep it current as lessons change, and
+# refresh_progress() recomputes it in bulk.
+#
+# (students.progress is the "Level N" an instructor enters by hand and is
+# left alone.)
+
+
+def weight_sql(column):
+    return f"IFNULL((SELECT progress_weight FROM lesson_types WHERE name = {column}), 0)"
+
+
+# Progress of the student whose id is student_sql, as a scalar subquery
+def student_progress_sql(student_sql, weight=weight_sql):
+    return (f"(SELECT IFNULL(MAX({weight('lesson_type')}), 0) FROM lessons "
+            f"WHERE student_id = {student_sql})")
+
+
+# Recompute lesson_progress for every student, or only for student_ids,
+# with one aggregation over lessons
+def refresh_progress(student_ids=None, db=None):
+    db = db or get_db()
+    with db.transaction(immediate=True) as c:
+        recompute_progress(c, student_ids)
+
+
+# weight: column -> SQL for the weight of that lesson type
+def recompute_progress(c, student_ids=None, weight=weight_sql):
+    where, lessons_where, params = "", "", []
+    if student_ids is not None:
+        params = list(student_ids)
+        if not params:
+            return
+        placeholders = ", ".join("?" * len(params))
+        where = f"WHERE id IN ({placeholders})"
+        lessons_where = f"WHERE student_id IN ({placeholders})"
+
+    c.execute(f"UPDATE students SET lesson_progress = 0 {where}", params)
+    c.execute(f"""UPDATE students SET lesson_progress = p.progress
+                  FROM (SELECT student_id, MAX({weight('lesson_type')}) AS progress
+                        FROM lessons {lessons_where} GROUP BY student_id) AS p
+                  WHERE students.id = p.student_id AND p.progress > 0""", params)
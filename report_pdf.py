@@ -0,0 +1,106 @@
+import fpdf
+from fpdf import FPDF
+
+# PDF pages of the printed report (see reports.write_report)
+
+# Font size of the table rows and the row height in mm
+FONT_SIZE = 8
+ROW_HEIGHT = 5
+
+
+# The buffering below replaces private parts of FPDF 1.7.2, the version
+# requirements.txt pins. Any other version gets plain FPDF output, which is
+# slower on long reports but does not depend on internals that have changed.
+BUFFERED = getattr(fpdf, "FPDF_VERSION", None) == "1.7.2"
+
+
+# Stands in for FPDF's document string, which FPDF 1.7 grows with str +=
+# (copying everything written so far on every line). FPDF only ever appends to
+# it, takes its len() for the object offsets and encodes it on output.
+class DocumentBuffer:
+    def __init__(self):
+        self.parts = []
+        self.length = 0
+
+    def __iadd__(self, text):
+        self.parts.append(text)
+        self.length += len(text)
+        return self
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        return "".join(self.parts)
+
+    def encode(self, encoding):
+        return str(self).encode(encoding)
+
+
+# FPDF page that repeats the current section's column headings at the top
+class ReportPDF(FPDF):
+    def __init__(self, title):
+        super().__init__(orientation="L")
+        self.title = title
+        self.columns = None
+        self.page_lines = []
+        if BUFFERED:
+            self.buffer = DocumentBuffer()
+        self.set_auto_page_break(True, margin=15)
+
+    # Likewise FPDF appends every drawing operator to the page with str +=;
+    # collect them and join once per page
+    def _out(self, s):
+        if not BUFFERED or self.state != 2:
+            return super()._out(s)
+        if isinstance(s, bytes):
+            s = s.decode("latin1")
+        self.page_lines.append(f"{s}\n")
+
+    def _endpage(self):
+        if BUFFERED:
+            self.pages[self.page] += "".join(self.page_lines)
+            self.page_lines = []
+        super()._endpage()
+
+    def header(self):
+        self.set_font("Arial", "B", 12)
+        self.cell(0, 8, txt=self.title, ln=1, align="C")
+        if self.columns:
+            self.column_headings()
+
+    def footer(self):
+        self.set_y(-12)
+        self.set_font("Arial", size=FONT_SIZE)
+        self.cell(0, 5, txt=f"Page {self.page_no()}", align="C")
+
+    def section(self, title, columns):
+        self.columns = None
+        if self.page == 0 or self.get_y() > self.h - 40:
+            self.add_page()
+        self.set_font("Arial", "B", 11)
+        self.cell(0, 8, txt=title, ln=1)
+        self.columns = columns
+        self.column_headings()
+
+    def column_headings(self):
+        self.set_font("Arial", "B", FONT_SIZE)
+        for heading, width in self.columns:
+            self.cell(width, ROW_HEIGHT + 1, txt=heading, border="B")
+        self.ln()
+        self.set_font("Arial", size=FONT_SIZE)
+
+    def row(self, values):
+        for (_, width), value in zip(self.columns, values):
+            self.cell(width, ROW_HEIGHT, txt=fit(value, width))
+        self.ln()
+
+
+def fit(value, width):
+    text = "" if value is None else str(value)
+    # Roughly what fits in the column at FONT_SIZE; FPDF does not clip
+    limit = int(width / 1.6)
+    if len(text) > limit:
+        text = text[:limit - 1] + "~"
+    # The core PDF fonts only cover Latin-1
+    return text.encode("latin-1", "replace").decode("latin-1")
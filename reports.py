@@ -0,0 +1,142 @@
+import os
+from collections import namedtuple
+
+from cache import cached
+from database import get_db
+
+# The printed driving school report. Rows are streamed from SQLite cursors a
+# chunk at a time and written as one table row each, so memory stays bounded
+# by the chunk size plus the PDF volume being built rather than by the size of
+# the database. Large reports can be split into several PDF volumes.
+#
+# The PDF pages themselves are in report_pdf.py, imported on the first
+# report: fpdf takes longer to import than the rest of the app's modules
+# together, and the dashboard below does not need it.
+
+CHUNK_SIZE = 1000
+
+# (title, columns, sql); columns are (heading, width in mm) in select order.
+# {where} is replaced by the filters that apply to the section.
+SECTIONS = [
+    ("Students",
+     [("ID", 15), ("Name", 60), ("Address", 80), ("Phone", 35), ("Progress", 30), ("Payment", 30), ("Branch", 27)],
+     "SELECT id, name, address, phone, progress, payment_status, branch FROM students {where} ORDER BY id"),
+    ("Instructors",
+     [("ID", 15), ("Name", 60), ("Phone", 35), ("Email", 80), ("Type", 30), ("Branch", 57)],
+     "SELECT id, name, phone, email, instructor_type, branch FROM instructors {where} ORDER BY id"),
+    ("Lessons",
+     [("ID", 15), ("Student ID", 20), ("Student", 47), ("Instructor ID", 22), ("Instructor", 48),
+      ("Lesson Type", 45), ("Date", 25), ("Time", 15), ("Status", 20), ("Payment", 20)],
+     "SELECT id, student_id, student_name, instructor_id, instructor_name, lesson_type, date, start_time, status, "
+     "payment "
+     "FROM lessons {where} ORDER BY id"),
+]
+
+
+def section_filters(title, date_from, date_to, branch):
+    clauses, params = [], []
+    if title == "Lessons":
+        if date_from:
+            clauses.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("date <= ?")
+            params.append(date_to)
+        if branch:
+            clauses.append("instructor_id IN (SELECT id FROM instructors WHERE branch = ?)")
+            params.append(branch)
+    elif branch:
+        clauses.append("branch = ?")
+        params.append(branch)
+    where = "WHERE " + " AND ".join(clauses) if clauses else ""
+    return where, params
+
+
+def volume_path(path, number, split):
+    if not split:
+        return path
+    base, ext = os.path.splitext(path)
+    return f"{base}_{number}{ext}"
+
+
+# Write the report and return the paths of the PDF volumes written.
+#   date_from / date_to: limit lessons to this date range (inclusive)
+#   branch:              only students, instructors and lessons of this branch
+#   rows_per_volume:     start a new PDF after this many rows (None: one file)
+def write_report(path="driving_school_report.pdf", date_from=None, date_to=None, branch=None,
+                 rows_per_volume=None, chunk_size=CHUNK_SIZE, db=None):
+    from report_pdf import ReportPDF
+
+    db = db or get_db()
+    split = bool(rows_per_volume)
+    title = "Driving School Report"
+    if branch:
+        title += f" - {branch}"
+    if date_from or date_to:
+        title += f" ({date_from or '...'} to {date_to or '...'})"
+
+    paths = []
+    pdf = None
+    rows_in_volume = 0
+
+    def finish_volume():
+        target = volume_path(path, len(paths) + 1, split)
+        pdf.output(target)
+        paths.append(target)
+
+    for section_title, columns, sql in SECTIONS:
+        where, params = section_filters(section_title, date_from, date_to, branch)
+        if pdf is None:
+            pdf = ReportPDF(title)
+        pdf.section(section_title, columns)
+        for rows in db.stream(sql.format(where=where), params, chunk_size):
+            for row in rows:
+                if split and rows_in_volume >= rows_per_volume:
+                    finish_volume()
+                    pdf = ReportPDF(title)
+                    pdf.section(f"{section_title} (continued)", columns)
+                    rows_in_volume = 0
+                pdf.row(row)
+                rows_in_volume += 1
+
+    finish_volume()
+    return paths
+
+
+# Figures for the Reporting dashboard. They come from the summary tables the
+# triggers keep current (migrations.add_summary_tables), so each read touches
+# a few rows whatever the size of lessons, students and payments. Lesson
+# revenue sums the price stored on each lesson over the (status, payment)
+# index, a scan that grows with the lessons table, so the figures are kept in
+# the read cache until one of the tables they come from changes.
+Dashboard = namedtuple("Dashboard", "students instructors lessons lessons_booked revenue lesson_revenue "
+                                    "outstanding revenue_by_month lessons_by_type instructor_load")
+
+
+def dashboard_summary(months=12, top_instructors=10, db=None):
+    db = db or get_db()
+    return cached(("dashboard", months, top_instructors), lambda: read_dashboard(months, top_instructors, db),
+                  tags=("students", "instructors", "lessons", "payments"), db=db)
+
+
+def read_dashboard(months, top_instructors, db):
+    counts = dict(db.query("SELECT name, value FROM summary_counts"))
+    lessons_by_type = db.query("SELECT lesson_type, status, lessons FROM summary_lessons_by_type "
+                               "ORDER BY lesson_type, status")
+    revenue_by_month = db.query("SELECT month, payments, amount FROM summary_revenue_by_month "
+                                "WHERE month != '' ORDER BY month DESC LIMIT ?", (months,))
+    instructor_load = db.query("""SELECT i.name, l.lessons, l.unpaid
+                                  FROM summary_instructor_load l JOIN instructors i ON i.id = l.instructor_id
+                                  ORDER BY l.lessons DESC LIMIT ?""", (top_instructors,))
+    return Dashboard(
+        students=counts.get("students", 0),
+        instructors=counts.get("instructors", 0),
+        lessons=counts.get("lessons", 0),
+        lessons_booked=sum(n for _, status, n in lessons_by_type if status in ("Paid", "Unpaid")),
+        revenue=db.query_value("SELECT IFNULL(SUM(amount), 0) FROM summary_revenue_by_month"),
+        lesson_revenue=db.query_value("SELECT IFNULL(SUM(payment), 0) FROM lessons WHERE status = 'Paid'"),
+        outstanding=db.query_value("SELECT IFNULL(SUM(payment), 0) FROM lessons WHERE status = 'Unpaid'"),
+        revenue_by_month=revenue_by_month,
+        lessons_by_type=lessons_by_type,
+        instructor_load=instructor_load,
+    )
@@ -0,0 +1,209 @@
+import heapq
+import threading
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from bookings import DEFAULT_DURATION, format_time, normalize_date
+from catalog import lesson_duration
+from database import get_db
+
+# Next-available-slot finder. The calendar is cut into SLOT_MINUTES slots and
+# each instructor's free time over the search window is one Python int used
+# as a bitmap: bit day * SLOTS_PER_DAY + slot is set when the instructor is
+# within opening hours and not in a lesson then. Finding where a lesson of n
+# slots fits is a handful of shift-and-ANDs per instructor, and the lowest set
+# bit is the earliest start, so no per-day queries are needed.
+#
+# The bitmaps are built with one pass over the window's lessons and kept per
+# worker thread. When the database has changed since (PRAGMA data_version for
+# other connections, total_changes for this one) the days named in the
+# calendar_changes log are re-read from the instructor slot index and patched
+# in, so a booking costs the next search a few small queries, not a rebuild.
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+OPENING_TIME = 8 * 60
+CLOSING_TIME = 20 * 60
+WINDOW_DAYS = 14
+
+# One day of a bitmap: the slots within opening hours, and all of them
+DAY_OPEN = ((1 << (CLOSING_TIME - OPENING_TIME) // SLOT_MINUTES) - 1) << OPENING_TIME // SLOT_MINUTES
+WHOLE_DAY = (1 << SLOTS_PER_DAY) - 1
+
+# More changed instructor-days than this and the calendar is rebuilt instead
+MAX_PATCHED_DAYS = 2000
+
+Slot = namedtuple("Slot", "date start_time instructor_id instructor_name")
+
+_calendars = threading.local()  # (key, stamp, Calendar) of this thread
+
+
+class Calendar:
+    # seen: the last calendar_changes entry the bitmaps include
+    def __init__(self, first_day, days, instructors, busy, seen):
+        self.first_day = first_day
+        self.days = days
+        self.seen = seen
+        self.day_index = {(first_day + timedelta(days=n)).isoformat(): n for n in range(days)}
+        self.open = sum(DAY_OPEN << day * SLOTS_PER_DAY for day in range(days))
+        self.names = {}
+        self.free = {}
+        self.set_instructors(instructors)
+        for instructor_id, mask in busy.items():
+            if instructor_id in self.free:
+                self.free[instructor_id] &= ~mask
+
+    def set_instructors(self, instructors):
+        self.names = dict(instructors)
+        self.free = {instructor_id: self.free.get(instructor_id, self.open) for instructor_id in self.names}
+
+    # Bring the bitmaps up to date from the change log; False if they are too
+    # far behind and the calendar has to be rebuilt
+    def refresh(self, db):
+        changes = db.query("SELECT id, instructor_id, date FROM calendar_changes WHERE id > ? ORDER BY id",
+                           (self.seen,))
+        if not changes:
+            self.set_instructors(db.query("SELECT id, name FROM instructors"))
+            return True
+        if changes[0][0] != self.seen + 1 and db.query_value("SELECT MIN(id) FROM calendar_changes") > self.seen + 1:
+            return False
+        days = {(instructor_id, day) for _, instructor_id, day in changes}
+        if len(days) > MAX_PATCHED_DAYS or any(instructor_id is None for instructor_id, _ in days):
+            return False
+
+        self.set_instructors(db.query("SELECT id, name FROM instructors"))
+        for instructor_id, day in days:
+            index = self.day_index.get(day)
+            if index is None or instructor_id not in self.free:
+                continue
+            busy = 0
+            for _, start_time, duration in db.query(
+                    """SELECT instructor_id, start_time, duration FROM lessons
+                       WHERE instructor_id = ? AND date = ? AND start_time IS NOT NULL""", (instructor_id, day)):
+                busy |= lesson_mask(0, start_time, duration)
+            shift = index * SLOTS_PER_DAY
+            self.free[instructor_id] = ((self.free[instructor_id] & ~(WHOLE_DAY << shift))
+                                        | ((DAY_OPEN & ~busy) << shift))
+        self.seen = changes[-1][0]
+        return True
+
+    def slot(self, position, instructor_id):
+        day, offset = divmod(position, SLOTS_PER_DAY)
+        return Slot((self.first_day + timedelta(days=day)).isoformat(), format_time(offset * SLOT_MINUTES),
+                    instructor_id, self.names[instructor_id])
+
+    # Position of the first slot that starts at or after now: slots before it
+    # are in the past
+    def first_position(self, now):
+        day = (now.date() - self.first_day).days
+        if day < 0:
+            return 0
+        if day >= self.days:
+            return self.days * SLOTS_PER_DAY
+        minutes = now.hour * 60 + now.minute + (now.second > 0 or now.microsecond > 0)
+        return day * SLOTS_PER_DAY + -(-minutes // SLOT_MINUTES)
+
+
+# Bits of the slots a lesson covers; a lesson that starts or ends part way
+# through a slot takes the whole slot
+def lesson_mask(day, start_time, duration):
+    start = int(start_time[:2]) * 60 + int(start_time[3:5])
+    first = start // SLOT_MINUTES
+    last = -(-(start + (duration or DEFAULT_DURATION)) // SLOT_MINUTES)
+    return ((1 << (last - first)) - 1) << (day * SLOTS_PER_DAY + first)
+
+
+# Busy bitmaps keyed by the first column of sql, over the days of day_index
+def busy_bitmaps(db, sql, params, day_index):
+    busy = {}
+    for rows in db.stream(sql, params):
+        for key, day, start_time, duration in rows:
+            busy[key] = busy.get(key, 0) | lesson_mask(day_index[day], start_time, duration)
+    return busy
+
+
+def build_calendar(date_from, date_to, db):
+    first_day = date.fromisoformat(date_from)
+    days = (date.fromisoformat(date_to) - first_day).days + 1
+    with db.transaction() as c:
+        # Read in one transaction so seen matches the lessons read
+        seen = c.execute("SELECT IFNULL(MAX(id), 0) FROM calendar_changes").fetchone()[0]
+        instructors = db.query("SELECT id, name FROM instructors")
+        day_index = {(first_day + timedelta(days=n)).isoformat(): n for n in range(days)}
+        busy = busy_bitmaps(db, """SELECT instructor_id, date, start_time, duration FROM lessons
+                                   WHERE date >= ? AND date <= ? AND start_time IS NOT NULL""",
+                            (date_from, date_to), day_index)
+    return Calendar(first_day, days, instructors, busy, seen)
+
+
+def get_calendar(date_from, date_to, db):
+    conn = db.connection()
+    stamp = (conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes)
+    key = (db.path, date_from, date_to)
+    cached = getattr(_calendars, "cached", None)
+    if cached is not None and cached[0] == key:
+        calendar = cached[2]
+        if cached[1] == stamp or calendar.refresh(db):
+            _calendars.cached = (key, stamp, calendar)
+            return calendar
+    calendar = build_calendar(date_from, date_to, db)
+    _calendars.cached = (key, stamp, calendar)
+    return calendar
+
+
+# Bit i of the result is set when slots i .. i + slots - 1 are all free
+def run_starts(free, slots):
+    run, length = free, 1
+    while length < slots:
+        step = min(length, slots - length)
+        run &= run >> step
+        length += step
+    return run
+
+
+# The earliest free slots for a lesson of lesson_type between date_from
+# (default today) and date_to (inclusive; default WINDOW_DAYS days), earliest
+# first. Slots starting before now (default: the clock) are left out.
+#   instructor_ids: only these instructors (default: all)
+#   student_id:     leave out times the student already has a lesson
+# An instructor's later slots are suggested after the end of their earlier
+# ones, so one free afternoon does not fill the list on its own.
+def find_slots(lesson_type, date_from=None, date_to=None, instructor_ids=None, student_id=None, limit=10, db=None,
+               now=None):
+    db = db or get_db()
+    now = now or datetime.now()
+    date_from = normalize_date(date_from) if date_from else now.date().isoformat()
+    if date_to:
+        date_to = normalize_date(date_to)
+    else:
+        date_to = (date.fromisoformat(date_from) + timedelta(days=WINDOW_DAYS - 1)).isoformat()
+    if date_to < date_from:
+        raise ValueError("The search window ends before it starts")
+
+    slots = -(-lesson_duration(lesson_type, db) // SLOT_MINUTES)
+    calendar = get_calendar(date_from, date_to, db)
+    blocked = 0
+    if student_id is not None:
+        blocked = busy_bitmaps(db, """SELECT student_id, date, start_time, duration FROM lessons
+                                      WHERE student_id = ? AND date >= ? AND date <= ? AND start_time IS NOT NULL""",
+                               (student_id, date_from, date_to), calendar.day_index).get(student_id, 0)
+    blocked |= (1 << calendar.first_position(now)) - 1
+
+    heap = []
+    for instructor_id in (instructor_ids if instructor_ids is not None else calendar.free):
+        free = calendar.free.get(instructor_id)
+        if free is None:
+            continue
+        starts = run_starts(free & ~blocked, slots)
+        if starts:
+            heap.append(((starts & -starts).bit_length() - 1, instructor_id, starts))
+    heapq.heapify(heap)
+
+    found = []
+    while heap and len(found) < limit:
+        position, instructor_id, starts = heapq.heappop(heap)
+        found.append(calendar.slot(position, instructor_id))
+        starts &= ~((1 << (position + slots)) - 1)
+        if starts:
+            heapq.heappush(heap, ((starts & -starts).bit_length() - 1, instructor_id, starts))
+    return found
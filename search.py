@@ -0,0 +1,185 @@
+import bisect
+import re
+import threading
+import unicodedata
+
+from database import get_db
+
+# Name search for students and instructors. Uses the FTS5 shadow tables from
+# migration 4: every word typed matches the start of a word in the name
+# ("shou" finds "Shourav", "ra sa" finds "Ratna Sarkar", "rav" finds nothing).
+# Results come back in id order. Falls back to LIKE when FTS5 is not available.
+
+SEARCHABLE_TABLES = ("students", "instructors")
+
+_fts_tables = {}
+
+
+def has_fts(table, db=None):
+    db = db or get_db()
+    key = (db.path, table)
+    if key not in _fts_tables:
+        _fts_tables[key] = db.query_one(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (f"{table}_fts",)) is not None
+    return _fts_tables[key]
+
+
+# Turn what the clerk typed into an FTS5 query: each word becomes a quoted
+# prefix term, and all of them must match
+def fts_query(term):
+    words = re.findall(r"\w+", term)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+# SELECT for the rows whose name matches term (every row for an empty term),
+# aliased as t and without ORDER BY so callers can add their own ordering
+def name_search_sql(table, term, columns=("id", "name"), db=None):
+    if table not in SEARCHABLE_TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    db = db or get_db()
+    select = ", ".join(f"t.{column}" for column in columns)
+
+    if not term.strip():
+        return f"SELECT {select} FROM {table} t", ()
+    if has_fts(table, db):
+        match = fts_query(term)
+        if not match:
+            return f"SELECT {select} FROM {table} t WHERE 0", ()
+        return (f"SELECT {select} FROM {table}_fts JOIN {table} t ON t.id = {table}_fts.rowid "
+                f"WHERE {table}_fts MATCH ?", (match,))
+
+    return f"SELECT {select} FROM {table} t WHERE t.name LIKE ?", ('%' + term + '%',)
+
+
+def search_names(table, term, columns=("id", "name"), limit=None, db=None):
+    db = db or get_db()
+    sql, params = name_search_sql(table, term, columns, db)
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return db.query(sql, params)
+
+
+# In-memory prefix index of names for the type-ahead pickers: a sorted list
+# of (word, id) for every word of every name, searched with bisect. It is
+# built on first use and then kept in step from the name_changes log that
+# triggers fill (migration 12), so inserts, renames and deletes made here or
+# on another workstation show up without a rebuild. Matching is as for the
+# FTS5 search: every word typed must start a word of the name.
+class NameIndex:
+    def __init__(self, table, rows, seen):
+        self.table = table
+        self.seen = seen  # the last name_changes entry included
+        self.lock = threading.Lock()
+        self.names = {row_id: name or "" for row_id, name in rows}
+        self.keys = sorted((word, row_id) for row_id, name in self.names.items() for word in name_words(name))
+
+    def add(self, row_id, name):
+        self.names[row_id] = name or ""
+        for word in name_words(name):
+            bisect.insort(self.keys, (word, row_id))
+
+    def remove(self, row_id):
+        name = self.names.pop(row_id, None)
+        for word in name_words(name):
+            i = bisect.bisect_left(self.keys, (word, row_id))
+            if i < len(self.keys) and self.keys[i] == (word, row_id):
+                del self.keys[i]
+
+    # Apply the logged changes since the index was last brought up to date;
+    # False if the log no longer goes back that far and it must be rebuilt.
+    # The queries run outside the lock, so searches on the Tk thread never
+    # wait on SQLite.
+    def refresh(self, db=None):
+        db = db or get_db()
+        seen = self.seen
+        changes = db.query("SELECT id, table_name, row_id FROM name_changes WHERE id > ? ORDER BY id", (seen,))
+        if not changes:
+            return True
+        if changes[0][0] != seen + 1 and db.query_value("SELECT MIN(id) FROM name_changes") > seen + 1:
+            return False
+        row_ids = list({row_id for _, table, row_id in changes if table == self.table})
+        rows = []
+        for start in range(0, len(row_ids), 500):
+            chunk = row_ids[start:start + 500]
+            rows += db.query(f"SELECT id, name FROM {self.table} WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+        with self.lock:
+            # Another thread may have applied these changes meanwhile
+            if self.seen == seen:
+                for row_id in row_ids:
+                    self.remove(row_id)
+                for row_id, name in rows:
+                    self.add(row_id, name)
+                self.seen = changes[-1][0]
+        return True
+
+    # Up to limit (id, name) rows whose names match term, by matching word.
+    # A term that is a whole id puts that row first.
+    def search(self, term, limit=10):
+        words = name_words(term)
+        if not words:
+            return []
+        # Walk the keys of the longest word, the fewest to check
+        words.sort(key=len, reverse=True)
+        first, rest = words[0], words[1:]
+        found = []
+        with self.lock:
+            if term.strip().isdecimal() and int(term.strip()) in self.names:
+                found.append(int(term.strip()))
+            i = bisect.bisect_left(self.keys, (first,))
+            while len(found) < limit and i < len(self.keys) and self.keys[i][0].startswith(first):
+                row_id = self.keys[i][1]
+                i += 1
+                if row_id in found:
+                    continue
+                words_of_name = name_words(self.names[row_id])
+                if all(any(word.startswith(typed) for word in words_of_name) for typed in rest):
+                    found.append(row_id)
+            return [(row_id, self.names[row_id]) for row_id in found]
+
+
+# Lower-cased words of a name with accents dropped ("Åsa" -> "asa"), like
+# the FTS5 tokenizer's remove_diacritics
+def name_words(name):
+    if not name:
+        return []
+    folded = name.casefold()
+    if not folded.isascii():
+        folded = "".join(ch for ch in unicodedata.normalize("NFKD", folded) if not unicodedata.combining(ch))
+    return re.findall(r"\w+", folded)
+
+
+_name_indexes = {}  # (db path, table) -> NameIndex
+_name_indexes_lock = threading.Lock()
+
+
+# The table's NameIndex, built on first use (a full scan of names, so call
+# it off the Tk thread the first time) or when rebuild is set
+def name_index(table, rebuild=False, db=None):
+    if table not in SEARCHABLE_TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    db = db or get_db()
+    key = (db.path, table)
+    index = _name_indexes.get(key)
+    if index is None or rebuild:
+        with db.transaction() as c:
+            seen = c.execute("SELECT IFNULL(MAX(id), 0) FROM name_changes").fetchone()[0]
+            index = NameIndex(table, c.execute(f"SELECT id, name FROM {table}"), seen)
+        with _name_indexes_lock:
+            _name_indexes[key] = index
+    return index
+
+
+# The table's NameIndex if it has been built, else None
+def loaded_name_index(table, db=None):
+    db = db or get_db()
+    return _name_indexes.get((db.path, table))
+
+
+# The table's NameIndex, built or brought up to date from the change log
+# (rebuilt if it is too far behind). Queries SQLite: call it off the Tk thread.
+def fresh_name_index(table, db=None):
+    db = db or get_db()
+    index = loaded_name_index(table, db)
+    if index is not None and index.refresh(db):
+        return index
+    return name_index(table, rebuild=True, db=db)
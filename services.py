@@ -0,0 +1,251 @@
+from collections import namedtuple
+
+from bookings import BookingConflict, book_lesson, book_series
+from cache import invalidate
+from catalog import lesson_duration
+from database import get_db
+from search import search_names
+
+# The driving school's operations without any UI: the Tk screens, the HTTP
+# API (api.py) and the command line (cli.py) all call these, so the rules
+# (required fields, what may be edited, the Pass Plus prerequisite, prices
+# and progress) live in one place.
+#
+# Operations take lists so scripts and nightly jobs can process thousands of
+# records a call. Writes go in BATCH_SIZE rows per transaction: each batch is
+# all-or-nothing, and the write lock is never held for long (see database.py).
+# Rows come back as dicts keyed by column name.
+
+BATCH_SIZE = 500
+
+# table -> (fields required to add a row, fields that may be changed later).
+# Names are not editable: lessons keep a copy of the names they were booked with.
+ROSTERS = {
+    "students": (("name", "address", "phone", "progress", "payment_status"),
+                 ("address", "phone", "progress", "payment_status", "branch")),
+    "instructors": (("name", "phone", "email", "instructor_type"),
+                    ("phone", "email", "instructor_type", "branch")),
+}
+
+# Lesson types that need others first, and the ones they need
+PREREQUISITES = {"Pass Plus": ("Introductory", "Standard")}
+
+# One lesson to book; duration None means the lesson type's usual length.
+# confirmed: the clerk has checked prerequisites taken elsewhere
+Booking = namedtuple("Booking", "student_id instructor_id lesson_type date start_time duration status confirmed",
+                     defaults=(None, "Unpaid", False))
+
+# Outcome of one Booking in book_lessons(): lesson_id, or the error
+BookingResult = namedtuple("BookingResult", "booking lesson_id error")
+
+
+class PrerequisiteMissing(ValueError):
+    def __init__(self, lesson_type, missing):
+        self.lesson_type = lesson_type
+        self.missing = missing
+        super().__init__(f"{lesson_type} needs {' and '.join(missing)} lessons first")
+
+
+def batches(items, size=BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def as_dicts(cursor):
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+def roster(table):
+    if table not in ROSTERS:
+        raise ValueError(f"Unknown table: {table}")
+    return ROSTERS[table]
+
+
+# --- Students and instructors ---
+# Add records (dicts of field -> value) to table and return their ids
+def add_people(table, records, db=None):
+    required, editable = roster(table)
+    db = db or get_db()
+    records = list(records)
+    rows = []
+    for number, record in enumerate(records, start=1):
+        # Errors name the record only when there are several
+        where = f"Record {number}: " if len(records) > 1 else ""
+        missing = [field for field in required if not record.get(field)]
+        unknown = set(record) - set(required) - set(editable)
+        if missing:
+            raise ValueError(f"{where}{', '.join(missing)} required")
+        if unknown:
+            raise ValueError(f"{where}unknown field(s) {', '.join(sorted(unknown))}")
+        rows.append(record)
+
+    fields = list(dict.fromkeys(required + editable))
+    sql = f"INSERT INTO {table} ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})"
+    ids = []
+    try:
+        for batch in batches(rows):
+            with db.transaction(immediate=True) as c:
+                c.executemany(sql, [[record.get(field) for field in fields] for record in batch])
+                # One statement, one writer: the rows got consecutive ids
+                last_id = c.execute("SELECT last_insert_rowid()").fetchone()[0]
+            ids.extend(range(last_id - len(batch) + 1, last_id + 1))
+    finally:
+        invalidate(table, db=db)
+    return ids
+
+
+# Apply changes, (id, {field: value}) pairs; returns how many rows were found
+def update_people(table, changes, db=None):
+    _, editable = roster(table)
+    db = db or get_db()
+    changes = list(changes)
+    for row_id, fields in changes:
+        unknown = set(fields) - set(editable)
+        if unknown:
+            raise ValueError(f"Cannot change {', '.join(sorted(unknown))} of {table[:-1]} {row_id}")
+
+    updated = 0
+    try:
+        for batch in batches(changes):
+            with db.transaction(immediate=True) as c:
+                for row_id, fields in batch:
+                    if not fields:
+                        updated += c.execute(f"SELECT COUNT(*) FROM {table} WHERE id = ?", (row_id,)).fetchone()[0]
+                        continue
+                    assignments = ", ".join(f"{field} = ?" for field in fields)
+                    updated += c.execute(f"UPDATE {table} SET {assignments} WHERE id = ?",
+                                         [*fields.values(), row_id]).rowcount
+    finally:
+        invalidate(table, db=db)
+    return updated
+
+
+def add_students(records, db=None):
+    return add_people("students", records, db)
+
+
+def add_instructors(records, db=None):
+    return add_people("instructors", records, db)
+
+
+def update_students(changes, db=None):
+    return update_people("students", changes, db)
+
+
+def update_instructors(changes, db=None):
+    return update_people("instructors", changes, db)
+
+
+# --- Any table ---
+# The rows with these ids, in the order asked for (missing ids left out)
+def get_rows(table, ids, db=None):
+    if table not in ROSTERS and table != "lessons":
+        raise ValueError(f"Unknown table: {table}")
+    db = db or get_db()
+    found = {}
+    for batch in batches(ids):
+        placeholders = ", ".join("?" * len(batch))
+        for row in as_dicts(db.execute(f"SELECT * FROM {table} WHERE id IN ({placeholders})", batch)):
+            found[row["id"]] = row
+    return [found[int(row_id)] for row_id in ids if int(row_id) in found]
+
+
+def get_row(table, row_id, db=None):
+    rows = get_rows(table, [row_id], db)
+    return rows[0] if rows else None
+
+
+# Delete the rows with these ids; returns how many there were
+def delete_rows(table, ids, db=None):
+    if table not in ROSTERS and table != "lessons":
+        raise ValueError(f"Unknown table: {table}")
+    db = db or get_db()
+    deleted = 0
+    try:
+        for batch in batches(ids):
+            with db.transaction(immediate=True) as c:
+                placeholders = ", ".join("?" * len(batch))
+                deleted += c.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", batch).rowcount
+    finally:
+        # Lessons feed the students' lesson progress too
+        invalidate(*((table, "students") if table == "lessons" else (table,)), db=db)
+    return deleted
+
+
+# Rows whose name matches term (see search.py), as dicts
+def search(table, term, limit=None, db=None):
+    required, editable = roster(table)
+    columns = ["id", *dict.fromkeys(required + editable)]
+    return [dict(zip(columns, row)) for row in search_names(table, term, columns, limit, db)]
+
+
+# --- Lessons ---
+# Lesson types of PREREQUISITES[lesson_type] the student has no lesson of
+def missing_prerequisites(student_id, lesson_type, db=None):
+    needed = PREREQUISITES.get(lesson_type, ())
+    if not needed:
+        return []
+    db = db or get_db()
+    placeholders = ", ".join("?" * len(needed))
+    taken = {row[0] for row in db.query(f"""SELECT DISTINCT lesson_type FROM lessons
+                                            WHERE student_id = ? AND lesson_type IN ({placeholders})""",
+                                        (student_id, *needed))}
+    return [lesson_type for lesson_type in needed if lesson_type not in taken]
+
+
+def check_prerequisites(booking, db):
+    if not booking.confirmed:
+        missing = missing_prerequisites(booking.student_id, booking.lesson_type, db)
+        if missing:
+            raise PrerequisiteMissing(booking.lesson_type, missing)
+
+
+# Book one lesson and return its id. Raises BookingConflict when the
+# instructor or student is busy, PrerequisiteMissing, or ValueError for bad
+# input. The price is the catalog's (see bookings.book_lesson).
+def book(booking, db=None):
+    db = db or get_db()
+    check_prerequisites(booking, db)
+    duration = booking.duration or lesson_duration(booking.lesson_type, db)
+    return book_lesson(booking.student_id, booking.instructor_id, booking.lesson_type, booking.date,
+                       booking.start_time, duration, booking.status, db=db)
+
+
+# Book a series of count lessons every_days apart starting at booking.date
+# (see bookings.book_series)
+def book_recurring(booking, count, every_days=7, skip_clashes=False, db=None):
+    db = db or get_db()
+    check_prerequisites(booking, db)
+    duration = booking.duration or lesson_duration(booking.lesson_type, db)
+    return book_series(booking.student_id, booking.instructor_id, booking.lesson_type, booking.date,
+                       booking.start_time, duration, count=count, every_days=every_days, status=booking.status,
+                       skip_clashes=skip_clashes, db=db)
+
+
+# Book many lessons, BATCH_SIZE per transaction. A booking that clashes or is
+# invalid is skipped with its error; the others are booked. Earlier bookings
+# in the list count as clashes for later ones.
+def book_lessons(bookings, db=None):
+    db = db or get_db()
+    results = []
+    for batch in batches(bookings):
+        with db.transaction(immediate=True):
+            for booking in batch:
+                try:
+                    results.append(BookingResult(booking, book(booking, db), None))
+                except (BookingConflict, ValueError) as e:
+                    results.append(BookingResult(booking, None, e))
+    return results
+
+
+# student id -> lesson progress %, kept up to date by triggers on lessons
+# (see progress.py)
+def lesson_progress(student_ids, db=None):
+    db = db or get_db()
+    progress = {}
+    for batch in batches(student_ids):
+        placeholders = ", ".join("?" * len(batch))
+        progress.update(db.query(f"SELECT id, lesson_progress FROM students WHERE id IN ({placeholders})", batch))
+    return progress
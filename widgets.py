@@ -0,0 +1,486 @@
+import difflib
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from pagination import fetch_page
+from search import fresh_name_index, loaded_name_index
+
+
+# Table for the View Students / Instructors / Lessons screens. Rows are
+# fetched one keyset page at a time as the user scrolls, and only a sliding
+# window of pages is kept as Treeview items, so a million-row result costs no
+# more to show than a hundred.
+class VirtualTable:
+    PAGE_SIZE = 100
+    MAX_PAGES = 5  # pages kept in the Treeview at once
+
+    def __init__(self, parent, columns, query, format_row=None, height=15, executor=None, on_error=None):
+        # columns:    [(column, heading, width), ...]; rows are in this order
+        # query:      query() -> (sql, params) selecting the rows, unordered
+        # format_row: optional row -> displayed values
+        # executor:   BackgroundExecutor to fetch pages on (else fetched inline)
+        # on_error:   called with the exception if a page fails to load
+        self.columns = columns
+        self.query = query
+        self.format_row = format_row
+        self.executor = executor
+        self.on_error = on_error
+        self._loading = False
+        self.sort_column = columns[0][0]
+        self.sort_descending = False
+        self.sql = None
+        self.params = ()
+        self.pages = []          # pages currently shown, top to bottom
+        self.rows_by_iid = {}
+        self.first_row_number = 1
+        self._extending = False
+
+        self.frame = tk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=[c for c, _, _ in columns], show="headings",
+                                 height=height, selectmode="browse")
+        for column, heading, width in columns:
+            self.tree.heading(column, text=heading, command=lambda c=column: self.sort_by(c))
+            self.tree.column(column, width=width, stretch=True)
+
+        scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.tree.yview)
+        self.scrollbar = scrollbar
+        self.tree.configure(yscrollcommand=self.on_yscroll)
+
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        self.status_label = tk.Label(parent, anchor="w")
+        self.frame.bind("<Destroy>", self.on_destroy)
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+        self.status_label.grid(row=kwargs.get("row", 0) + 1, column=kwargs.get("column", 0),
+                               columnspan=kwargs.get("columnspan", 1), sticky="w", padx=5)
+
+    # A page still being fetched for a destroyed table is not wanted
+    def on_destroy(self, event):
+        if event.widget is self.frame and self.executor is not None:
+            self.executor.cancel(self)
+
+    def reload(self):
+        self.update_headings()
+        self.sql, self.params = self.query()
+        self.fetch(self.show_first_page)
+
+    # Show the first page of the same query again (the data behind it has changed)
+    def refresh(self):
+        if self.sql is not None:
+            self.fetch(self.show_first_page)
+
+    # Replace the rows shown with page. Items are keyed by row id, so a row
+    # still in the result keeps its item (and its selection): only rows that
+    # left are deleted, new ones inserted, and changed or moved ones updated.
+    # Repeated searches and refreshes then cost Tk little more than the rows
+    # that differ.
+    def show_first_page(self, page):
+        old_rows = self.rows_by_iid
+        new_iids = {str(row[0]) for row in page.rows}
+        stale = [iid for iid in self.tree.get_children() if iid not in new_iids]
+        if stale:
+            self.tree.delete(*stale)
+        children = list(self.tree.get_children())
+
+        self.rows_by_iid = {}
+        for position, row in enumerate(page.rows):
+            iid = str(row[0])
+            self.rows_by_iid[iid] = row
+            if iid not in old_rows:
+                self.tree.insert("", position, iid=iid, values=self.values(row))
+                children.insert(position, iid)
+                continue
+            if old_rows[iid] != row:
+                self.tree.item(iid, values=self.values(row))
+            if children[position] != iid:
+                self.tree.move(iid, "", position)
+                children.remove(iid)
+                children.insert(position, iid)
+
+        self.pages = [page]
+        self.first_row_number = 1
+        self.tree.yview_moveto(0)
+        self.update_status()
+
+    # Fetch a page and hand it to on_page (on the Tk thread either way)
+    def fetch(self, on_page, after=None, before=None):
+        args = (self.sql, self.params, self.sort_column, self.sort_descending, self.PAGE_SIZE)
+        if self.executor is None:
+            on_page(fetch_page(*args, after=after, before=before))
+            return
+
+        def done(page):
+            self._loading = False
+            on_page(page)
+
+        def failed(error):
+            self._loading = False
+            if self.on_error is not None:
+                self.on_error(error)
+
+        self._loading = True
+        self.status_label.config(text="Loading...")
+        # Keyed on the table, so a newer request makes an unfinished one stale
+        self.executor.submit(fetch_page, *args, after=after, before=before, key=self,
+                             on_done=done, on_error=failed)
+
+    def sort_by(self, column):
+        if column == self.sort_column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column = column
+            self.sort_descending = False
+        self.reload()
+
+    def update_headings(self):
+        for column, heading, _ in self.columns:
+            if column == self.sort_column:
+                heading += " ▼" if self.sort_descending else " ▲"
+            self.tree.heading(column, text=heading)
+
+    def selected_row(self):
+        selection = self.tree.selection()
+        if selection:
+            return self.rows_by_iid.get(selection[0])
+        return None
+
+    # --- Window of pages ---
+    # Returns the number of rows added. A row edited while the user scrolls
+    # can move into the new page although it is still shown in another one;
+    # it stays where it is, and is left out of the new page so that each item
+    # belongs to exactly one page (and is deleted once, with that page).
+    def add_page(self, page, at_top):
+        rows = [row for row in page.rows if str(row[0]) not in self.rows_by_iid]
+        for position, row in enumerate(rows):
+            iid = str(row[0])
+            self.rows_by_iid[iid] = row
+            self.tree.insert("", position if at_top else "end", iid=iid, values=self.values(row))
+        page = page._replace(rows=rows)
+        if at_top:
+            self.pages.insert(0, page)
+            self.first_row_number -= len(rows)
+        else:
+            self.pages.append(page)
+        return len(rows)
+
+    def drop_page(self, at_top):
+        page = self.pages.pop(0 if at_top else -1)
+        iids = [str(row[0]) for row in page.rows]
+        self.tree.delete(*iids)
+        for iid in iids:
+            del self.rows_by_iid[iid]
+        if at_top:
+            self.first_row_number += len(page.rows)
+        return len(page.rows)
+
+    def window_size(self):
+        return len(self.rows_by_iid)
+
+    # --- Scrolling ---
+    def on_yscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._extending or self._loading or not self.pages:
+            return
+        if float(last) > 0.9 and self.pages[-1].next_cursor is not None:
+            self.tree.after_idle(self.extend_down)
+        elif float(first) < 0.1 and self.pages[0].prev_cursor is not None:
+            self.tree.after_idle(self.extend_up)
+
+    def extend_down(self):
+        if self._extending or self._loading or not self.pages or self.pages[-1].next_cursor is None:
+            return
+        self.fetch(self.append_page, after=self.pages[-1].next_cursor)
+
+    def append_page(self, page):
+        self._extending = True
+        first_visible = self.first_visible_index()
+        self.add_page(page, at_top=False)
+        removed = 0
+        if len(self.pages) > self.MAX_PAGES:
+            removed = self.drop_page(at_top=True)
+        self.restore_view(first_visible - removed)
+        self._extending = False
+        self.update_status()
+
+    def extend_up(self):
+        if self._extending or self._loading or not self.pages or self.pages[0].prev_cursor is None:
+            return
+        self.fetch(self.prepend_page, before=self.pages[0].prev_cursor)
+
+    def prepend_page(self, page):
+        self._extending = True
+        first_visible = self.first_visible_index()
+        added = self.add_page(page, at_top=True)
+        if len(self.pages) > self.MAX_PAGES:
+            self.drop_page(at_top=False)
+        self.restore_view(first_visible + added)
+        self._extending = False
+        self.update_status()
+
+    def first_visible_index(self):
+        size = self.window_size()
+        if not size:
+            return 0
+        return round(float(self.tree.yview()[0]) * size)
+
+    def restore_view(self, first_visible):
+        size = self.window_size()
+        if size:
+            self.tree.yview_moveto(max(0, first_visible) / size)
+
+    def values(self, row):
+        return self.format_row(row) if self.format_row else row
+
+    def update_status(self):
+        size = self.window_size()
+        if not size:
+            self.status_label.config(text="No records found.")
+            return
+        last = self.first_row_number + size - 1
+        more = "" if self.pages[-1].next_cursor is None else " (scroll for more)"
+        self.status_label.config(text=f"Showing {self.first_row_number}-{last}{more}")
+
+
+# Listbox for the search-by-name screens. Shows the first page of matches and
+# fetches the next page when the user scrolls to the bottom. Items are shown
+# as "id - name", which the selection handlers split on " - ".
+class PagedListbox(tk.Listbox):
+    PAGE_SIZE = 50
+
+    def __init__(self, parent, executor=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.executor = executor
+        self.sql = None
+        self.params = ()
+        self.next_cursor = None
+        self.on_error = None
+        self._loading = False
+        self.configure(yscrollcommand=self.on_yscroll)
+        self.bind("<Destroy>", self.on_destroy, add="+")
+
+    def on_destroy(self, event):
+        if self.executor is not None:
+            self.executor.cancel(self)
+
+    # Replace the contents with the first page of sql. on_loaded gets the
+    # number of rows shown, on_error the exception if this or a later page of
+    # the query (scrolled to or refreshed) fails.
+    def show(self, sql, params=(), on_loaded=None, on_error=None):
+        self.sql, self.params, self.on_error = sql, params, on_error
+
+        def first_page(page):
+            self.replace_items([self.item_text(row) for row in page.rows])
+            self.next_cursor = page.next_cursor
+            self.yview_moveto(0)
+            if on_loaded is not None:
+                on_loaded(len(page.rows))
+
+        self.fetch(first_page, None, on_error)
+
+    # Show the last query's first page again (the data behind it has changed)
+    def refresh(self):
+        if self.sql is not None:
+            self.show(self.sql, self.params, on_error=self.on_error)
+
+    def load_more(self):
+        if self.next_cursor is not None and not self._loading:
+            self.fetch(self.add_page, self.next_cursor, self.on_error)
+
+    def fetch(self, on_page, after, on_error):
+        args = (self.sql, self.params)
+        if self.executor is None:
+            try:
+                page = fetch_page(*args, page_size=self.PAGE_SIZE, after=after)
+            except Exception as e:
+                if on_error is None:
+                    raise
+                on_error(e)
+            else:
+                on_page(page)
+            return
+
+        def done(page):
+            self._loading = False
+            on_page(page)
+
+        def failed(error):
+            self._loading = False
+            if on_error is not None:
+                on_error(error)
+
+        self._loading = True
+        self.executor.submit(fetch_page, *args, page_size=self.PAGE_SIZE, after=after, key=self,
+                             on_done=done, on_error=failed)
+
+    def add_page(self, page):
+        for row in page.rows:
+            self.insert(tk.END, self.item_text(row))
+        self.next_cursor = page.next_cursor
+
+    def item_text(self, row):
+        return f"{row[0]} - {row[1]}"
+
+    # Turn the items shown into items, deleting and inserting only the runs
+    # that differ (items still shown keep their selection)
+    def replace_items(self, items):
+        current = self.get(0, tk.END)
+        matcher = difflib.SequenceMatcher(None, current, items, autojunk=False)
+        # From the end, so the indexes of the runs still to do stay valid
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if tag == "equal":
+                continue
+            if i2 > i1:
+                self.delete(i1, i2 - 1)
+            if j2 > j1:
+                self.insert(i1, *items[j1:j2])
+
+    def on_yscroll(self, first, last):
+        if float(last) >= 1.0 and self.next_cursor is not None:
+            self.after_idle(self.load_more)
+
+
+# Entry for picking a student or instructor on a large roster. As the clerk
+# types, the top MAX_MATCHES names from the in-memory prefix index
+# (search.NameIndex) are listed under it; Down moves into the list, and Return
+# or a click picks one. The value is "id - name", as in the other pickers.
+#
+# Keystrokes only search the index in memory. It is brought up to date from
+# the change log on the executor, at most every UPDATE_SECONDS while typing,
+# and the matches are searched again when it has been.
+class TypeAheadPicker:
+    MAX_MATCHES = 8
+    NAVIGATION_KEYS = ("Down", "Up", "Return", "Escape", "Tab")
+    UPDATE_SECONDS = 1.0
+
+    def __init__(self, parent, table, executor=None, width=30, on_error=None):
+        self.table = table
+        self.executor = executor
+        self.on_error = on_error
+        self.var = tk.StringVar()
+        self.matches = []
+        self.update_job = None
+        self.updated_at = None
+
+        self.frame = tk.Frame(parent)
+        self.entry = tk.Entry(self.frame, textvariable=self.var, width=width)
+        self.entry.pack(fill="x")
+        self.listbox = tk.Listbox(self.frame, height=self.MAX_MATCHES, width=width)
+        self.entry.bind("<KeyRelease>", self.on_key)
+        self.entry.bind("<Down>", self.focus_matches)
+        self.entry.bind("<Escape>", lambda event: self.hide_matches())
+        self.listbox.bind("<ButtonRelease-1>", self.pick)
+        self.listbox.bind("<Return>", self.pick)
+        self.listbox.bind("<Escape>", lambda event: self.hide_matches())
+        self.frame.bind("<Destroy>", self.on_destroy)
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def on_destroy(self, event):
+        if event.widget is self.frame and self.executor is not None:
+            self.executor.cancel(self)
+
+    def get(self):
+        return self.var.get()
+
+    # ID of the picked row, or None if nothing has been picked
+    def selected_id(self):
+        head, sep, _ = self.var.get().partition(" - ")
+        return int(head) if sep and head.strip().isdigit() else None
+
+    def set(self, value):
+        # A picked value is not searched again when an update lands
+        if self.executor is not None:
+            self.executor.cancel(self)
+        self.var.set(value)
+        self.hide_matches()
+
+    def on_key(self, event=None):
+        if event is not None and event.keysym in self.NAVIGATION_KEYS:
+            return
+        if self.executor is None:
+            self.search(fresh_name_index(self.table))
+            return
+        index = loaded_name_index(self.table)
+        if index is not None:
+            self.search(index)
+        self.update_index(index is None)
+
+    # Build or update the index on the executor, unless that is under way or
+    # was done less than UPDATE_SECONDS ago (and the index is there)
+    def update_index(self, missing):
+        if self.update_job is not None and not (self.update_job.cancelled or self.update_job.future.done()):
+            return
+        now = time.monotonic()
+        if not missing and self.updated_at is not None and now - self.updated_at < self.UPDATE_SECONDS:
+            return
+        self.updated_at = now
+        self.update_job = self.executor.submit(fresh_name_index, self.table, key=self, on_done=self.search,
+                                               on_error=self.on_error)
+
+    def search(self, index):
+        # Typing after a pick searches the name, not the "id - " prefix
+        term = self.var.get()
+        if self.selected_id() is not None:
+            term = term.partition(" - ")[2]
+        self.show_matches(index.search(term, self.MAX_MATCHES) if term.strip() else [])
+
+    def show_matches(self, matches):
+        self.matches = matches
+        self.listbox.delete(0, tk.END)
+        for row_id, name in matches:
+            self.listbox.insert(tk.END, f"{row_id} - {name}")
+        if matches:
+            self.listbox.configure(height=len(matches))
+            self.listbox.pack(fill="x")
+        else:
+            self.listbox.pack_forget()
+
+    def hide_matches(self):
+        self.show_matches([])
+
+    def focus_matches(self, event=None):
+        if self.matches:
+            self.listbox.focus_set()
+            self.listbox.selection_clear(0, tk.END)
+            self.listbox.selection_set(0)
+            self.listbox.activate(0)
+
+    def pick(self, event=None):
+        selection = self.listbox.curselection()
+        if selection:
+            row_id, name = self.matches[selection[0]]
+            self.set(f"{row_id} - {name}")
+            self.entry.focus_set()
+            self.entry.icursor(tk.END)
+
+
+# Progress bar and Cancel button shown while the executor has work running
+class BusyIndicator:
+    def __init__(self, parent, executor, bg):
+        self.frame = tk.Frame(parent, bg=bg)
+        self.progress = ttk.Progressbar(self.frame, mode="indeterminate", length=160)
+        self.progress.pack(side="left", padx=5)
+        ttk.Button(self.frame, text="Cancel", command=executor.cancel_all).pack(side="left", padx=5)
+        self.busy = False
+        executor.busy_listeners.append(self.set_busy)
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+        self.frame.grid_remove()
+
+    def set_busy(self, active_jobs):
+        busy = active_jobs > 0
+        if busy == self.busy:
+            return
+        self.busy = busy
+        if busy:
+            self.frame.grid()
+            self.progress.start(15)
+        else:
+            self.progress.stop()
+            self.frame.grid_remove()